@@ -22,12 +22,17 @@ export default function App() {
     setHistory(h => [...h, { date: new Date().toISOString(), category: res.category }])
   }
 
+  // streaming: atualiza o resultado já exibido sem criar nova entrada no histórico
+  function handleStreamUpdate(patch) {
+    setMockResult(r => (r ? { ...r, ...patch(r) } : r))
+  }
+
   return (
     <div className="min-h-screen bg-slate-50 dark:bg-slate-950 flex flex-col">
       <Header />
       <main className="flex-1 flex items-start justify-center px-4 py-24">
         <div className="w-full max-w-3xl space-y-6">
-          <UploadCard onMockProcess={handleMockProcess} setLoading={setLoading} /> 
+          <UploadCard onMockProcess={handleMockProcess} onStreamUpdate={handleStreamUpdate} setLoading={setLoading} /> 
           <ResultCard data={mockResult} />
           <HistoryPie history={history} />
         </div>
@@ -27,7 +27,11 @@ export default function ResultCard({ data }) {
           <h3 className="font-semibold text-slate-900 dark:text-slate-100">
             Resposta sugerida
           </h3>
-          <CopyButton text={data.suggested_reply} />
+          {data.streaming ? (
+            <span className="text-slate-500 text-sm animate-pulse">gerando resposta...</span>
+          ) : (
+            <CopyButton text={data.suggested_reply} />
+          )}
         </div>
 
         <pre
@@ -35,13 +39,16 @@ export default function ResultCard({ data }) {
                      text-slate-900 dark:text-slate-100 p-3 rounded-lg mb-5"
         >
           {data.suggested_reply}
+          {data.streaming && <span className="animate-pulse">▍</span>}
         </pre>
 
-        <EmailButton
-          to="suporte@autou.com"
-          subject="Resposta automática do sistema AutoU"
-          body={data.suggested_reply}
-        />
+        {!data.streaming && (
+          <EmailButton
+            to="suporte@autou.com"
+            subject="Resposta automática do sistema AutoU"
+            body={data.suggested_reply}
+          />
+        )}
       </div>
 
       <div className="text-sm text-slate-500 grid sm:grid-cols-3 gap-2">
@@ -1,11 +1,12 @@
 import { useState, useRef } from 'react'
+import { classifyEmailStream } from '../services/api'
 
 const LANGS = [
   { code: 'pt', label: 'pt' },
   { code: 'en', label: 'en' },
 ]
 
-export default function UploadCard({ onMockProcess, setLoading }) {
+export default function UploadCard({ onMockProcess, onStreamUpdate, setLoading }) {
   const [text, setText] = useState('')
   const [mode] = useState('auto')
   const [lang, setLang] = useState('auto')
@@ -164,21 +165,47 @@ export default function UploadCard({ onMockProcess, setLoading }) {
           alert('Cole o conteúdo do email ou selecione um arquivo .pdf/.txt')
           return
         }
+        // streaming: a categoria aparece antes e a resposta vai sendo escrita
         const controller = new AbortController()
         const t = setTimeout(() => controller.abort(), 25000)
-        const res = await fetch(`${API}/classify`, {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json',
-            'Accept-Language': chosenLang === 'auto' ? '*;q=0.5' : chosenLang,
-            'X-User-Lang': chosenLang,
-          },
-          body: JSON.stringify({ subject: '', body: text, language: chosenLang }),
-          signal: controller.signal,
-        })
-        clearTimeout(t)
-        if (!res.ok) throw new Error(await res.text().catch(() => 'Falha na classificação'))
-        data = await res.json()
+        let improd = false
+        try {
+          await classifyEmailStream(
+            { subject: '', body: text, language: chosenLang },
+            {
+              apiUrl: API,
+              signal: controller.signal,
+              headers: {
+                'Accept-Language': chosenLang === 'auto' ? '*;q=0.5' : chosenLang,
+                'X-User-Lang': chosenLang,
+              },
+              onCategory: (res) => {
+                const outLang = res.language || chosenLang
+                improd = res.category === 'Improdutivo'
+                onMockProcess?.({
+                  category: res.category,
+                  confidence: res.confidence,
+                  suggested_reply: improd ? cannedImprodutivo(outLang) : '',
+                  language: outLang,
+                  reasoning: 'gpt',
+                  extracted: {},
+                  streaming: !improd,
+                })
+                setLoading?.(false)
+              },
+              onDelta: (piece) => {
+                if (!improd) onStreamUpdate?.(r => ({ suggested_reply: (r.suggested_reply || '') + piece }))
+              },
+              onDone: (res) => {
+                onStreamUpdate?.(() => ({ streaming: false, extracted: { timings: res.timings, ...(res.meta || {}) } }))
+              },
+            },
+          )
+        } finally {
+          clearTimeout(t)
+          onStreamUpdate?.(() => ({ streaming: false }))
+        }
+        return
       }
 
       const category = data.category
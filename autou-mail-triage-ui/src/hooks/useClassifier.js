@@ -1,5 +1,5 @@
 import { useState, useCallback } from "react";
-import { classifyEmail } from "../services/api";
+import { classifyEmailStream } from "../services/api";
 
 export function useClassifier() {
   const [loading, setLoading] = useState(false);
@@ -9,17 +9,31 @@ export function useClassifier() {
   const classify = useCallback(async ({ subject, body, language }) => {
     setLoading(true);
     setError(null);
+    setResult(null);
     try {
-      const data = await classifyEmail({ subject, body, language });
-      // normaliza chave pro seu ResultCard.jsx
-      setResult({
-        category: data.category,
-        confidence: data.confidence,
-        suggested: data.suggested_reply,
-        tokens: data.tokens ?? [],
+      // categoria aparece assim que sai; a resposta vai sendo preenchida
+      await classifyEmailStream({ subject, body, language }, {
+        onCategory: (data) => {
+          setLoading(false);
+          setResult({
+            category: data.category,
+            confidence: data.confidence,
+            language: data.language,
+            suggested: "",
+            streaming: true,
+            tokens: [],
+          });
+        },
+        onDelta: (text) => {
+          setResult((r) => (r ? { ...r, suggested: r.suggested + text } : r));
+        },
+        onDone: (data) => {
+          setResult((r) => (r ? { ...r, suggested: data.suggested_reply, streaming: false, timings: data.timings } : r));
+        },
       });
     } catch (e) {
       setError(e.message || "Erro ao classificar");
+      setResult((r) => (r ? { ...r, streaming: false } : r));
     } finally {
       setLoading(false);
     }
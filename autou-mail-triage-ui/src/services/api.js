@@ -11,3 +11,48 @@ export async function classifyEmail({ subject, body, language = "pt-BR" }) {
   }
   return res.json();
 }
+
+// Streaming (SSE via fetch): categoria chega antes, resposta vem em pedaços.
+// Callbacks: onCategory({category, confidence, language}), onDelta(texto), onDone({suggested_reply, timings}).
+export async function classifyEmailStream(
+  { subject, body, language = "pt-BR" },
+  { onCategory, onDelta, onDone, signal, headers = {}, apiUrl = import.meta.env.VITE_API_URL } = {}
+) {
+  const url = `${apiUrl}/classify-stream`;
+  const res = await fetch(url, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", Accept: "text/event-stream", ...headers },
+    body: JSON.stringify({ subject, body, language }),
+    signal,
+  });
+  if (!res.ok || !res.body) {
+    const errText = await res.text().catch(() => "");
+    throw new Error(`Falha na classificação (${res.status}): ${errText}`);
+  }
+
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  let final = null;
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = "message";
+      let data = "";
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+      const payload = data ? JSON.parse(data) : {};
+      if (event === "category") onCategory?.(payload);
+      else if (event === "delta") onDelta?.(payload.text);
+      else if (event === "done") { final = payload; onDone?.(payload); }
+      else if (event === "error") throw new Error(`Falha na classificação (${payload.status}): ${payload.error}`);
+    }
+  }
+  return final;
+}
@@ -0,0 +1,100 @@
+# app/batcher.py
+"""
+Micro-lotes de classificação: requisições concorrentes que chegam dentro de
+`CLASSIFY_BATCH_WAIT_MS` viram uma chamada só à OpenAI com até
+`CLASSIFY_BATCH_MAX` e-mails (prompt `classify_batch`, resposta por id). O
+prompt de sistema, que é a maior parte dos tokens de uma classificação, é pago
+uma vez por lote em vez de uma vez por e-mail.
+
+O lote sai quando enche ou quando vence a espera do primeiro item, o que vier
+antes; um item sozinho vai pela chamada individual de sempre. Falhas de parse
+caem em chamadas individuais dentro de `aclassify_many`; indisponibilidade do
+LLM (`LLMUnavailable`) chega a todos os e-mails do lote.
+
+O estado é por event loop: no Mangum (um loop por invocação) não há o que juntar
+e cada classificação segue sozinha.
+"""
+import asyncio
+import contextvars
+from typing import Dict, List, Optional, Set, Tuple
+
+from .config import CLASSIFY_BATCH_MAX, CLASSIFY_BATCH_WAIT_MS
+from .openai_client import aclassify_many, aclassify_only, batch_stats, sanitize_lang
+from .tracing import stage
+
+Pending = Tuple[str, Optional[str], asyncio.Future]
+
+
+class ClassifyBatcher:
+    def __init__(self, max_items: int = CLASSIFY_BATCH_MAX, wait_ms: float = CLASSIFY_BATCH_WAIT_MS):
+        self.max_items = max_items
+        self.wait = wait_ms / 1000
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[str, List[Pending]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def classify(self, body_text: str, subject: Optional[str], lang: str) -> Tuple[str, float]:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._pending, self._timers = loop, {}, {}
+        lang = sanitize_lang(lang)
+        fut = loop.create_future()
+        queue = self._pending.setdefault(lang, [])
+        queue.append((body_text, subject, fut))
+        if len(queue) >= self.max_items:
+            self._flush(lang)
+        elif len(queue) == 1:
+            self._timers[lang] = loop.call_later(self.wait, self._flush, lang)
+        # espera + chamada do lote: a etapa llm_classify_batch não entra no trace de ninguém
+        with stage("classify_batch"):
+            return await fut
+
+    def _flush(self, lang: str) -> None:
+        timer = self._timers.pop(lang, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._pending.pop(lang, None)
+        if not items:
+            return
+        # contexto vazio: o lote não pertence ao trace de quem por acaso o disparou
+        task = self._loop.create_task(self._run(items, lang), context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, items: List[Pending], lang: str) -> None:
+        try:
+            if len(items) == 1:
+                body, subject, _ = items[0]
+                results = [await aclassify_only(body_text=body, subject=subject, language=lang)]
+            else:
+                results = await aclassify_many([(body, subject) for body, subject, _ in items], lang)
+        except Exception as e:
+            for _, _, fut in items:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        except BaseException:
+            for _, _, fut in items:
+                fut.cancel()
+            raise
+        for (_, _, fut), result in zip(items, results):
+            if not fut.done():  # quem esperava pode ter sido cancelado
+                fut.set_result(result)
+
+
+_batcher: Optional[ClassifyBatcher] = None
+
+
+async def classify_batched(body_text: str, subject: Optional[str], lang: str) -> Tuple[str, float]:
+    """`aclassify_only` com micro-lotes quando CLASSIFY_BATCH_MAX > 1."""
+    global _batcher
+    if CLASSIFY_BATCH_MAX <= 1:
+        return await aclassify_only(body_text=body_text, subject=subject, language=lang)
+    if _batcher is None:
+        _batcher = ClassifyBatcher()
+    return await _batcher.classify(body_text, subject, lang)
+
+
+def batching_stats() -> dict:
+    return {"max_items": CLASSIFY_BATCH_MAX, "wait_ms": CLASSIFY_BATCH_WAIT_MS, **batch_stats()}
@@ -0,0 +1,205 @@
+# app/budget.py
+"""
+Orçamento de tokens entre `preprocess` e as chamadas à OpenAI.
+
+1. `strip_noise`: remove histórico citado (">", "Em ... escreveu:", cabeçalhos
+   de mensagem original/encaminhada), assinatura e avisos legais;
+2. `estimate_tokens`: contagem local aproximada (sem tiktoken), ~4 chars/token;
+3. `truncate_tokens`: corta no limite de palavra. A classificação recebe um teto
+   menor (TOKEN_BUDGET_CLASSIFY) que a geração de resposta (TOKEN_BUDGET_REPLY).
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .config import BUDGET_STRIP_NOISE, TOKEN_BUDGET_CLASSIFY, TOKEN_BUDGET_REPLY
+
+# ~4 caracteres por token (BPE), arredondando para cima por palavra. Contar por
+# str.split é ~5x mais rápido que um regex \w sobre texto Unicode.
+WORD_RE = re.compile(r"\S+")
+TRUNCATED_MARK = "\n[...]"
+
+# Início de histórico: tudo daqui para baixo é mensagem anterior
+QUOTE_HEADER_RE = re.compile(
+    r"^\s*(?:"
+    r"(?:On|Em|El)\s.{4,200}?\s(?:wrote|escreveu|escribió)\s*:"
+    r"|-{2,}\s*(?:Original Message|Mensagem original|Forwarded message|Mensagem encaminhada)\s*-{2,}"
+    r"|_{8,}"
+    r")\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Cabeçalho estilo Outlook: "De:/From:" seguido de "Enviado/Sent/Data/Date:"
+OUTLOOK_HEADER_RE = re.compile(
+    r"^\s*(?:De|From)\s*:.*\n(?:.*\n){0,2}?\s*(?:Enviad[oa](?: em)?|Sent|Data|Date)\s*:",
+    re.IGNORECASE | re.MULTILINE,
+)
+QUOTED_LINE_RE = re.compile(r"^\s*>.*(?:\n|$)", re.MULTILINE)
+SIG_DELIM_RE = re.compile(r"^--\s*$", re.MULTILINE)
+CLOSING_RE = re.compile(
+    r"(?:atenciosamente|att|abs|abraços?|cordialmente|saudações|grat[oa]|obrigad[oa]|"
+    r"best regards|kind regards|regards|best|thanks|thank you|cheers|sincerely)[\s,.!]*",
+    re.IGNORECASE,
+)
+MOBILE_SIG_RE = re.compile(r"^\s*(?:Sent from my|Enviado do meu|Enviado de meu)\b.*$", re.IGNORECASE | re.MULTILINE)
+DISCLAIMER_RE = re.compile(r"confiden|privileg|privilegiad|sigilos", re.IGNORECASE)
+DISCLAIMER_CTX_RE = re.compile(
+    r"destinat|recipient|intended|autoriza|proibid|prohibited|notify|notifique|apague|delete",
+    re.IGNORECASE,
+)
+PRINT_NOTICE_RE = re.compile(r"antes de imprimir|before printing", re.IGNORECASE)
+BLANK_LINES_RE = re.compile(r"\n\s*\n")
+
+SENTENCE_END_RE = re.compile(r"[.?!:;]$")
+CLAUSE_SPLIT_RE = re.compile(r"[.;!?]+(?:\s+|$)")
+
+MIN_HEAD_CHARS = 20         # só corta histórico se sobrar conteúdo acima dele
+MAX_SIGNATURE_LINES = 10    # fechamento só conta como assinatura perto do fim
+MAX_SIGNATURE_LINE_CHARS = 80
+MAX_DISCLAIMER_CHARS = 1500
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return sum((len(w) + 3) // 4 for w in text.split())
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Primeiros `max_tokens` (estimados) do texto, cortando entre palavras."""
+    if max_tokens <= 0 or not text:
+        return text
+    used = 0
+    for m in WORD_RE.finditer(text):
+        used += (m.end() - m.start() + 3) // 4
+        if used > max_tokens:
+            return text[:m.start()].rstrip() + TRUNCATED_MARK
+    return text
+
+
+def _cut_history(text: str) -> str:
+    cut = len(text)
+    for rx in (QUOTE_HEADER_RE, OUTLOOK_HEADER_RE):
+        for m in rx.finditer(text):
+            if len(text[:m.start()].strip()) >= MIN_HEAD_CHARS:
+                cut = min(cut, m.start())
+                break
+    return text[:cut]
+
+
+def _is_signature_line(line: str) -> bool:
+    """Nome, cargo, empresa, telefone: curto e sem cara de frase."""
+    line = line.strip()
+    if not line:
+        return True
+    words = len(line.split())
+    if len(line) > MAX_SIGNATURE_LINE_CHARS or words >= 6:
+        return False
+    return not (SENTENCE_END_RE.search(line) and words >= 3)
+
+
+def _cut_signature(text: str) -> str:
+    m = SIG_DELIM_RE.search(text)
+    if m and len(text[:m.start()].strip()) >= MIN_HEAD_CHARS:
+        text = text[:m.start()]
+    lines = text.rstrip().split("\n")
+    # de baixo para cima: o último fechamento vale se só houver assinatura depois dele
+    # ("Obrigado!\nPreciso do boleto...\nMaria" não é assinatura)
+    for i in range(len(lines) - 1, max(0, len(lines) - 1 - MAX_SIGNATURE_LINES), -1):
+        if CLOSING_RE.fullmatch(lines[i].strip()):
+            if all(_is_signature_line(ln) for ln in lines[i + 1:]):
+                return "\n".join(lines[:i])
+            return text
+        if not _is_signature_line(lines[i]):
+            return text
+    return text
+
+
+def _is_disclaimer(paragraph: str) -> bool:
+    """Aviso legal/impressão: curto e com termo de aviso em todas as orações."""
+    if len(paragraph) > MAX_DISCLAIMER_CHARS:
+        return False
+    if PRINT_NOTICE_RE.search(paragraph) and len(paragraph) <= 200:
+        return True
+    if not (DISCLAIMER_RE.search(paragraph) and DISCLAIMER_CTX_RE.search(paragraph)):
+        return False
+    clauses = [c for c in CLAUSE_SPLIT_RE.split(paragraph) if c.strip()]
+    return all(DISCLAIMER_RE.search(c) or DISCLAIMER_CTX_RE.search(c) for c in clauses)
+
+
+def _drop_disclaimers(text: str) -> str:
+    """Só os parágrafos finais, depois do corpo; o primeiro parágrafo sempre fica."""
+    paragraphs = BLANK_LINES_RE.split(text.rstrip())
+    end = len(paragraphs)
+    while end > 1 and (not paragraphs[end - 1].strip() or _is_disclaimer(paragraphs[end - 1])):
+        end -= 1
+    return "\n\n".join(paragraphs[:end]) if end != len(paragraphs) else text
+
+
+def strip_noise(text: str) -> str:
+    """Remove histórico citado, assinatura e avisos legais. Nunca devolve vazio."""
+    if not text:
+        return text
+    cleaned = _cut_history(text.replace("\r\n", "\n"))
+    cleaned = QUOTED_LINE_RE.sub("", cleaned)
+    cleaned = MOBILE_SIG_RE.sub("", cleaned)
+    # aviso legal costuma vir depois da assinatura: sai primeiro para a assinatura ficar no fim
+    cleaned = _cut_signature(_drop_disclaimers(cleaned)).strip()
+    return cleaned if len(cleaned) >= MIN_HEAD_CHARS or len(cleaned) >= len(text.strip()) else text
+
+
+class BudgetStats:
+    def __init__(self):
+        self.requests = 0
+        self.input_tokens = 0
+        self.sent_tokens = 0
+
+    def snapshot(self) -> dict:
+        saved = self.input_tokens - self.sent_tokens
+        return {
+            "requests": self.requests,
+            "input_tokens": self.input_tokens,
+            "sent_tokens": self.sent_tokens,
+            "saved_tokens": saved,
+            "saved_ratio": round(saved / self.input_tokens, 4) if self.input_tokens else 0.0,
+        }
+
+
+_stats = BudgetStats()
+
+
+def budget_stats() -> dict:
+    return _stats.snapshot()
+
+
+def apply_budget(body: str, strip: Optional[bool] = None,
+                 classify_max: Optional[int] = None, reply_max: Optional[int] = None) -> Tuple[str, str, Dict[str, int]]:
+    """
+    Retorna (texto_classificação, texto_resposta, relatório). Os parâmetros
+    sobrepõem BUDGET_STRIP_NOISE / TOKEN_BUDGET_CLASSIFY / TOKEN_BUDGET_REPLY.
+    """
+    strip = BUDGET_STRIP_NOISE if strip is None else strip
+    classify_max = TOKEN_BUDGET_CLASSIFY if classify_max is None else classify_max
+    reply_max = TOKEN_BUDGET_REPLY if reply_max is None else reply_max
+
+    clean = strip_noise(body) if strip else body
+    cls_text = truncate_tokens(clean, classify_max)
+    reply_text = truncate_tokens(clean, reply_max)
+    report = {
+        "input": estimate_tokens(body),
+        "clean": estimate_tokens(clean),
+        "classify": estimate_tokens(cls_text),
+        "reply": estimate_tokens(reply_text),
+    }
+    return cls_text, reply_text, report
+
+
+def record_usage(report: Dict[str, int], calls: List[str]) -> Dict[str, int]:
+    """
+    Contabiliza as chamadas efetivamente feitas ("classify"/"reply") e devolve o
+    relatório com `sent` e `saved` (tokens de corpo economizados neste request).
+    """
+    sent = sum(report[c] for c in calls)
+    full = report["input"] * len(calls)
+    _stats.requests += 1
+    _stats.input_tokens += full
+    _stats.sent_tokens += sent
+    return {**report, "sent": sent, "saved": full - sent}
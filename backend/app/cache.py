@@ -0,0 +1,232 @@
+# app/cache.py
+"""
+Cache de resultados (classificação/resposta) endereçado por conteúdo.
+
+A chave é um hash do texto normalizado + idioma + modelo + versão do prompt,
+então e-mails idênticos (newsletters, notificações automáticas) não pagam
+a chamada à OpenAI de novo. Backends: memória (LRU + TTL) ou SQLite local,
+que serve de stand-in para um store compartilhado.
+
+`set` nunca bloqueia. No SQLite as escritas (inclusive o `used_at` do LRU) vão
+para uma fila e uma thread as grava em lotes, como em app/history.py; o `get` é
+uma leitura em disco, e o caminho assíncrono o chama via `asyncio.to_thread`
+(`blocking = True`).
+"""
+import atexit
+import hashlib
+import json
+import logging
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from .config import CACHE_BACKEND, CACHE_TTL, CACHE_MAX_ITEMS, CACHE_SQLITE_PATH
+
+log = logging.getLogger("mail-triage.cache")
+
+_WS_RE = re.compile(r"\s+")
+_STOP = object()
+
+
+def normalize_for_key(text: Optional[str]) -> str:
+    return _WS_RE.sub(" ", (text or "").lower()).strip()
+
+
+def cache_key(kind: str, subject: Optional[str], body: str, lang: str, model: str, prompt_version: str) -> str:
+    raw = "\x1f".join([kind, normalize_for_key(subject), normalize_for_key(body), lang, model, prompt_version])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Stats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.dropped = 0  # escritas descartadas com a fila cheia (SQLite)
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "evictions": self.evictions,
+            "dropped_writes": self.dropped,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class MemoryCache:
+    blocking = False
+
+    def __init__(self, ttl: float = CACHE_TTL, max_items: int = CACHE_MAX_ITEMS):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = _Stats()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.time():
+                if item is not None:
+                    del self._data[key]
+                self.stats.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return item[1]
+
+    def set(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl, value)
+            self._data.move_to_end(key)
+            self.stats.sets += 1
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def snapshot(self) -> dict:
+        return {"backend": "memory", "size": len(self._data), **self.stats.as_dict()}
+
+
+class SQLiteCache:
+    """Store compartilhado entre processos (mesma máquina/volume)."""
+
+    blocking = True
+    write_batch = 500
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH, ttl: float = CACHE_TTL, max_items: int = CACHE_MAX_ITEMS,
+                 queue_max: int = 10_000):
+        self.path = path
+        self.ttl = ttl
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._db = self._connect()  # leituras; a thread escritora abre a dela
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_used_at ON cache(used_at)")
+        self.stats = _Stats()
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_max)
+        self._thread = threading.Thread(target=self._writer, name="cache-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < now:
+            if row is not None:
+                self._enqueue(("DELETE FROM cache WHERE key = ?", (key,)))
+            self.stats.misses += 1
+            return None
+        self._enqueue(("UPDATE cache SET used_at = ? WHERE key = ?", (now, key)))
+        self.stats.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict) -> None:
+        """Não bloqueia: enfileira para a thread escritora."""
+        now = time.time()
+        if self._enqueue(("INSERT OR REPLACE INTO cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                          (key, json.dumps(value, ensure_ascii=False), now + self.ttl, now))):
+            self.stats.sets += 1
+
+    def flush(self) -> None:
+        """Espera a thread escritora gravar tudo o que já foi enfileirado."""
+        self._queue.join()
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _enqueue(self, op: tuple) -> bool:
+        try:
+            self._queue.put_nowait(op)
+            return True
+        except queue.Full:
+            self.stats.dropped += 1
+            return False
+
+    def _writer(self) -> None:
+        db = self._connect()
+        stop = False
+        while not stop:
+            batch: List[tuple] = []
+            item = self._queue.get()
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.write_batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self._write(db, batch)
+                except Exception:
+                    log.exception("falha gravando %d operações do cache", len(batch))
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+        db.close()
+
+    def _write(self, db: sqlite3.Connection, batch: List[tuple]) -> None:
+        """Um lote numa transação só; o LRU corta o excesso no fim."""
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in batch:
+                db.execute(sql, params)
+            excess = db.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_items
+            if excess > 0:
+                db.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY used_at LIMIT ?)", (excess,))
+                self.stats.evictions += excess
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "size": size, "queued": self._queue.qsize(),
+                **self.stats.as_dict()}
+
+
+_cache = None
+_cache_ready = False
+
+
+def get_cache():
+    """Instância única conforme CACHE_BACKEND (memory | sqlite | none)."""
+    global _cache, _cache_ready
+    if not _cache_ready:
+        if CACHE_BACKEND == "memory":
+            _cache = MemoryCache()
+        elif CACHE_BACKEND == "sqlite":
+            _cache = SQLiteCache()
+            atexit.register(_cache.close)  # CLIs: grava o que ficou na fila
+        _cache_ready = True
+    return _cache
+
+
+def cache_stats() -> dict:
+    cache = get_cache()
+    return cache.snapshot() if cache is not None else {"backend": "none"}
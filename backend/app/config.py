@@ -1,11 +1,32 @@
 import os
-from dotenv import load_dotenv
 
+# Na Lambda as variáveis vêm do ambiente; o .env é só para desenvolvimento local
+if not os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+    from dotenv import load_dotenv
 
-load_dotenv()
+    load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_KEEPALIVE_CONNECTIONS", "10"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+OPENAI_CLASSIFY_TIMEOUT = float(os.getenv("OPENAI_CLASSIFY_TIMEOUT", "20"))
+OPENAI_REPLY_TIMEOUT = float(os.getenv("OPENAI_REPLY_TIMEOUT", "25"))
+# Cota da conta (0 = sem limitador local), retries e circuit breaker
+OPENAI_RPM = float(os.getenv("OPENAI_RPM", "500"))
+OPENAI_TPM = float(os.getenv("OPENAI_TPM", "200000"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "8"))
+OPENAI_RETRY_BUDGET = float(os.getenv("OPENAI_RETRY_BUDGET", "15"))  # segundos por chamada, somando retries
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+# two_call: aclassify_only + agenerate_reply | combined: uma única chamada
+# speculative: aclassify_only e agenerate_reply em paralelo (resposta descartada se Improdutivo)
+LLM_MODE = os.getenv("LLM_MODE", "two_call").strip().lower()
 ALLOW_DEBUG = os.getenv("ALLOW_DEBUG", "false").lower() == "true"
 import os
 
@@ -17,3 +38,76 @@ ALLOWED_ORIGINS = [
 
 PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "30"))
 TEXT_MAX_CHARS = int(os.getenv("TEXT_MAX_CHARS", "12000"))
+PDF_TIME_BUDGET = float(os.getenv("PDF_TIME_BUDGET", "8"))  # segundos por documento, conferidos entre páginas (0 = sem limite)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+
+# Cache de resultados: memory | sqlite | none
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").strip().lower()
+CACHE_TTL = float(os.getenv("CACHE_TTL", "86400"))
+CACHE_MAX_ITEMS = int(os.getenv("CACHE_MAX_ITEMS", "5000"))
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "/tmp/mail-triage-cache.sqlite3")
+
+# /classify-batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+# Pré-classificador local (app/local_classifier.py)
+LOCAL_CLASSIFIER = os.getenv("LOCAL_CLASSIFIER", "false").lower() == "true"
+LOCAL_MODEL_PATH = os.getenv("LOCAL_MODEL_PATH", os.path.join(os.path.dirname(__file__), "local_model.json"))
+LOCAL_CONFIDENCE_THRESHOLD = float(os.getenv("LOCAL_CONFIDENCE_THRESHOLD", "0.9"))
+
+# Orçamento de tokens antes das chamadas ao LLM (app/budget.py); 0 = sem teto
+BUDGET_STRIP_NOISE = os.getenv("BUDGET_STRIP_NOISE", "true").lower() == "true"
+TOKEN_BUDGET_CLASSIFY = int(os.getenv("TOKEN_BUDGET_CLASSIFY", "400"))
+TOKEN_BUDGET_REPLY = int(os.getenv("TOKEN_BUDGET_REPLY", "1200"))
+
+# Jobs assíncronos (POST /jobs, GET /jobs/{id}): memory | sqlite | dynamodb
+JOBS_BACKEND = os.getenv("JOBS_BACKEND", "memory").strip().lower()
+JOBS_SQLITE_PATH = os.getenv("JOBS_SQLITE_PATH", "/tmp/mail-triage-jobs.sqlite3")
+# dynamodb: estado/resultados na tabela, entrega pela fila SQS (Lambda worker com gatilho SQS)
+JOBS_DYNAMODB_TABLE = os.getenv("JOBS_DYNAMODB_TABLE", "")
+JOBS_SQS_QUEUE_URL = os.getenv("JOBS_SQS_QUEUE_URL", "")
+JOBS_SPOOL_DIR = os.getenv("JOBS_SPOOL_DIR", "/tmp/mail-triage-jobs")
+# Com bucket, os uploads dos jobs vão para o S3 (API e worker em máquinas diferentes)
+JOBS_SPOOL_BUCKET = os.getenv("JOBS_SPOOL_BUCKET", "")
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))  # jobs simultâneos por processo worker
+# Worker dentro do processo da API (obrigatório com JOBS_BACKEND=memory). Desligado na
+# Lambda: lá a API só enfileira e o worker é outra função (worker_handler.py)
+JOBS_INLINE_WORKER = os.getenv(
+    "JOBS_INLINE_WORKER", "false" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "true"
+).lower() == "true"
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "0.5"))
+JOBS_LEASE = float(os.getenv("JOBS_LEASE", "300"))  # job "running" há mais que isso volta para a fila
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+JOBS_TTL = float(os.getenv("JOBS_TTL", "86400"))  # retenção de jobs finalizados
+
+# Tracing por etapa (app/tracing.py): cabeçalho Server-Timing + histogramas em /metrics
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+
+# Ingestão em lote de mbox/.eml (python -m app.ingest)
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "4"))
+
+# Identificação de idioma local (app/langid.py) para language=auto
+LANGID_PROFILES_PATH = os.getenv("LANGID_PROFILES_PATH", os.path.join(os.path.dirname(__file__), "langid_profiles.json"))
+LANGID_SAMPLE_CHARS = int(os.getenv("LANGID_SAMPLE_CHARS", "300"))  # letras do começo do texto que o detector olha
+LANGID_MIN_CONFIDENCE = float(os.getenv("LANGID_MIN_CONFIDENCE", "0.8"))  # abaixo disso, resposta em pt
+
+# Campanhas quase duplicadas (app/dedup.py): um representante por cluster vai ao LLM
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "false").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.7"))  # similaridade de Jaccard estimada
+DEDUP_WINDOW = float(os.getenv("DEDUP_WINDOW", "3600"))  # s sem novos membros até o cluster expirar
+DEDUP_MAX_CLUSTERS = int(os.getenv("DEDUP_MAX_CLUSTERS", "5000"))  # ~6 KB cada
+DEDUP_MIN_CONFIDENCE = float(os.getenv("DEDUP_MIN_CONFIDENCE", "0.6"))  # veredito abaixo disso não é reaproveitado
+DEDUP_WAIT_TIMEOUT = float(os.getenv("DEDUP_WAIT_TIMEOUT", "30"))  # espera máxima pelo representante em andamento
+
+# Micro-lotes de classificação (app/batcher.py): até N e-mails por chamada; 1 = desligado
+CLASSIFY_BATCH_MAX = int(os.getenv("CLASSIFY_BATCH_MAX", "1"))
+CLASSIFY_BATCH_WAIT_MS = float(os.getenv("CLASSIFY_BATCH_WAIT_MS", "5"))  # espera máxima para juntar o lote
+
+# Histórico de triagens no servidor (app/history.py, GET /stats): memory | sqlite | none
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "memory").strip().lower()
+HISTORY_SQLITE_PATH = os.getenv("HISTORY_SQLITE_PATH", "/tmp/mail-triage-history.sqlite3")
+HISTORY_BUCKET = int(os.getenv("HISTORY_BUCKET", "3600"))  # s por janela dos contadores (igual em todos os processos)
+HISTORY_QUEUE_MAX = int(os.getenv("HISTORY_QUEUE_MAX", "10000"))  # fila cheia: registro descartado
+HISTORY_WRITE_BATCH = int(os.getenv("HISTORY_WRITE_BATCH", "1000"))  # registros por transação
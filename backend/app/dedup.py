@@ -0,0 +1,292 @@
+# app/dedup.py
+"""
+Detecção de campanhas quase duplicadas: milhares de cópias do mesmo e-mail com
+saudação personalizada e IDs de rastreio diferentes, que o cache por conteúdo
+(app/cache.py) não pega porque o texto não é idêntico.
+
+Cada e-mail vira uma assinatura MinHash (NUM_PERM mínimos) dos bigramas de
+tokens de `preprocess` — tokens com dígitos (IDs, valores, datas) ficam de
+fora. Um índice LSH (BANDS faixas de NUM_PERM/BANDS valores) acha os candidatos
+sem comparar com todos os clusters; a similaridade de Jaccard estimada pela
+assinatura inteira decide o casamento (`DEDUP_THRESHOLD`).
+
+Só o representante do cluster vai ao LLM; as cópias seguintes reaproveitam o
+veredito (categoria, confiança) e as que chegam enquanto ele está em andamento
+esperam por ele. Vereditos abaixo de `DEDUP_MIN_CONFIDENCE` (fallbacks) não são
+reaproveitados. Clusters expiram `DEDUP_WINDOW` s depois do último membro (janela
+deslizante) e os menos recentes saem quando passa de `DEDUP_MAX_CLUSTERS`, o que
+limita a memória a ~`BYTES_PER_CLUSTER` por cluster.
+"""
+import asyncio
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .config import (
+    DEDUP_ENABLED, DEDUP_THRESHOLD, DEDUP_WINDOW, DEDUP_MAX_CLUSTERS, DEDUP_MIN_CONFIDENCE, DEDUP_WAIT_TIMEOUT,
+)
+from .nlp import preprocess
+from .tracing import stage
+
+NUM_PERM = 64
+BANDS = 16
+MIN_SHINGLES = 8      # e-mails curtos demais: a estimativa de Jaccard fica ruidosa
+MAX_TOKENS = 256      # a assinatura olha só o começo (o texto já vem cortado pelo orçamento)
+
+_GOLDEN = 0x9E3779B97F4A7C15  # hash multiplicativo de Fibonacci: bits altos bem misturados
+_MASK64 = (1 << 64) - 1
+_VALUE_BITS = 64 - (NUM_PERM.bit_length() - 1)
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+_EMPTY = 1 << 64
+
+# assinatura (64 ints) + chaves das faixas + entradas nos buckets, medido com tracemalloc
+BYTES_PER_CLUSTER = 6_000
+
+Verdict = Tuple[str, float]
+
+
+def shingles(subject: Optional[str], body: str) -> Set[int]:
+    tokens = [t for t in preprocess(f"{subject or ''}\n{body or ''}")[:MAX_TOKENS]
+              if not any(ch.isdigit() for ch in t)]
+    return {zlib.crc32(f"{a} {b}".encode("utf-8")) for a, b in zip(tokens, tokens[1:])}
+
+
+def signature(hashes: Set[int]) -> Tuple[int, ...]:
+    """
+    MinHash de uma permutação só (one permutation hashing): cada shingle cai num
+    dos NUM_PERM compartimentos pelos bits altos e o compartimento guarda o menor
+    valor dos bits baixos — O(shingles + NUM_PERM) em vez de O(shingles x NUM_PERM).
+    Compartimentos vazios copiam o próximo cheio (densificação por rotação), com um
+    deslocamento por distância para não casar por acaso com o original.
+    """
+    sig = [_EMPTY] * NUM_PERM
+    for h in hashes:
+        x = ((h + 1) * _GOLDEN) & _MASK64
+        b = x >> _VALUE_BITS
+        v = x & _VALUE_MASK
+        if v < sig[b]:
+            sig[b] = v
+    # duas voltas da direita para a esquerda: o último cheio visto é o próximo de cada vazio
+    nxt = pos = None
+    for i in range(2 * NUM_PERM - 1, -1, -1):
+        j = i % NUM_PERM
+        if sig[j] <= _VALUE_MASK:
+            nxt, pos = sig[j], i
+        elif i < NUM_PERM and nxt is not None:
+            sig[j] = nxt + ((pos - i) << _VALUE_BITS)
+    return tuple(sig)
+
+
+def similarity(s1: Tuple[int, ...], s2: Tuple[int, ...]) -> float:
+    """Jaccard estimado: fração de posições iguais nas duas assinaturas."""
+    return sum(map(int.__eq__, s1, s2)) / len(s1)
+
+
+class Cluster:
+    __slots__ = ("id", "signature", "bands", "verdict", "pending", "last_seen", "members")
+
+    def __init__(self, cid: int, sig: Tuple[int, ...], bands: Tuple[int, ...], now: float):
+        self.id = cid
+        self.signature = sig
+        self.bands = bands
+        self.verdict: Optional[Verdict] = None
+        self.pending: Optional[asyncio.Future] = None
+        self.last_seen = now
+        self.members = 1
+
+
+class DedupStats:
+    def __init__(self):
+        self.lookups = 0
+        self.skipped_short = 0
+        self.representatives = 0
+        self.reused = 0
+        self.waited = 0
+        self.discarded = 0   # representante falhou ou veredito com confiança baixa
+        self.expired = 0
+        self.evicted = 0
+
+    def snapshot(self, index: Optional["NearDupIndex"]) -> dict:
+        clusters = len(index) if index is not None else 0
+        return {
+            "enabled": DEDUP_ENABLED,
+            "threshold": DEDUP_THRESHOLD,
+            "window_s": DEDUP_WINDOW,
+            "clusters": clusters,
+            "max_clusters": DEDUP_MAX_CLUSTERS,
+            "approx_bytes": clusters * BYTES_PER_CLUSTER,
+            "lookups": self.lookups,
+            "skipped_short": self.skipped_short,
+            "representatives": self.representatives,
+            "llm_calls_avoided": self.reused,
+            "waited_inflight": self.waited,
+            "discarded": self.discarded,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "avoided_rate": round(self.reused / self.lookups, 4) if self.lookups else 0.0,
+        }
+
+
+class NearDupIndex:
+    """Clusters por ordem de último uso + buckets LSH (hash de cada faixa → ids dos clusters)."""
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, window: float = DEDUP_WINDOW,
+                 max_clusters: int = DEDUP_MAX_CLUSTERS, stats: Optional[DedupStats] = None):
+        self.threshold = threshold
+        self.window = window
+        self.max_clusters = max_clusters
+        self.stats = stats or DedupStats()
+        self._clusters: "OrderedDict[int, Cluster]" = OrderedDict()
+        self._buckets: Dict[int, List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._clusters)
+
+    @staticmethod
+    def _bands(sig: Tuple[int, ...]) -> Tuple[int, ...]:
+        # uma chave int por faixa; colisões só geram candidatos a mais, a similaridade confirma
+        rows = NUM_PERM // BANDS
+        return tuple(hash((i,) + sig[i * rows:(i + 1) * rows]) for i in range(BANDS))
+
+    def match(self, sig: Tuple[int, ...], now: Optional[float] = None) -> Tuple[Optional[Cluster], float]:
+        """Cluster mais parecido acima do limiar (renovando a janela dele), ou (None, melhor similaridade)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            candidates = set()
+            for key in self._bands(sig):
+                ids = self._buckets.get(key)
+                if ids:
+                    candidates.update(ids)
+            best, best_sim = None, 0.0
+            for cid in candidates:
+                c = self._clusters[cid]
+                sim = similarity(sig, c.signature)
+                if sim > best_sim:
+                    best, best_sim = c, sim
+            if best is None or best_sim < self.threshold:
+                return None, best_sim
+            best.last_seen = now
+            best.members += 1
+            self._clusters.move_to_end(best.id)
+            return best, best_sim
+
+    def add(self, sig: Tuple[int, ...], now: Optional[float] = None) -> Cluster:
+        now = time.time() if now is None else now
+        with self._lock:
+            c = Cluster(self._next_id, sig, self._bands(sig), now)
+            self._next_id += 1
+            self._clusters[c.id] = c
+            for key in c.bands:
+                self._buckets.setdefault(key, []).append(c.id)
+            while len(self._clusters) > self.max_clusters:
+                self._remove(next(iter(self._clusters.values())))
+                self.stats.evicted += 1
+            return c
+
+    def discard(self, cluster: Cluster) -> None:
+        with self._lock:
+            if self._clusters.get(cluster.id) is cluster:
+                self._remove(cluster)
+
+    def _expire(self, now: float) -> None:
+        limit = now - self.window
+        while self._clusters:
+            oldest = next(iter(self._clusters.values()))
+            if oldest.last_seen >= limit:
+                break
+            self._remove(oldest)
+            self.stats.expired += 1
+
+    def _remove(self, c: Cluster) -> None:
+        del self._clusters[c.id]
+        for key in c.bands:
+            ids = self._buckets.get(key)
+            if ids is not None:
+                if len(ids) == 1:
+                    del self._buckets[key]
+                else:
+                    ids.remove(c.id)
+
+
+_stats = DedupStats()
+_index: Optional[NearDupIndex] = None
+
+
+def get_index() -> Optional[NearDupIndex]:
+    global _index
+    if _index is None and DEDUP_ENABLED:
+        _index = NearDupIndex(stats=_stats)
+    return _index
+
+
+async def _await_representative(c: Cluster) -> Optional[Verdict]:
+    fut = c.pending
+    # Mangum cria um event loop por invocação: um futuro de outro loop não serve
+    if fut is None or fut.get_loop() is not asyncio.get_running_loop():
+        return None
+    try:
+        return await asyncio.wait_for(asyncio.shield(fut), DEDUP_WAIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        return None
+
+
+async def classify_deduplicated(subject: Optional[str], body: str,
+                                classify: Callable[[], Awaitable[Verdict]]) -> Tuple[str, float, bool]:
+    """
+    (categoria, confiança, reaproveitado). `classify` só é chamado quando o
+    e-mail não casa com um cluster que já tem (ou vai ter) veredito.
+    """
+    index = get_index()
+    if index is None:
+        category, confidence = await classify()
+        return category, confidence, False
+
+    _stats.lookups += 1
+    with stage("dedup"):
+        hashes = shingles(subject, body)
+        sig = signature(hashes) if len(hashes) >= MIN_SHINGLES else None
+        cluster = index.match(sig)[0] if sig is not None else None
+    if sig is None:
+        _stats.skipped_short += 1
+        category, confidence = await classify()
+        return category, confidence, False
+
+    if cluster is not None:
+        verdict = cluster.verdict
+        if verdict is None and cluster.pending is not None:
+            verdict = await _await_representative(cluster)
+            if verdict is not None:
+                _stats.waited += 1
+        if verdict is not None:
+            _stats.reused += 1
+            return verdict[0], verdict[1], True
+        # representante falhou (ou é de outro loop): classifica sozinho, sem mexer no cluster
+        category, confidence = await classify()
+        return category, confidence, False
+
+    cluster = index.add(sig)
+    cluster.pending = asyncio.get_running_loop().create_future()
+    _stats.representatives += 1
+    verdict = None
+    try:
+        category, confidence = await classify()
+        if confidence >= DEDUP_MIN_CONFIDENCE:
+            verdict = (category, confidence)
+        return category, confidence, False
+    finally:
+        cluster.verdict = verdict
+        if verdict is None:
+            _stats.discarded += 1
+            index.discard(cluster)
+        if not cluster.pending.done():
+            cluster.pending.set_result(verdict)
+        cluster.pending = None
+
+
+def dedup_stats() -> dict:
+    return _stats.snapshot(_index)
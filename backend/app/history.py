@@ -0,0 +1,349 @@
+# app/history.py
+"""
+Histórico de triagens no servidor (o do HistoryPie.jsx só existe no navegador).
+
+Cada resultado vira uma linha num log só de acréscimo — instante, categoria,
+idioma e confiança; nada do conteúdo do e-mail — e soma em contadores por
+janela de `HISTORY_BUCKET` s, por categoria e idioma. O `/stats` lê só os
+contadores das janelas pedidas: O(buckets), não importa quantas linhas o log tenha.
+
+`record` só enfileira (fila de `HISTORY_QUEUE_MAX`; cheia, o registro é
+descartado e contado) e uma thread escritora grava em lotes de até
+`HISTORY_WRITE_BATCH`, fora do caminho da requisição. No SQLite o lote entra no
+log e nos contadores na mesma transação, então os dois nunca divergem; o que
+ainda está na fila aparece como `pending` no /stats.
+
+Backends (`HISTORY_BACKEND`):
+- memory: só os contadores, por processo (somem no restart; no Lambda, por container);
+- sqlite: log + contadores em `HISTORY_SQLITE_PATH`, compartilhados entre a API,
+  `python -m app.worker` e `python -m app.ingest` na mesma máquina;
+- none: desligado.
+"""
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .config import HISTORY_BACKEND, HISTORY_SQLITE_PATH, HISTORY_BUCKET, HISTORY_QUEUE_MAX, HISTORY_WRITE_BATCH
+
+log = logging.getLogger("mail-triage.history")
+
+CATEGORIES = ("Improdutivo", "Produtivo")  # no log do SQLite a categoria é o índice aqui
+
+Entry = Tuple[int, str, str, float]                  # (ts, categoria, idioma, confiança)
+Counts = Dict[Tuple[int, str, str], List[float]]     # (bucket, categoria, idioma) → [n, soma das confianças]
+
+_STOP = object()
+
+
+class HistoryStats:
+    def __init__(self):
+        self.recorded = 0
+        self.dropped = 0        # fila cheia
+        self.written = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.write_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "written": self.written,
+            "batches": self.batches,
+            "avg_batch_size": round(self.written / self.batches, 1) if self.batches else 0.0,
+            "write_errors": self.write_errors,
+            "write_us_per_row": round(self.write_seconds / self.written * 1e6, 1) if self.written else 0.0,
+        }
+
+
+class _HistoryStore:
+    """Fila + thread escritora; os backends implementam `_write` e `_bucket_rows`."""
+
+    backend = ""
+
+    def __init__(self, bucket: int = HISTORY_BUCKET, queue_max: int = HISTORY_QUEUE_MAX,
+                 write_batch: int = HISTORY_WRITE_BATCH):
+        self.bucket = int(bucket)
+        self.write_batch = write_batch
+        self.stats = HistoryStats()
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_max)
+        self._thread = threading.Thread(target=self._writer, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, category: str, language: str, confidence: float, ts: Optional[float] = None,
+               count: int = 1) -> None:
+        """
+        Não bloqueia: com a fila cheia o registro é descartado. `count` > 1 registra
+        o mesmo resultado várias vezes (itens idênticos de um lote, triados uma vez só).
+        """
+        entry = (
+            int(time.time() if ts is None else ts),
+            category if category in CATEGORIES else "Produtivo",
+            language or "pt",
+            max(0.0, min(1.0, float(confidence))),
+        )
+        for i in range(count):
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                self.stats.dropped += count - i
+                break
+            self.stats.recorded += 1
+
+    def flush(self) -> None:
+        """Espera a thread escritora gravar tudo o que já foi enfileirado."""
+        self._queue.join()
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _writer(self) -> None:
+        self._open_writer()
+        stop = False
+        while not stop:
+            batch: List[Entry] = []
+            item = self._queue.get()
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.write_batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                t0 = time.perf_counter()
+                try:
+                    self._write(batch, self._aggregate(batch))
+                    self.stats.written += len(batch)
+                    self.stats.batches += 1
+                except Exception:
+                    self.stats.write_errors += 1
+                    log.exception("falha gravando %d registros do histórico", len(batch))
+                self.stats.write_seconds += time.perf_counter() - t0
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+
+    def _aggregate(self, batch: List[Entry]) -> Counts:
+        counts: Counts = {}
+        for ts, category, language, confidence in batch:
+            c = counts.setdefault((ts - ts % self.bucket, category, language), [0, 0.0])
+            c[0] += 1
+            c[1] += confidence
+        return counts
+
+    def _open_writer(self) -> None:
+        pass
+
+    def _write(self, batch: List[Entry], counts: Counts) -> None:
+        raise NotImplementedError
+
+    def _bucket_rows(self, start: int, end: int) -> List[tuple]:
+        """[(bucket, categoria, idioma, n, soma das confianças)] com start <= bucket < end."""
+        raise NotImplementedError
+
+    def query(self, since: float, until: float, step: Optional[int] = None) -> dict:
+        """
+        Totais e série por `step` s (múltiplo de HISTORY_BUCKET, alinhado à época
+        em UTC) das janelas que começam em [since, until). `since` desce para o
+        início do bucket dele.
+        """
+        step = int(step or self.bucket)
+        if step <= 0 or step % self.bucket:
+            raise ValueError(f"step deve ser múltiplo de {self.bucket} s")
+        start = int(since) - int(since) % self.bucket
+        end = int(until)
+        by_category = {c: 0 for c in CATEGORIES}
+        confidence = {c: 0.0 for c in CATEGORIES}
+        by_language: Dict[str, int] = {}
+        series: Dict[int, dict] = {}
+        for bucket, category, language, n, conf_sum in (self._bucket_rows(start, end) if end > start else ()):
+            by_category[category] = by_category.get(category, 0) + n
+            confidence[category] = confidence.get(category, 0.0) + conf_sum
+            by_language[language] = by_language.get(language, 0) + n
+            key = bucket - bucket % step
+            point = series.get(key)
+            if point is None:
+                point = series[key] = {"start": key, "total": 0, **{c: 0 for c in CATEGORIES}}
+            point["total"] += n
+            point[category] = point.get(category, 0) + n
+        total = sum(by_category.values())
+        return {
+            "backend": self.backend,
+            "bucket_s": self.bucket,
+            "step_s": step,
+            "since": start,
+            "until": end,
+            "total": total,
+            "by_category": by_category,
+            "by_language": by_language,
+            "productive_ratio": round(by_category["Produtivo"] / total, 4) if total else 0.0,
+            "avg_confidence": {c: round(confidence[c] / by_category[c], 4) if by_category[c] else None
+                               for c in by_category},
+            "series": [series[k] for k in sorted(series)],
+            "pending": self._queue.qsize(),
+        }
+
+    def snapshot(self) -> dict:
+        return {"backend": self.backend, "bucket_s": self.bucket, "queued": self._queue.qsize(),
+                **self.stats.as_dict()}
+
+
+class MemoryHistory(_HistoryStore):
+    """Só os contadores (bucket → {(categoria, idioma): [n, soma]}), sem log."""
+
+    backend = "memory"
+
+    def __init__(self, **kwargs):
+        self._buckets: Dict[int, Dict[Tuple[str, str], List[float]]] = {}
+        self._lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def _write(self, batch: List[Entry], counts: Counts) -> None:
+        with self._lock:
+            for (bucket, category, language), (n, conf_sum) in counts.items():
+                c = self._buckets.setdefault(bucket, {}).setdefault((category, language), [0, 0.0])
+                c[0] += n
+                c[1] += conf_sum
+
+    def _bucket_rows(self, start: int, end: int) -> List[tuple]:
+        with self._lock:
+            if (end - start) // self.bucket <= len(self._buckets):
+                keys = range(start, end, self.bucket)
+            else:  # intervalo maior que o histórico inteiro: percorre só o que existe
+                keys = sorted(b for b in self._buckets if start <= b < end)
+            return [(b, category, language, n, conf_sum)
+                    for b in keys
+                    for (category, language), (n, conf_sum) in self._buckets.get(b, {}).items()]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            buckets = len(self._buckets)
+        return {**super().snapshot(), "buckets": buckets}
+
+
+class SQLiteHistory(_HistoryStore):
+    """Log + contadores num arquivo SQLite (WAL) compartilhado entre processos."""
+
+    backend = "sqlite"
+
+    def __init__(self, path: str = HISTORY_SQLITE_PATH, **kwargs):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = self._connect()  # leituras (/stats); a thread escritora abre a dela
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS history ("
+            " ts INTEGER NOT NULL, category INTEGER NOT NULL, language TEXT NOT NULL, confidence REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS history_buckets ("
+            " bucket INTEGER NOT NULL, category TEXT NOT NULL, language TEXT NOT NULL,"
+            " n INTEGER NOT NULL, confidence_sum REAL NOT NULL,"
+            " PRIMARY KEY (bucket, category, language)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS history_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+        super().__init__(**kwargs)
+        self._check_bucket()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")  # com WAL: perde no máximo a última transação numa queda de energia
+        return db
+
+    def _check_bucket(self) -> None:
+        """Contadores gravados com outro HISTORY_BUCKET são refeitos a partir do log (uma varredura)."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM history_meta WHERE key = 'bucket_s'").fetchone()
+            if row is not None and int(row[0]) == self.bucket:
+                return
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if row is not None:
+                    log.warning("HISTORY_BUCKET mudou de %s para %d s: refazendo os contadores", row[0], self.bucket)
+                self._db.execute("DELETE FROM history_buckets")
+                self._db.execute(
+                    "INSERT INTO history_buckets (bucket, category, language, n, confidence_sum)"
+                    " SELECT ts - ts % :b, CASE category WHEN 1 THEN 'Produtivo' ELSE 'Improdutivo' END,"
+                    "  language, COUNT(*), SUM(confidence) FROM history GROUP BY 1, 2, 3",
+                    {"b": self.bucket},
+                )
+                self._db.execute("INSERT OR REPLACE INTO history_meta (key, value) VALUES ('bucket_s', ?)",
+                                 (str(self.bucket),))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _open_writer(self) -> None:
+        self._wdb = self._connect()
+
+    def _write(self, batch: List[Entry], counts: Counts) -> None:
+        db = self._wdb
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "INSERT INTO history (ts, category, language, confidence) VALUES (?, ?, ?, ?)",
+                [(ts, CATEGORIES.index(category), language, round(conf, 3)) for ts, category, language, conf in batch],
+            )
+            db.executemany(
+                "INSERT INTO history_buckets (bucket, category, language, n, confidence_sum) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (bucket, category, language) DO UPDATE"
+                " SET n = n + excluded.n, confidence_sum = confidence_sum + excluded.confidence_sum",
+                [(b, category, language, n, conf_sum) for (b, category, language), (n, conf_sum) in counts.items()],
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _bucket_rows(self, start: int, end: int) -> List[tuple]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT bucket, category, language, n, confidence_sum FROM history_buckets"
+                " WHERE bucket >= ? AND bucket < ?",
+                (start, end),
+            ).fetchall()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            # log só de acréscimo: o maior rowid é o número de linhas, sem COUNT(*) no log inteiro
+            rows = self._db.execute("SELECT MAX(rowid) FROM history").fetchone()[0] or 0
+            buckets = self._db.execute("SELECT COUNT(DISTINCT bucket) FROM history_buckets").fetchone()[0]
+        return {**super().snapshot(), "path": self.path, "log_rows": rows, "buckets": buckets}
+
+
+_store: Optional[_HistoryStore] = None
+_store_ready = False
+
+
+def get_history() -> Optional[_HistoryStore]:
+    """Instância única conforme HISTORY_BACKEND (memory | sqlite | none)."""
+    global _store, _store_ready
+    if not _store_ready:
+        if HISTORY_BACKEND == "memory":
+            _store = MemoryHistory()
+        elif HISTORY_BACKEND == "sqlite":
+            _store = SQLiteHistory()
+        if _store is not None:
+            atexit.register(_store.close)  # CLIs (ingest, worker): grava o que ficou na fila
+        _store_ready = True
+    return _store
+
+
+def record_result(category: str, confidence: float, language: str, count: int = 1) -> None:
+    store = get_history()
+    if store is not None:
+        store.record(category, language, confidence, count=count)
+
+
+def history_stats() -> dict:
+    store = get_history()
+    return store.snapshot() if store is not None else {"backend": "none"}
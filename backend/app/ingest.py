@@ -0,0 +1,358 @@
+# app/ingest.py
+"""
+Ingestão em lote de caixas de e-mail exportadas (mbox e diretórios de .eml).
+
+- as mensagens são lidas uma a uma (o mbox é varrido linha a linha; nada de
+  carregar o arquivo inteiro), e só `concurrency` ficam em memória ao mesmo tempo;
+- assunto e corpo saem das partes MIME (text/plain, ou text/html sem tags);
+  anexos PDF/TXT passam pelo extrator de app/pdf.py e entram no texto classificado;
+- cada resultado é gravado assim que fica pronto (JSONL ou CSV), e o checkpoint
+  guarda quais mensagens já saíram e o tamanho do arquivo de saída naquele ponto.
+  Ao retomar, a saída é truncada para esse tamanho e as mensagens prontas são puladas:
+  nada se repete nem se perde, mesmo que o processo morra no meio.
+
+    python -m app.ingest export.mbox caixa2/ --out triagem.jsonl --concurrency 8
+    python -m app.ingest export.mbox --out triagem.csv          # mesmo comando retoma
+"""
+import argparse
+import asyncio
+import csv
+import html
+import io
+import json
+import logging
+import os
+import re
+import time
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesParser
+from email.utils import getaddresses
+from typing import Iterator, List, Optional, Set, Tuple
+
+from .config import INGEST_CONCURRENCY, UPLOAD_MAX_BYTES
+from .pdf import aextract_text_from_blob
+from .resilience import LLMUnavailable
+from .triage import triage, decide_language
+from .uploads import SNIFF_BYTES, sniff_kind
+
+log = logging.getLogger("mail-triage.ingest")
+
+CSV_FIELDS = [
+    "seq", "source", "message_id", "date", "from", "subject", "category", "confidence",
+    "language", "suggested_reply", "attachments", "error",
+]
+
+# Linha "From " que abre uma mensagem no mbox; ">From " é a versão escapada (mboxrd)
+_ESCAPED_FROM_RE = re.compile(rb"^>(>*From )")
+_HTML_DROP_RE = re.compile(r"<(script|style|head)\b.*?</\1\s*>", re.I | re.S)
+_HTML_BREAK_RE = re.compile(r"<\s*(br|/p|/div|/li|/tr|/h\d)\b[^>]*>", re.I)
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n\s*\n+")
+
+
+# ===== leitura das fontes =====
+def iter_mbox(path: str) -> Iterator[Tuple[str, bytes]]:
+    """(chave "arquivo#offset", bytes da mensagem), uma por vez."""
+    name = os.path.basename(path)
+    lines: List[bytes] = []
+    start = offset = 0
+    prev_blank = True
+    with open(path, "rb") as f:
+        for line in f:
+            if line.startswith(b"From ") and prev_blank:
+                if lines:
+                    yield f"{name}#{start}", b"".join(lines)
+                lines = []
+                start = offset
+            else:
+                lines.append(_ESCAPED_FROM_RE.sub(rb"\1", line) if line.startswith(b">") else line)
+            offset += len(line)
+            prev_blank = not line.strip()
+    if lines and any(ln.strip() for ln in lines):
+        yield f"{name}#{start}", b"".join(lines)
+
+
+def _is_mbox(path: str) -> bool:
+    if path.lower().endswith(".mbox"):
+        return True
+    with open(path, "rb") as f:
+        return f.read(5) == b"From "
+
+
+def iter_sources(paths: List[str]) -> Iterator[Tuple[str, bytes]]:
+    """Arquivos mbox, arquivos .eml e diretórios (varridos em ordem, recursivamente)."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for fn in sorted(files):
+                    full = os.path.join(root, fn)
+                    rel = os.path.relpath(full, path)
+                    if fn.lower().endswith(".eml"):
+                        with open(full, "rb") as f:
+                            yield rel, f.read()
+                    elif fn.lower().endswith(".mbox"):
+                        yield from iter_mbox(full)
+        elif _is_mbox(path):
+            yield from iter_mbox(path)
+        else:
+            with open(path, "rb") as f:
+                yield os.path.basename(path), f.read()
+
+
+# ===== MIME =====
+def html_to_text(markup: str) -> str:
+    text = _HTML_DROP_RE.sub("", markup)
+    text = _HTML_BREAK_RE.sub("\n", text)
+    text = html.unescape(_HTML_TAG_RE.sub("", text))
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+
+def _part_text(part: EmailMessage) -> str:
+    try:
+        return part.get_content()
+    except (LookupError, UnicodeDecodeError, AssertionError):
+        # charset desconhecido ou inválido
+        payload = part.get_payload(decode=True) or b""
+        return payload.decode("utf-8", errors="replace")
+
+
+def parse_message(raw: bytes) -> dict:
+    """Cabeçalhos, corpo em texto e anexos [(nome, bytes)] de uma mensagem RFC 822."""
+    msg = BytesParser(policy=policy.default).parsebytes(raw)
+    plain, rich, attachments = [], [], []
+    for part in msg.walk():
+        if part.is_multipart():
+            continue
+        filename = part.get_filename()
+        ctype = part.get_content_type()
+        if filename or part.get_content_disposition() == "attachment":
+            attachments.append((filename or "anexo", part.get_payload(decode=True) or b""))
+        elif ctype == "text/plain":
+            plain.append(_part_text(part))
+        elif ctype == "text/html":
+            rich.append(html_to_text(_part_text(part)))
+        elif ctype == "application/pdf":
+            attachments.append(("anexo.pdf", part.get_payload(decode=True) or b""))
+
+    sender = getaddresses([str(msg.get("from", ""))])
+    return {
+        "message_id": str(msg.get("message-id", "")).strip(),
+        "date": str(msg.get("date", "")),
+        "from": sender[0][1] if sender else "",
+        "subject": str(msg.get("subject", "")).strip(),
+        "body": "\n\n".join(p.strip() for p in (plain or rich) if p.strip()),
+        "attachments": attachments,
+    }
+
+
+async def _attachment_text(name: str, blob: bytes) -> Tuple[Optional[str], dict]:
+    """Texto de um anexo PDF/TXT (tipo pelos magic bytes), ou None se não for suportado."""
+    info = {"name": name, "size_bytes": len(blob)}
+    if len(blob) > UPLOAD_MAX_BYTES:
+        return None, {**info, "skipped": "too_large"}
+    kind = sniff_kind(blob[:SNIFF_BYTES])
+    if kind == "txt" and not name.lower().endswith(".txt"):
+        kind = None  # só texto declarado como .txt (evita .csv, .ics, etc.)
+    if kind is None:
+        return None, {**info, "skipped": "unsupported"}
+    try:
+        text, meta = await aextract_text_from_blob(blob, f"anexo.{kind}")
+    except Exception as e:
+        return None, {**info, "skipped": f"error: {e.__class__.__name__}"}
+    return text, {**info, "type": meta.get("type"), "pages": meta.get("pages")}
+
+
+# ===== checkpoint + saída =====
+class Checkpoint:
+    """
+    `done_below`: toda mensagem com seq menor já foi gravada; `done`: as acima
+    disso que também já foram (saem fora de ordem). `out_bytes`: tamanho da
+    saída correspondente — o que passar disso ao retomar é descartado.
+    """
+
+    def __init__(self, path: str, inputs: List[str]):
+        self.path = path
+        self.inputs = inputs
+        self.done_below = 0
+        self.done: Set[int] = set()
+        self.out_bytes = 0
+
+    @classmethod
+    def load(cls, path: str, inputs: List[str]) -> "Checkpoint":
+        cp = cls(path, inputs)
+        if not os.path.exists(path):
+            return cp
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("inputs") != inputs:
+            raise SystemExit(f"checkpoint {path} é de outras entradas: {data.get('inputs')}")
+        cp.done_below = data["done_below"]
+        cp.done = set(data["done"])
+        cp.out_bytes = data["out_bytes"]
+        return cp
+
+    def is_done(self, seq: int) -> bool:
+        return seq < self.done_below or seq in self.done
+
+    def mark(self, seq: int) -> None:
+        self.done.add(seq)
+        while self.done_below in self.done:
+            self.done.discard(self.done_below)
+            self.done_below += 1
+
+    def save(self, out_bytes: int) -> None:
+        self.out_bytes = out_bytes
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"inputs": self.inputs, "done_below": self.done_below,
+                       "done": sorted(self.done), "out_bytes": out_bytes}, f)
+        os.replace(tmp, self.path)
+
+
+class ResultWriter:
+    def __init__(self, path: str, fmt: str, resume_at: int):
+        self.fmt = fmt
+        self.f = open(path, "a+b")
+        self.f.truncate(resume_at)  # descarta linhas gravadas depois do último checkpoint
+        self.f.seek(resume_at)
+        if fmt == "csv" and resume_at == 0:
+            self._write_csv(dict(zip(CSV_FIELDS, CSV_FIELDS)))
+
+    def write(self, row: dict) -> None:
+        if self.fmt == "csv":
+            self._write_csv({**row, "attachments": json.dumps(row.get("attachments") or [], ensure_ascii=False)})
+        else:
+            self.f.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def _write_csv(self, row: dict) -> None:
+        buf = io.StringIO()
+        csv.DictWriter(buf, CSV_FIELDS, extrasaction="ignore").writerow(row)
+        self.f.write(buf.getvalue().encode("utf-8"))
+
+    def flush(self) -> int:
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        return self.f.tell()
+
+    def close(self) -> None:
+        self.f.close()
+
+
+# ===== pipeline =====
+async def triage_message(seq: int, source: str, raw: bytes, max_retries: int = 5) -> dict:
+    row = {"seq": seq, "source": source}
+    try:
+        msg = parse_message(raw)
+    except Exception as e:
+        return {**row, "error": f"mensagem inválida: {e.__class__.__name__}"}
+
+    row.update({k: msg[k] for k in ("message_id", "date", "from", "subject")})
+    parts = [msg["body"]] if msg["body"] else []
+    attachments = []
+    for name, blob in msg["attachments"]:
+        text, info = await _attachment_text(name, blob)
+        attachments.append(info)
+        if text:
+            parts.append(f"[Anexo: {name}]\n{text}")
+    row["attachments"] = attachments
+
+    text = "\n\n".join(parts)
+    if len(text.strip()) < 5:
+        return {**row, "error": "sem texto para classificar"}
+
+    lang = decide_language("auto", f"{msg['subject']}\n{text}", None, None)
+    for attempt in range(max_retries + 1):
+        try:
+            category, confidence, suggested = await triage(text, msg["subject"] or None, lang)
+            break
+        except LLMUnavailable as e:
+            if attempt == max_retries:
+                return {**row, "error": str(e)}
+            await asyncio.sleep(e.retry_after or 2 ** attempt)
+    return {
+        **row,
+        "category": category if category in ("Produtivo", "Improdutivo") else "Produtivo",
+        "confidence": max(0.0, min(1.0, confidence)),
+        "language": lang,
+        "suggested_reply": suggested,
+    }
+
+
+async def ingest(inputs: List[str], out: str, fmt: str = "jsonl", concurrency: int = INGEST_CONCURRENCY,
+                 checkpoint: Optional[str] = None, checkpoint_every: float = 2.0) -> dict:
+    """Classifica todas as mensagens de `inputs`, gravando em `out`; retoma pelo checkpoint."""
+    inputs = [os.path.abspath(p) for p in inputs]
+    cp = Checkpoint.load(checkpoint or out + ".checkpoint", inputs)
+    writer = ResultWriter(out, fmt, cp.out_bytes)
+    stats = {"seen": 0, "skipped": 0, "written": 0, "errors": 0, "attachments": 0}
+    slots = asyncio.Semaphore(max(1, concurrency))
+    pending = set()
+    last_save = time.monotonic()
+
+    def on_done(seq: int, row: dict) -> None:
+        nonlocal last_save
+        writer.write(row)
+        cp.mark(seq)
+        stats["written"] += 1
+        stats["errors"] += bool(row.get("error"))
+        stats["attachments"] += sum("skipped" not in a for a in row.get("attachments") or [])
+        if time.monotonic() - last_save >= checkpoint_every:
+            cp.save(writer.flush())
+            last_save = time.monotonic()
+
+    async def run(seq: int, source: str, raw: bytes) -> None:
+        try:
+            on_done(seq, await triage_message(seq, source, raw))
+        finally:
+            slots.release()
+
+    t0 = time.perf_counter()
+    messages = iter_sources(inputs)
+    try:
+        for seq, (source, raw) in enumerate(messages):
+            stats["seen"] += 1
+            if cp.is_done(seq):
+                stats["skipped"] += 1
+                continue
+            await slots.acquire()  # no máximo `concurrency` mensagens em memória
+            task = asyncio.ensure_future(run(seq, source, raw))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        cp.save(writer.flush())
+        writer.close()
+
+    elapsed = time.perf_counter() - t0
+    processed = stats["seen"] - stats["skipped"]
+    stats["elapsed_s"] = round(elapsed, 2)
+    stats["messages_per_sec"] = round(processed / elapsed, 2) if elapsed else 0.0
+    return stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Triagem em lote de mbox/.eml com checkpoint")
+    ap.add_argument("inputs", nargs="+", help="arquivos .mbox/.eml ou diretórios")
+    ap.add_argument("--out", required=True, help="saída .jsonl ou .csv (acrescenta ao retomar)")
+    ap.add_argument("--format", choices=("jsonl", "csv"), help="padrão: pela extensão de --out")
+    ap.add_argument("--concurrency", type=int, default=INGEST_CONCURRENCY)
+    ap.add_argument("--checkpoint", help="padrão: <out>.checkpoint")
+    ap.add_argument("--checkpoint-every", type=float, default=2.0, help="segundos entre checkpoints")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    fmt = args.format or ("csv" if args.out.lower().endswith(".csv") else "jsonl")
+    stats = asyncio.run(ingest(args.inputs, args.out, fmt, args.concurrency, args.checkpoint, args.checkpoint_every))
+    log.info("ingestão: %s", json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+# app/jobs.py
+"""
+Fila + store de resultados para o fluxo submit/poll (POST /jobs, GET /jobs/{id}).
+
+Cada backend implementa as duas pontas:
+- fila:  submit(kind, payload) → job; claim() → próximo job pronto (marca "running");
+- store: get(id); complete(id, attempt, result); fail(id, attempt, status, error);
+  retry(id, attempt, delay, error).
+
+`attempt` é o `attempts` do job devolvido pelo claim: se a lease venceu e o job
+foi entregue de novo, só a entrega mais recente consegue finalizá-lo (as
+chamadas devolvem False para as outras), e um resultado nunca sobrescreve outro.
+
+Estados: queued → running → done | error. Um job "running" cuja lease
+(JOBS_LEASE) venceu — worker morreu — volta a ser entregue pelo claim().
+MemoryJobStore só serve com o worker no mesmo processo; SQLiteJobStore é
+compartilhado entre a API e processos `python -m app.worker` na mesma máquina;
+DynamoJobStore (tabela DynamoDB + fila SQS) é o da Lambda, onde a API só
+enfileira e o worker é outra função, disparada pela fila (worker_handler.py).
+"""
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from decimal import Decimal
+from typing import Optional
+
+from .config import (
+    JOBS_BACKEND, JOBS_SQLITE_PATH, JOBS_DYNAMODB_TABLE, JOBS_SQS_QUEUE_URL, JOBS_LEASE, JOBS_TTL,
+)
+
+_PUBLIC_FIELDS = ("id", "kind", "status", "attempts", "created_at", "started_at", "finished_at", "result", "error")
+
+
+def public_view(job: dict) -> dict:
+    """O que o GET /jobs/{id} expõe (sem o payload, que pode ser grande)."""
+    return {k: job.get(k) for k in _PUBLIC_FIELDS if job.get(k) is not None}
+
+
+def _new_job(kind: str, payload: dict, now: float) -> dict:
+    return {
+        "id": uuid.uuid4().hex, "kind": kind, "payload": payload, "status": "queued",
+        "attempts": 0, "available_at": now, "created_at": now,
+        "started_at": None, "finished_at": None, "result": None, "error": None,
+    }
+
+
+class MemoryJobStore:
+    def __init__(self, lease: float = JOBS_LEASE, ttl: float = JOBS_TTL):
+        self.lease = lease
+        self.ttl = ttl
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._pending: "deque[str]" = deque()
+        self._running: set = set()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, payload: dict) -> dict:
+        job = _new_job(kind, payload, time.time())
+        with self._lock:
+            self._purge(job["created_at"])
+            self._jobs[job["id"]] = job
+            self._pending.append(job["id"])
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def claim(self) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            stale = next((i for i in self._running if self._jobs[i]["started_at"] < now - self.lease), None)
+            if stale is not None:
+                return self._start(self._jobs[stale], now)
+            for _ in range(len(self._pending)):
+                job = self._jobs.get(self._pending.popleft())
+                if job is None or job["status"] != "queued":
+                    continue
+                if job["available_at"] <= now:
+                    return self._start(job, now)
+                self._pending.append(job["id"])  # em backoff: volta para o fim
+        return None
+
+    def _start(self, job: dict, now: float) -> dict:
+        job.update(status="running", started_at=now, attempts=job["attempts"] + 1)
+        self._running.add(job["id"])
+        return dict(job)
+
+    def complete(self, job_id: str, attempt: int, result: dict) -> bool:
+        return self._finish(job_id, attempt, status="done", result=result)
+
+    def fail(self, job_id: str, attempt: int, status: int, error: str) -> bool:
+        return self._finish(job_id, attempt, status="error", error={"status": status, "detail": error})
+
+    def retry(self, job_id: str, attempt: int, delay: float, error: str) -> bool:
+        with self._lock:
+            job = self._owned(job_id, attempt)
+            if job is None:
+                return False
+            job.update(status="queued", available_at=time.time() + delay, error={"status": 503, "detail": error})
+            self._running.discard(job_id)
+            self._pending.append(job_id)
+            return True
+
+    def _owned(self, job_id: str, attempt: int) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is None or job["status"] != "running" or job["attempts"] != attempt:
+            return None
+        return job
+
+    def _finish(self, job_id: str, attempt: int, **fields) -> bool:
+        with self._lock:
+            job = self._owned(job_id, attempt)
+            if job is None:
+                return False
+            job.update(finished_at=time.time(), payload=None, **fields)
+            self._running.discard(job_id)
+            return True
+
+    def _purge(self, now: float) -> None:
+        # Jobs em ordem de criação: remove finalizados antigos do começo
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if job["created_at"] >= now - self.ttl or job["status"] not in ("done", "error"):
+                break
+            self._jobs.popitem(last=False)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"backend": "memory", **counts}
+
+
+class SQLiteJobStore:
+    """Fila/store compartilhados entre processos (API + workers) na mesma máquina."""
+
+    def __init__(self, path: str = JOBS_SQLITE_PATH, lease: float = JOBS_LEASE, ttl: float = JOBS_TTL):
+        self.path = path
+        self.lease = lease
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT, status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, available_at REAL NOT NULL, created_at REAL NOT NULL,"
+            " started_at REAL, finished_at REAL, result TEXT, error TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs(status, available_at)")
+
+    def submit(self, kind: str, payload: dict) -> dict:
+        job = _new_job(kind, payload, time.time())
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'error') AND finished_at < ?", (job["created_at"] - self.ttl,)
+            )
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, payload, status, attempts, available_at, created_at)"
+                " VALUES (?, ?, ?, 'queued', 0, ?, ?)",
+                (job["id"], kind, json.dumps(payload, ensure_ascii=False), job["available_at"], job["created_at"]),
+            )
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            cur = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cur.fetchone()
+            return self._row(cur, row) if row is not None else None
+
+    def claim(self) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            # SELECT + UPDATE na mesma transação com trava de escrita: dois workers
+            # nunca pegam o mesmo job (sem UPDATE ... RETURNING, que exige SQLite 3.35+)
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id FROM jobs"
+                    " WHERE (status = 'queued' AND available_at <= ?) OR (status = 'running' AND started_at < ?)"
+                    " ORDER BY available_at LIMIT 1",
+                    (now, now - self.lease),
+                ).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+                self._db.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    (now, row[0]),
+                )
+                cur = self._db.execute("SELECT * FROM jobs WHERE id = ?", (row[0],))
+                job = self._row(cur, cur.fetchone())
+                self._db.execute("COMMIT")
+                return job
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def complete(self, job_id: str, attempt: int, result: dict) -> bool:
+        return self._finish(job_id, attempt, "done", result=json.dumps(result, ensure_ascii=False))
+
+    def fail(self, job_id: str, attempt: int, status: int, error: str) -> bool:
+        return self._finish(job_id, attempt, "error",
+                            error=json.dumps({"status": status, "detail": error}, ensure_ascii=False))
+
+    def retry(self, job_id: str, attempt: int, delay: float, error: str) -> bool:
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE jobs SET status = 'queued', available_at = ?, error = ?"
+                " WHERE id = ? AND status = 'running' AND attempts = ?",
+                (time.time() + delay, json.dumps({"status": 503, "detail": error}, ensure_ascii=False),
+                 job_id, attempt),
+            )
+            return cur.rowcount == 1
+
+    def _finish(self, job_id: str, attempt: int, status: str,
+                result: Optional[str] = None, error: Optional[str] = None) -> bool:
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ?, payload = NULL"
+                " WHERE id = ? AND status = 'running' AND attempts = ?",
+                (status, time.time(), result, error, job_id, attempt),
+            )
+            return cur.rowcount == 1
+
+    @staticmethod
+    def _row(cur, row) -> dict:
+        job = dict(zip((c[0] for c in cur.description), row))
+        for k in ("payload", "result", "error"):
+            if job[k] is not None:
+                job[k] = json.loads(job[k])
+        return job
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {"backend": "sqlite", "path": self.path, **counts}
+
+
+SQS_MAX_DELAY = 900  # DelaySeconds máximo do SQS
+
+
+class DynamoJobStore:
+    """
+    Estado e resultados numa tabela DynamoDB (chave `id`, TTL em `expires_at`);
+    a fila SQS leva só os ids a processar.
+
+    A Lambda worker recebe as mensagens pelo gatilho SQS e chama `claim_id`;
+    `claim` atende `python -m app.worker` fora da Lambda. A mensagem só sai da fila
+    quando a entrega termina: se o worker morrer, o SQS a entrega de novo depois do
+    visibility timeout (>= JOBS_LEASE) e a lease vencida libera o claim.
+    """
+
+    def __init__(self, table: str = JOBS_DYNAMODB_TABLE, queue_url: str = JOBS_SQS_QUEUE_URL,
+                 lease: float = JOBS_LEASE, ttl: float = JOBS_TTL):
+        import boto3  # só este backend usa o boto3 (já vem no runtime da Lambda)
+
+        if not table or not queue_url:
+            raise RuntimeError("JOBS_BACKEND=dynamodb exige JOBS_DYNAMODB_TABLE e JOBS_SQS_QUEUE_URL")
+        self.table = table
+        self.queue_url = queue_url
+        self.lease = lease
+        self.ttl = ttl
+        self._table = boto3.resource("dynamodb").Table(table)
+        self._sqs = boto3.client("sqs")
+        self._conflict = self._table.meta.client.exceptions.ConditionalCheckFailedException
+        self._receipts: dict = {}  # (id, attempt) → mensagem SQS de uma entrega do claim()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, payload: dict) -> dict:
+        job = _new_job(kind, payload, time.time())
+        now = job["created_at"]
+        self._table.put_item(Item={
+            "id": job["id"], "kind": kind, "payload": json.dumps(payload, ensure_ascii=False),
+            "status": "queued", "attempts": 0, "available_at": _dec(now), "created_at": _dec(now),
+            "expires_at": int(now + self.ttl),
+        })
+        self._sqs.send_message(QueueUrl=self.queue_url, MessageBody=job["id"])
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        item = self._table.get_item(Key={"id": job_id}, ConsistentRead=True).get("Item")
+        return self._row(item) if item is not None else None
+
+    def claim_id(self, job_id: str) -> Optional[dict]:
+        """Pega o job da mensagem; None se ele já terminou, está em backoff ou com outro worker."""
+        now = time.time()
+        update = "SET #status = :running, #started_at = :now ADD #attempts :one"
+        condition = "(#status = :queued AND #available_at <= :now) OR (#status = :running AND #started_at < :stale)"
+        try:
+            item = self._table.update_item(
+                Key={"id": job_id},
+                UpdateExpression=update,
+                ConditionExpression=condition,
+                ExpressionAttributeNames=_names(update, condition),
+                ExpressionAttributeValues={":running": "running", ":queued": "queued", ":one": 1,
+                                           ":now": _dec(now), ":stale": _dec(now - self.lease)},
+                ReturnValues="ALL_NEW",
+            )["Attributes"]
+        except self._conflict:
+            return None
+        return self._row(item)
+
+    def claim(self) -> Optional[dict]:
+        msgs = self._sqs.receive_message(QueueUrl=self.queue_url, MaxNumberOfMessages=1,
+                                         VisibilityTimeout=int(self.lease)).get("Messages", [])
+        if not msgs:
+            return None
+        job = self.claim_id(msgs[0]["Body"])
+        if job is None:
+            self._delete(msgs[0]["ReceiptHandle"])
+            return None
+        with self._lock:
+            self._receipts[(job["id"], job["attempts"])] = msgs[0]["ReceiptHandle"]
+        return job
+
+    def complete(self, job_id: str, attempt: int, result: dict) -> bool:
+        return self._finish(job_id, attempt, "done", result=json.dumps(result, ensure_ascii=False))
+
+    def fail(self, job_id: str, attempt: int, status: int, error: str) -> bool:
+        return self._finish(job_id, attempt, "error",
+                            error=json.dumps({"status": status, "detail": error}, ensure_ascii=False))
+
+    def retry(self, job_id: str, attempt: int, delay: float, error: str) -> bool:
+        # A mensagem nova chega com o atraso; o SQS não atrasa mais que 15 min
+        delay = min(max(0.0, delay), SQS_MAX_DELAY)
+        won = self._update(job_id, attempt, "SET #status = :queued, #available_at = :at, #error = :error",
+                           {":queued": "queued", ":at": _dec(time.time() + delay),
+                            ":error": json.dumps({"status": 503, "detail": error}, ensure_ascii=False)})
+        if won:
+            self._sqs.send_message(QueueUrl=self.queue_url, MessageBody=job_id, DelaySeconds=math.ceil(delay))
+        self._ack(job_id, attempt)
+        return won
+
+    def _finish(self, job_id: str, attempt: int, status: str, **fields) -> bool:
+        now = time.time()
+        sets = ", ".join(f"#{k} = :{k}" for k in fields)
+        won = self._update(job_id, attempt,
+                           f"SET #status = :status, #finished_at = :now, #expires_at = :expires, {sets} REMOVE #payload",
+                           {":status": status, ":now": _dec(now), ":expires": int(now + self.ttl),
+                            **{f":{k}": v for k, v in fields.items()}})
+        self._ack(job_id, attempt)
+        return won
+
+    def _update(self, job_id: str, attempt: int, expression: str, values: dict) -> bool:
+        """UPDATE só se `attempt` ainda for a entrega corrente (mesma regra dos outros stores)."""
+        condition = "#status = :running AND #attempts = :attempt"
+        try:
+            self._table.update_item(
+                Key={"id": job_id},
+                UpdateExpression=expression,
+                ConditionExpression=condition,
+                ExpressionAttributeNames=_names(expression, condition),
+                ExpressionAttributeValues={":running": "running", ":attempt": attempt, **values},
+            )
+        except self._conflict:
+            return False
+        return True
+
+    def _ack(self, job_id: str, attempt: int) -> None:
+        with self._lock:
+            receipt = self._receipts.pop((job_id, attempt), None)
+        if receipt is not None:
+            self._delete(receipt)
+
+    def _delete(self, receipt: str) -> None:
+        try:
+            self._sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt)
+        except Exception:  # recibo vencido: a mensagem volta e o claim_id a descarta
+            pass
+
+    @staticmethod
+    def _row(item: dict) -> dict:
+        job = {k: None for k in ("started_at", "finished_at", "payload", "result", "error")}
+        for k, v in item.items():
+            if isinstance(v, Decimal):
+                v = int(v) if k == "attempts" else float(v)
+            job[k] = v
+        for k in ("payload", "result", "error"):
+            if job[k] is not None:
+                job[k] = json.loads(job[k])
+        return job
+
+    def snapshot(self) -> dict:
+        # Contar jobs por status exigiria varrer a tabela: mostra a fila
+        attrs = self._sqs.get_queue_attributes(QueueUrl=self.queue_url, AttributeNames=[
+            "ApproximateNumberOfMessages", "ApproximateNumberOfMessagesNotVisible", "ApproximateNumberOfMessagesDelayed",
+        ]).get("Attributes", {})
+        return {
+            "backend": "dynamodb", "table": self.table,
+            "queued": int(attrs.get("ApproximateNumberOfMessages", 0)),
+            "in_flight": int(attrs.get("ApproximateNumberOfMessagesNotVisible", 0)),
+            "delayed": int(attrs.get("ApproximateNumberOfMessagesDelayed", 0)),
+        }
+
+
+def _names(*expressions: str) -> dict:
+    """Os #atributos das expressões (vários são palavras reservadas no DynamoDB, e nomes sobrando dão erro)."""
+    return {f"#{a}": a for a in re.findall(r"#(\w+)", " ".join(expressions))}
+
+
+def _dec(value: float) -> Decimal:
+    return Decimal(str(round(value, 6)))
+
+
+_store = None
+
+
+def get_job_store():
+    """Instância única conforme JOBS_BACKEND (memory | sqlite | dynamodb)."""
+    global _store
+    if _store is None:
+        if JOBS_BACKEND == "dynamodb":
+            _store = DynamoJobStore()
+        elif JOBS_BACKEND == "sqlite":
+            _store = SQLiteJobStore()
+        else:
+            _store = MemoryJobStore()
+    return _store
+
+
+def job_stats() -> dict:
+    return get_job_store().snapshot()
@@ -0,0 +1,244 @@
+# app/langid.py
+"""
+Identificação de idioma local (sem rede) por trigramas de caracteres.
+
+Modelo: Naive Bayes multinomial sobre trigramas das palavras (letras
+minúsculas, com espaço nas bordas: " obrigado " → " ob", "obr", ..., "do ").
+Os perfis (log P(trigrama | idioma) + piso para trigramas não vistos) são
+pré-computados em `app/langid_profiles.json` a partir de `data/langid/<idioma>.txt`.
+
+Só olha uma amostra limitada do começo do texto (`LANGID_SAMPLE_CHARS` letras,
+sem URLs/e-mails): o custo não cresce com PDFs longos. A confiança é a
+posterior normalizada, com a evidência limitada a `EVIDENCE_GRAMS` trigramas
+para não saturar em 1.0 com qualquer parágrafo.
+
+Detecta mais idiomas do que as respostas suportam (`LANG_MAP`); `REPLY_LANG`
+leva cada um ao idioma de resposta mais próximo.
+
+    python -m app.langid build data/langid --out app/langid_profiles.json
+    python -m app.langid eval  data/langid_eval.jsonl
+"""
+import argparse
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+from itertools import repeat
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .config import LANGID_PROFILES_PATH, LANGID_SAMPLE_CHARS
+
+# Idioma detectado → idioma da resposta (chave de LANG_MAP). Românicas do sul
+# ficam com pt; francês e alemão com en, a língua franca mais provável.
+REPLY_LANG = {"pt": "pt", "es": "pt", "it": "pt", "en": "en", "fr": "en", "de": "en"}
+
+EVIDENCE_GRAMS = 20
+_SMOOTHING = 0.5
+
+_NOISE_RE = re.compile(r"\S*(?:@|://|www\.)\S*")
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+def sample_text(text: str, max_chars: int = LANGID_SAMPLE_CHARS) -> str:
+    """Palavras do começo do texto, minúsculas e separadas por espaço, até ~max_chars."""
+    # corta antes das regex: ruído (URLs, números, pontuação) raramente passa de 2x
+    raw = (text or "")[:max_chars * 2].lower()
+    if "@" in raw or "://" in raw or "www." in raw:
+        raw = _NOISE_RE.sub(" ", raw)
+    words = _WORD_RE.findall(raw)
+    out: List[str] = []
+    size = 0
+    for w in words:
+        out.append(w)
+        size += len(w) + 1
+        if size >= max_chars:
+            break
+    return " ".join(out)
+
+
+def trigrams(sample: str) -> List[str]:
+    if not sample:
+        return []
+    s = f" {sample} "
+    return list(map("".join, zip(s, s[1:], s[2:])))
+
+
+class LangId:
+    def __init__(self, tables: Dict[str, Dict[str, float]], floors: Dict[str, float]):
+        self.tables = tables
+        self.floors = floors
+        self.languages = tuple(sorted(tables))
+        # trigrama → log-probs de todos os idiomas: um lookup por trigrama em vez de um por idioma
+        self._floor = tuple(floors[lang] for lang in self.languages)
+        self._merged = {
+            g: tuple(tables[lang].get(g, floors[lang]) for lang in self.languages)
+            for g in set().union(*tables.values())
+        }
+
+    def scores(self, grams: List[str]) -> Dict[str, float]:
+        """Log-verossimilhança de cada idioma."""
+        rows = map(self._merged.get, grams, repeat(self._floor, len(grams)))
+        return dict(zip(self.languages, map(sum, zip(*rows))))
+
+    def detect(self, text: str, max_chars: int = LANGID_SAMPLE_CHARS) -> Tuple[Optional[str], float]:
+        """(idioma, confiança); (None, 0.0) quando não há letras para olhar."""
+        grams = trigrams(sample_text(text, max_chars))
+        if not grams:
+            return None, 0.0
+        scores = self.scores(grams)
+        scale = min(len(grams), EVIDENCE_GRAMS) / len(grams)
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        total = sum(math.exp((s - top) * scale) for s in scores.values())
+        return best, 1.0 / total
+
+    @classmethod
+    def fit(cls, texts: Dict[str, Iterable[str]], min_count: int = 1) -> "LangId":
+        tables, floors = {}, {}
+        vocab = set()
+        counts = {}
+        for lang, lines in texts.items():
+            c = Counter()
+            for line in lines:
+                c.update(trigrams(sample_text(line, max_chars=len(line))))
+            counts[lang] = c
+            vocab.update(c)
+        v = len(vocab)
+        for lang, c in counts.items():
+            denom = math.log(sum(c.values()) + _SMOOTHING * v)
+            tables[lang] = {g: round(math.log(k + _SMOOTHING) - denom, 3)
+                            for g, k in c.items() if k >= min_count}
+            floors[lang] = round(math.log(_SMOOTHING) - denom, 3)
+        return cls(tables, floors)
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"floors": self.floors, "tables": self.tables}, f, ensure_ascii=False,
+                      separators=(",", ":"), sort_keys=True)
+
+    @classmethod
+    def load(cls, path: str) -> "LangId":
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+        return cls(raw["tables"], {k: float(x) for k, x in raw["floors"].items()})
+
+
+class LangIdStats:
+    def __init__(self):
+        self.detected: Dict[str, int] = {}
+        self.low_confidence = 0
+        self.empty = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "model_loaded": get_langid() is not None,
+            "sample_chars": LANGID_SAMPLE_CHARS,
+            "detected": dict(self.detected),
+            "low_confidence": self.low_confidence,
+            "empty": self.empty,
+        }
+
+
+_stats = LangIdStats()
+_model: Optional[LangId] = None
+_model_ready = False
+
+
+def get_langid() -> Optional[LangId]:
+    global _model, _model_ready
+    if not _model_ready:
+        _model_ready = True
+        if os.path.exists(LANGID_PROFILES_PATH):
+            try:
+                _model = LangId.load(LANGID_PROFILES_PATH)
+            except (OSError, ValueError, KeyError):
+                _model = None
+    return _model
+
+
+def detect_language(text: str, min_confidence: float = 0.0) -> Tuple[Optional[str], float]:
+    """
+    (idioma detectado, confiança) com o perfil embarcado. Idioma None quando
+    não há perfil, o texto não tem letras ou a confiança fica abaixo de min_confidence.
+    """
+    model = get_langid()
+    if model is None:
+        return None, 0.0
+    lang, conf = model.detect(text)
+    if lang is None:
+        _stats.empty += 1
+        return None, 0.0
+    if conf < min_confidence:
+        _stats.low_confidence += 1
+        return None, conf
+    _stats.detected[lang] = _stats.detected.get(lang, 0) + 1
+    return lang, conf
+
+
+def langid_stats() -> dict:
+    return _stats.snapshot()
+
+
+# ===== CLI de build/avaliação =====
+def _read_corpus(directory: str) -> Dict[str, List[str]]:
+    texts = {}
+    for name in sorted(os.listdir(directory)):
+        lang, ext = os.path.splitext(name)
+        if ext == ".txt":
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                texts[lang] = [ln.strip() for ln in f if ln.strip()]
+    return texts
+
+
+def evaluate(model: LangId, rows: Iterable[dict], max_chars: int = LANGID_SAMPLE_CHARS) -> dict:
+    total = correct = reply_correct = 0
+    elapsed = 0.0
+    confusion: Dict[str, Dict[str, int]] = {}
+    for r in rows:
+        t0 = time.perf_counter()
+        lang, _ = model.detect(r["text"], max_chars)
+        elapsed += time.perf_counter() - t0
+        total += 1
+        correct += lang == r["lang"]
+        reply_correct += REPLY_LANG.get(lang or "", "pt") == REPLY_LANG.get(r["lang"], "pt")
+        if lang != r["lang"]:
+            row = confusion.setdefault(r["lang"], {})
+            row[lang or "-"] = row.get(lang or "-", 0) + 1
+    return {
+        "samples": total,
+        "accuracy": round(correct / total, 4) if total else 0.0,
+        "reply_accuracy": round(reply_correct / total, 4) if total else 0.0,
+        "us_per_text": round(elapsed / total * 1e6, 1) if total else 0.0,
+        "errors": confusion,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build/avaliação dos perfis de idioma")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build")
+    b.add_argument("corpus", help="diretório com <idioma>.txt")
+    b.add_argument("--out", default=LANGID_PROFILES_PATH)
+    b.add_argument("--min-count", type=int, default=1, help="descarta trigramas mais raros que isso")
+    e = sub.add_parser("eval")
+    e.add_argument("data", help='JSONL com {"text", "lang"}')
+    e.add_argument("--profiles", default=LANGID_PROFILES_PATH)
+    e.add_argument("--sample-chars", type=int, default=LANGID_SAMPLE_CHARS)
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        texts = _read_corpus(args.corpus)
+        model = LangId.fit(texts, min_count=args.min_count)
+        model.save(args.out)
+        sizes = ", ".join(f"{k}={len(v)}" for k, v in sorted(model.tables.items()))
+        print(f"perfis salvos em {args.out} ({sizes} trigramas)")
+    else:
+        with open(args.data, encoding="utf-8") as f:
+            rows = [json.loads(ln) for ln in f if ln.strip()]
+        print(evaluate(LangId.load(args.profiles), rows, args.sample_chars))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# app/local_classifier.py
+"""
+Pré-classificador local (CPU, sem rede) para pular a OpenAI nos casos óbvios.
+
+Features: unigramas + bigramas dos tokens de `preprocess`, com hashing
+(crc32 → N_FEATURES buckets). Modelo: regressão logística treinada por SGD.
+Saída: P(Improdutivo). Só decide localmente quando a confiança passa de
+LOCAL_CONFIDENCE_THRESHOLD; caso contrário a triagem escala para o LLM.
+
+Treino/avaliação (o eval treina e mede em dobras separadas: nunca mede o
+modelo nos e-mails em que ele treinou):
+    python -m app.local_classifier train data/labeled_seed.jsonl --out app/local_model.json
+    python -m app.local_classifier eval  data/labeled_seed.jsonl --folds 5 --thresholds 0.8,0.9,0.95
+    python -m app.local_classifier eval  novos_rotulados.jsonl --model app/local_model.json
+"""
+import argparse
+import json
+import math
+import os
+import random
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .config import LOCAL_CLASSIFIER, LOCAL_MODEL_PATH, LOCAL_CONFIDENCE_THRESHOLD
+from .cache import normalize_for_key
+from .nlp import preprocess
+
+N_FEATURES = 1 << 18
+
+
+def features(subject: Optional[str], body: str) -> Dict[int, float]:
+    tokens = preprocess(f"{subject or ''}\n{body or ''}")
+    grams = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+    if not grams:
+        return {}
+    feats: Dict[int, float] = {}
+    for g in grams:
+        h = zlib.crc32(g.encode("utf-8")) & (N_FEATURES - 1)
+        feats[h] = 1.0
+    norm = 1.0 / math.sqrt(len(feats))
+    return {h: norm for h in feats}
+
+
+def _sigmoid(z: float) -> float:
+    if z < -30:
+        return 0.0
+    if z > 30:
+        return 1.0
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+class LocalClassifier:
+    def __init__(self, weights: Optional[Dict[int, float]] = None, bias: float = 0.0):
+        self.weights = weights or {}
+        self.bias = bias
+
+    def prob_improdutivo(self, subject: Optional[str], body: str) -> float:
+        w = self.weights
+        z = self.bias + sum(w.get(h, 0.0) * v for h, v in features(subject, body).items())
+        return _sigmoid(z)
+
+    def predict(self, subject: Optional[str], body: str) -> Tuple[str, float]:
+        p = self.prob_improdutivo(subject, body)
+        return ("Improdutivo", p) if p >= 0.5 else ("Produtivo", 1.0 - p)
+
+    def fit(self, samples: List[dict], epochs: int = 30, lr: float = 0.5, l2: float = 1e-4, seed: int = 13):
+        data = [(features(s.get("subject"), s["body"]), 1.0 if s["category"] == "Improdutivo" else 0.0)
+                for s in samples]
+        rnd = random.Random(seed)
+        w = self.weights
+        for _ in range(epochs):
+            rnd.shuffle(data)
+            for feats, y in data:
+                z = self.bias + sum(w.get(h, 0.0) * v for h, v in feats.items())
+                g = _sigmoid(z) - y
+                for h, v in feats.items():
+                    w[h] = w.get(h, 0.0) * (1.0 - lr * l2) - lr * g * v
+                self.bias -= lr * g
+        self.weights = {h: round(x, 6) for h, x in w.items() if abs(x) > 1e-6}
+        return self
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"n_features": N_FEATURES, "bias": self.bias,
+                       "weights": {str(h): x for h, x in self.weights.items()}}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "LocalClassifier":
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+        if raw.get("n_features") != N_FEATURES:
+            raise ValueError("Modelo local incompatível com N_FEATURES")
+        return cls({int(h): float(x) for h, x in raw["weights"].items()}, float(raw["bias"]))
+
+
+class LocalStats:
+    def __init__(self):
+        self.resolved = {"Produtivo": 0, "Improdutivo": 0}
+        self.escalated = 0
+
+    def snapshot(self) -> dict:
+        local = sum(self.resolved.values())
+        total = local + self.escalated
+        return {
+            "enabled": get_local_classifier() is not None,
+            "threshold": LOCAL_CONFIDENCE_THRESHOLD,
+            "resolved_local": dict(self.resolved),
+            "escalated_llm": self.escalated,
+            "local_share": round(local / total, 4) if total else 0.0,
+        }
+
+
+_stats = LocalStats()
+_model: Optional[LocalClassifier] = None
+_model_ready = False
+
+
+def get_local_classifier() -> Optional[LocalClassifier]:
+    global _model, _model_ready
+    if not _model_ready:
+        _model_ready = True
+        if LOCAL_CLASSIFIER and os.path.exists(LOCAL_MODEL_PATH):
+            try:
+                _model = LocalClassifier.load(LOCAL_MODEL_PATH)
+            except (OSError, ValueError, KeyError):
+                _model = None
+    return _model
+
+
+def classify_local(subject: Optional[str], body: str) -> Optional[Tuple[str, float]]:
+    """(categoria, confiança) quando o modelo local é confiável o bastante; senão None."""
+    model = get_local_classifier()
+    if model is None:
+        return None
+    cat, conf = model.predict(subject, body)
+    if conf >= LOCAL_CONFIDENCE_THRESHOLD:
+        _stats.resolved[cat] += 1
+        return cat, conf
+    _stats.escalated += 1
+    return None
+
+
+def local_stats() -> dict:
+    return _stats.snapshot()
+
+
+# ===== CLI de treino/avaliação =====
+def _read_jsonl(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(ln) for ln in f if ln.strip()]
+
+
+def _groups(rows: List[dict], seed: int) -> List[List[dict]]:
+    """Cópias do mesmo corpo (normalizado) juntas, em ordem aleatória: treino e teste nunca dividem um e-mail."""
+    groups: Dict[str, List[dict]] = {}
+    for r in rows:
+        groups.setdefault(normalize_for_key(r["body"]), []).append(r)
+    order = list(groups.values())
+    random.Random(seed).shuffle(order)
+    return order
+
+
+def _split(rows: List[dict], holdout: float, seed: int = 7) -> Tuple[List[dict], List[dict]]:
+    train, test = [], []
+    for g in _groups(rows, seed):
+        (train if len(train) < len(rows) * (1.0 - holdout) else test).extend(g)
+    return train, test
+
+
+def evaluate(model: LocalClassifier, rows: Iterable[dict], threshold: float) -> dict:
+    total = correct = resolved = resolved_correct = 0
+    elapsed = 0.0
+    for r in rows:
+        t0 = time.perf_counter()
+        cat, conf = model.predict(r.get("subject"), r["body"])
+        elapsed += time.perf_counter() - t0
+        total += 1
+        correct += cat == r["category"]
+        if conf >= threshold:
+            resolved += 1
+            resolved_correct += cat == r["category"]
+    return {
+        "samples": total,
+        "accuracy": round(correct / total, 4) if total else 0.0,
+        "local_share": round(resolved / total, 4) if total else 0.0,
+        "local_accuracy": round(resolved_correct / resolved, 4) if resolved else 0.0,
+        "us_per_email": round(elapsed / total * 1e6, 1) if total else 0.0,
+    }
+
+
+def _folds(rows: List[dict], k: int, seed: int = 7) -> List[Tuple[List[dict], List[dict]]]:
+    order = _groups(rows, seed)
+    k = max(2, min(k, len(order)))
+    parts = [[r for g in order[i::k] for r in g] for i in range(k)]
+    return [([r for j, p in enumerate(parts) if j != i for r in p], parts[i]) for i in range(k)]
+
+
+def cross_validate(rows: List[dict], thresholds: List[float], folds: int = 5, epochs: int = 30) -> dict:
+    """
+    k-fold: cada e-mail é previsto por um modelo que não viu nem ele nem cópias
+    dele no treino. As
+    previsões fora da dobra valem para todos os limiares, então a escolha de
+    LOCAL_CONFIDENCE_THRESHOLD não é inflada por e-mails memorizados.
+    """
+    predictions = []
+    parts = _folds(rows, folds)
+    for train, test in parts:
+        model = LocalClassifier().fit(train, epochs=epochs)
+        predictions += [(model.predict(r.get("subject"), r["body"]), r["category"]) for r in test]
+    total = len(predictions)
+    out = {"samples": total, "folds": len(parts),
+           "accuracy": round(sum(cat == y for (cat, _), y in predictions) / total, 4) if total else 0.0,
+           "thresholds": {}}
+    for th in thresholds:
+        local = [(cat, y) for (cat, conf), y in predictions if conf >= th]
+        out["thresholds"][th] = {
+            "local_share": round(len(local) / total, 4) if total else 0.0,
+            "local_accuracy": round(sum(cat == y for cat, y in local) / len(local), 4) if local else 0.0,
+        }
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Treino/avaliação do pré-classificador local")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    t = sub.add_parser("train")
+    t.add_argument("data")
+    t.add_argument("--out", default=LOCAL_MODEL_PATH)
+    t.add_argument("--epochs", type=int, default=30)
+    t.add_argument("--holdout", type=float, default=0.2)
+    t.add_argument("--threshold", type=float, default=LOCAL_CONFIDENCE_THRESHOLD)
+    e = sub.add_parser("eval")
+    e.add_argument("data")
+    e.add_argument("--folds", type=int, default=5)
+    e.add_argument("--epochs", type=int, default=30)
+    e.add_argument("--thresholds", type=lambda v: [float(x) for x in v.split(",")],
+                   default=[0.7, 0.8, 0.9, LOCAL_CONFIDENCE_THRESHOLD, 0.95, 0.99])
+    e.add_argument("--model", default=None,
+                   help="mede um modelo salvo em vez do k-fold (só com dados fora do treino dele)")
+    e.add_argument("--threshold", type=float, default=LOCAL_CONFIDENCE_THRESHOLD, help="limiar com --model")
+    args = ap.parse_args()
+
+    rows = _read_jsonl(args.data)
+    if args.cmd == "train":
+        train, test = _split(rows, args.holdout)
+        print("holdout:", evaluate(LocalClassifier().fit(train, epochs=args.epochs), test, args.threshold))
+        model = LocalClassifier().fit(rows, epochs=args.epochs)
+        model.save(args.out)
+        print(f"modelo salvo em {args.out} ({len(model.weights)} pesos, {len(rows)} amostras)")
+    elif args.model:
+        print(evaluate(LocalClassifier.load(args.model), rows, args.threshold))
+    else:
+        thresholds = sorted(set(args.thresholds))
+        print(json.dumps(cross_validate(rows, thresholds, args.folds, args.epochs), indent=2))
+
+
+if __name__ == "__main__":
+    main()
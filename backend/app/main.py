@@ -1,14 +1,58 @@
 # app/main.py
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Header
+import asyncio
+import json
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from pydantic import ValidationError
+from starlette.datastructures import UploadFile as FormFile
 from typing import Optional
-from .models import ClassifyRequest, ClassifyResponse
+from .models import ClassifyRequest, ClassifyResponse, ClassifyBatchRequest
 from .nlp import preprocess
-from .config import ALLOWED_ORIGINS, ALLOW_DEBUG
-from .pdf import extract_text_from_blob
-from .openai_client import classify_only, generate_reply
+from .config import (
+    ALLOWED_ORIGINS, ALLOW_DEBUG, BATCH_MAX_ITEMS, BATCH_MAX_CONCURRENCY, UPLOAD_MAX_BYTES,
+    JOBS_INLINE_WORKER, JOBS_POLL_INTERVAL, TRACING_ENABLED,
+)
+from .pdf import aextract_text_from_file
+from .uploads import UploadLimitMiddleware, SNIFF_BYTES, sniff_kind, file_size, in_memory, process_peak_rss_mb
+from .openai_client import client_stats, resilience_stats
+from .resilience import LLMUnavailable
+from .cache import cache_stats, normalize_for_key
+from .local_classifier import local_stats
+from .budget import budget_stats
+from .prompts import prompt_stats
+from .langid import langid_stats
+from .dedup import dedup_stats
+from .batcher import batching_stats
+from .history import get_history, history_stats
+from .streaming import sse
+from .triage import triage, triage_stream, speculation_stats, decide_language
+from .jobs import get_job_store, job_stats, public_view
+from .worker import run_worker, notify_worker, spool_upload
+from .tracing import TracingMiddleware, stage, render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+
 
-app = FastAPI(title="Email Classifier API", version="1.3.0")
+@asynccontextmanager
+async def _lifespan(app):
+    # Worker de jobs no mesmo processo (com JOBS_BACKEND=sqlite pode rodar à parte;
+    # na Lambda é sempre outra função). Ao parar, os jobs em andamento voltam
+    # para a fila em vez de segurar o shutdown.
+    if not JOBS_INLINE_WORKER:
+        yield
+        return
+    stop = asyncio.Event()
+    task = asyncio.ensure_future(run_worker(stop=stop, drain=False))
+    try:
+        yield
+    finally:
+        stop.set()
+        notify_worker()
+        await task
+
+app = FastAPI(title="Email Classifier API", version="1.3.0", lifespan=_lifespan)
 
 def _normalize_origins(value) -> list[str]:
 
@@ -20,6 +64,10 @@ def _normalize_origins(value) -> list[str]:
         items = []
     return items or ["*"]
 
+# Middlewares: o último registrado é o mais externo. O limite de upload vem antes
+# do CORS para ficar dentro dele: o 413 sai com Access-Control-Allow-Origin e a UI
+# de outra origem recebe a mensagem, não um erro de rede.
+app.add_middleware(UploadLimitMiddleware, max_bytes=UPLOAD_MAX_BYTES, paths=["/classify-file", "/jobs"])
 app.add_middleware(
     CORSMiddleware,
     allow_origins=_normalize_origins(ALLOWED_ORIGINS),
@@ -28,95 +76,206 @@ app.add_middleware(
     allow_credentials=False, 
 )
 
+@app.exception_handler(LLMUnavailable)
+async def _llm_unavailable(request, exc: LLMUnavailable):
+    headers = {"Retry-After": str(max(1, round(exc.retry_after)))} if exc.retry_after else None
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers=headers)
 
-def _sanitize_lang(code: Optional[str]) -> str:
+# Por último = mais externo: o Server-Timing cobre também o CORS e os 413
+app.add_middleware(TracingMiddleware)
 
-    if not code:
-        return "auto"
-    c = code.strip().lower()
-    if c in ("pt", "pt-br", "pt_br"):
-        return "pt"
-    if c.startswith("en"):
-        return "en"
-    if c == "auto":
-        return "auto"
-    return "pt"
-
-def _decide_language(requested: str, text_blob: str,
-                     accept_language: Optional[str], x_user_lang: Optional[str]) -> str:
-    """
-    Retorna 'pt' ou 'en'.
-    Prioridade: X-User-Lang > Accept-Language > heurística de vocabulário > default pt.
-    """
-    req = _sanitize_lang(requested)
-    if req in ("pt", "en"):
-        return req
-
-    # Headers
-    for h in (x_user_lang, accept_language):
-        if not h:
-            continue
-        h = h.lower()
-        if "pt" in h:
-            return "pt"
-        if "en" in h:
-            return "en"
-
-    # Heurística simples
-    t = (text_blob or "").lower()
-    pt_hits = any(w in t for w in ["obrigado", "por favor", "fatura", "reunião", "prazo", "anexo", "protocolo"])
-    en_hits = any(w in t for w in ["thanks", "please", "invoice", "meeting", "deadline", "attached", "ticket"])
-    if pt_hits and not en_hits:
-        return "pt"
-    if en_hits and not pt_hits:
-        return "en"
-
-    # Default
-    return "pt"
-
-# ===== template padrão para improdutivo =====
-def canned_improdutivo(lang_code: str) -> str:
-    code = _sanitize_lang(lang_code)
-    if code == "en":
-        return "Thanks for reaching out! We've recorded your message."
-    return "Obrigado pela mensagem! Registramos seu contato."
 
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
+@app.get("/debug/stats")
+async def debug_stats():
+    if not ALLOW_DEBUG:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return {
+        "openai": client_stats(),
+        "resilience": resilience_stats(),
+        "cache": cache_stats(),
+        "local": local_stats(),
+        "budget": budget_stats(),
+        "speculation": speculation_stats(),
+        "jobs": job_stats(),
+        "prompts": prompt_stats(),
+        "langid": langid_stats(),
+        "dedup": dedup_stats(),
+        "batching": batching_stats(),
+        "history": history_stats(),
+    }
+
+@app.get("/metrics")
+async def metrics():
+    if not TRACING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/stats")
+async def stats(since: Optional[float] = None, until: Optional[float] = None, step: Optional[int] = None):
+    """
+    Volume e proporção de Produtivos do histórico no servidor (app/history.py), por
+    categoria e idioma, com série a cada `step` s. Padrão: últimas 24 h por hora.
+    Lê só os contadores por janela, nunca o log.
+    """
+    store = get_history()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    until = time.time() if until is None else until
+    since = until - 86400 if since is None else since
+    try:
+        return store.query(since, until, step)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _classify_one(req: ClassifyRequest, accept_language: Optional[str],
+                        x_user_lang: Optional[str], count: int = 1) -> ClassifyResponse:
+    if not req.body or not req.body.strip():
+        raise HTTPException(status_code=400, detail="body é obrigatório")
+
+    # Detecta/normaliza idioma final (pt|en)
+    lang = decide_language(req.language or "auto", f"{req.subject}\n{req.body}", accept_language, x_user_lang)
+
+    with stage("preprocess"):
+        tokens = preprocess(req.body, lang if lang == "pt" else "en")
+    meta = {"token_count": len(tokens), "language": lang}
+    category, confidence, suggested = await triage(req.body, req.subject, lang, meta=meta, count=count)
+
+    return ClassifyResponse(
+        category=category if category in ("Produtivo", "Improdutivo") else "Produtivo",
+        confidence=max(0.0, min(1.0, confidence)),
+        suggested_reply=suggested,
+        language=lang,
+        tokens=tokens if ALLOW_DEBUG else None,
+        meta=meta if ALLOW_DEBUG else None,
+    )
+
 @app.post("/classify", response_model=ClassifyResponse)
 async def classify(
     req: ClassifyRequest,
     accept_language: Optional[str] = Header(None, convert_underscores=False),
     x_user_lang: Optional[str] = Header(None),
+):
+    return await _classify_one(req, accept_language, x_user_lang)
+
+# ---- streaming (SSE): categoria primeiro, depois a resposta pedaço a pedaço ----
+@app.post("/classify-stream")
+async def classify_stream(
+    req: ClassifyRequest,
+    accept_language: Optional[str] = Header(None, convert_underscores=False),
+    x_user_lang: Optional[str] = Header(None),
 ):
     if not req.body or not req.body.strip():
         raise HTTPException(status_code=400, detail="body é obrigatório")
+    lang = decide_language(req.language or "auto", f"{req.subject}\n{req.body}", accept_language, x_user_lang)
+    t0 = time.perf_counter()
 
-    # Detecta/normaliza idioma final (pt|en)
-    lang = _decide_language(req.language or "auto", f"{req.subject}\n{req.body}", accept_language, x_user_lang)
+    def ms() -> float:
+        return round((time.perf_counter() - t0) * 1000, 1)
 
-    tokens = preprocess(req.body, lang if lang == "pt" else "en")
-    category, confidence = classify_only(
-        body_text=req.body, subject=req.subject, language=lang
+    async def events():
+        # Evento inicial: o cliente recebe o primeiro byte antes da classificação
+        yield sse("start", {"language": lang})
+        meta: dict = {}
+        timings = {}
+        reply = []
+        category = None
+        try:
+            async for kind, value in triage_stream(req.body, req.subject, lang, meta=meta):
+                if kind == "category":
+                    category, confidence = value
+                    timings["category_ms"] = ms()
+                    yield sse("category", {
+                        "category": category if category in ("Produtivo", "Improdutivo") else "Produtivo",
+                        "confidence": max(0.0, min(1.0, confidence)),
+                        "language": lang,
+                    })
+                else:
+                    timings.setdefault("first_token_ms", ms())
+                    reply.append(value)
+                    yield sse("delta", {"text": value})
+        except LLMUnavailable as e:
+            yield sse("error", {"status": 503, "error": str(e), "retry_after": e.retry_after})
+            return
+        timings["total_ms"] = ms()
+        done = {"suggested_reply": "".join(reply), "timings": timings}
+        if ALLOW_DEBUG:
+            done["meta"] = meta
+        yield sse("done", done)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    if category == "Improdutivo":
-        suggested = canned_improdutivo(lang)
-    else:
-        suggested = generate_reply(req.body, req.subject, lang)
+# ---- lote: NDJSON, uma linha por item na ordem em que ficam prontos ----
+@app.post("/classify-batch")
+async def classify_batch(
+    batch: ClassifyBatchRequest,
+    accept_language: Optional[str] = Header(None, convert_underscores=False),
+    x_user_lang: Optional[str] = Header(None),
+):
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Máximo de {BATCH_MAX_ITEMS} itens por lote")
 
-    return ClassifyResponse(
-        category=category if category in ("Produtivo", "Improdutivo") else "Produtivo",
-        confidence=max(0.0, min(1.0, confidence)),
-        suggested_reply=suggested,
-        language=lang,
-        tokens=tokens if ALLOW_DEBUG else None,
-        meta={"token_count": len(tokens), "language": lang} if ALLOW_DEBUG else None,
+    # Itens idênticos (após normalização) são processados uma única vez, mas
+    # entram no histórico uma vez por item
+    groups: dict[tuple, list[int]] = {}
+    for i, item in enumerate(batch.items):
+        key = (normalize_for_key(item.subject), normalize_for_key(item.body), (item.language or "auto").lower())
+        groups.setdefault(key, []).append(i)
+
+    sem = asyncio.Semaphore(max(1, BATCH_MAX_CONCURRENCY))
+
+    async def run(indexes: list[int]):
+        async with sem:
+            try:
+                res = await _classify_one(batch.items[indexes[0]], accept_language, x_user_lang, len(indexes))
+                return indexes, {"ok": True, "result": res.model_dump(exclude_none=True)}
+            except HTTPException as e:
+                return indexes, {"ok": False, "status": e.status_code, "error": e.detail}
+            except LLMUnavailable as e:
+                return indexes, {"ok": False, "status": 503, "error": str(e), "retry_after": e.retry_after}
+            except Exception as e:
+                return indexes, {"ok": False, "status": 500, "error": str(e) or e.__class__.__name__}
+
+    async def stream():
+        tasks = [asyncio.ensure_future(run(idx)) for idx in groups.values()]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                indexes, payload = await fut
+                for i in indexes:
+                    yield json.dumps({"index": i, **payload}, ensure_ascii=False) + "\n"
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-Items": str(len(batch.items)), "X-Batch-Unique": str(len(groups))},
     )
 
 # ---- upload de arquivo (.pdf/.txt) ----
+def _check_upload(file: FormFile) -> tuple:
+    """(tamanho, 'pdf' | 'txt'); o upload já está num SpooledTemporaryFile, lemos só o cabeçalho."""
+    size = file_size(file.file)
+    if not size:
+        raise HTTPException(status_code=400, detail="Arquivo vazio")
+    if size > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Arquivo excede o limite de {UPLOAD_MAX_BYTES} bytes")
+
+    file.file.seek(0)
+    kind = sniff_kind(file.file.read(SNIFF_BYTES))
+    if kind is None:
+        raise HTTPException(status_code=400, detail="Apenas arquivos .pdf ou .txt são suportados")
+    file.file.seek(0)
+    return size, kind
+
 @app.post("/classify-file")
 async def classify_file(
     file: UploadFile = File(...),
@@ -124,26 +283,29 @@ async def classify_file(
     accept_language: Optional[str] = Header(None, convert_underscores=False),
     x_user_lang: Optional[str] = Header(None),
 ):
-    blob = await file.read()
-    if not blob:
-        raise HTTPException(status_code=400, detail="Arquivo vazio")
+    rss_before = process_peak_rss_mb()
+    size, kind = _check_upload(file)
 
     try:
-        text, meta = extract_text_from_blob(blob, file.filename)
+        text, meta = await aextract_text_from_file(file.file, kind, size)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    # Pico do processo inteiro (ver process_peak_rss_mb), não desta requisição
+    rss_after = process_peak_rss_mb()
+    meta["memory"] = {
+        "upload_in_memory": in_memory(file.file),
+        "process_rss_peak_mb": rss_after,
+        "process_rss_peak_growth_mb": round(rss_after - rss_before, 1) if rss_after is not None else None,
+    }
+
     if not text or len(text.strip()) < 5:
         raise HTTPException(status_code=422, detail="Não foi possível extrair texto do arquivo")
 
     # Decide idioma final (pt|en) com base no conteúdo e headers
-    lang = _decide_language(language or "auto", text, accept_language, x_user_lang)
+    lang = decide_language(language or "auto", text, accept_language, x_user_lang)
 
-    category, confidence = classify_only(text, file.filename, lang)
-    if category == "Improdutivo":
-        suggested = canned_improdutivo(lang)
-    else:
-        suggested = generate_reply(text, file.filename, lang)
+    category, confidence, suggested = await triage(text, file.filename, lang, meta=meta)
 
     return {
         "category": category if category in ("Produtivo", "Improdutivo") else "Produtivo",
@@ -152,3 +314,52 @@ async def classify_file(
         "language": lang,
         "meta": {"file": file.filename, **meta},
     }
+
+# ---- jobs assíncronos: submit (202) + poll; documentos longos não seguram a conexão ----
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    request: Request,
+    accept_language: Optional[str] = Header(None, convert_underscores=False),
+    x_user_lang: Optional[str] = Header(None),
+):
+    """JSON (mesmo corpo do /classify) ou multipart com `file` (+ `language`), como no /classify-file."""
+    headers = {"accept_language": accept_language, "x_user_lang": x_user_lang}
+    store = get_job_store()
+
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        file = form.get("file")
+        if not isinstance(file, FormFile):
+            raise HTTPException(status_code=400, detail="Campo file é obrigatório")
+        size, kind = _check_upload(file)
+        # O arquivo vai para o spool dos jobs (disco ou S3) antes de entrar na fila
+        path = await asyncio.to_thread(spool_upload, file.file, uuid.uuid4().hex)
+        job = store.submit("file", {
+            "path": path, "file_kind": kind, "size": size, "filename": file.filename,
+            "language": form.get("language") or "auto", **headers,
+        })
+    else:
+        try:
+            req = ClassifyRequest.model_validate(await request.json())
+        except (ValueError, ValidationError) as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if not req.body or not req.body.strip():
+            raise HTTPException(status_code=400, detail="body é obrigatório")
+        job = store.submit("text", {"subject": req.subject, "body": req.body, "language": req.language, **headers})
+
+    notify_worker()
+    return JSONResponse(
+        status_code=202,
+        content={"id": job["id"], "status": "queued"},
+        headers={"Location": f"/jobs/{job['id']}", "Retry-After": str(max(1, round(JOBS_POLL_INTERVAL)))},
+    )
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    view = public_view(job)
+    if job["status"] in ("queued", "running"):
+        return JSONResponse(content=view, headers={"Retry-After": str(max(1, round(JOBS_POLL_INTERVAL)))})
+    return view
@@ -17,3 +17,6 @@ class ClassifyResponse(BaseModel):
     language: str
     tokens: Optional[List[str]] = None
     meta: Optional[dict] = None
+
+class ClassifyBatchRequest(BaseModel):
+    items: List[ClassifyRequest] = Field(min_length=1)
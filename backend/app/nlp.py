@@ -1,23 +1,98 @@
 import re
 import unicodedata
-from typing import List
+from typing import Iterable, Iterator, List, Tuple, Union
 
-STOP_PT = {"a","ao","aos","com","como","da","de","do","dos","e","ela","ele","em","isso","já","mas","me","no","nos","não","o","os","ou","para","por","que","se","sem","sua","são","também","um","uma","você"}
-STOP_EN = {"a","an","the","and","or","but","if","then","else","for","to","of","in","on","at","by","is","are","was","were","be","been","being","it","as","with","that","this","these","those","from","i","you","he","she","we","they"}
+STOP_PT = frozenset({"a","ao","aos","com","como","da","de","do","dos","e","ela","ele","em","isso","já","mas","me","no","nos","não","o","os","ou","para","por","que","se","sem","sua","são","também","um","uma","você"})
+STOP_EN = frozenset({"a","an","the","and","or","but","if","then","else","for","to","of","in","on","at","by","is","are","was","were","be","been","being","it","as","with","that","this","these","those","from","i","you","he","she","we","they"})
+STOPWORDS = STOP_PT | STOP_EN
 
 PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
 MULTISPACE_RE = re.compile(r"\s+")
+# Um token é uma sequência de letras (caracteres de palavra que não são dígitos).
+# Equivale a remover acentos, trocar pontuação e dígitos por espaço e dar split —
+# numa passada só; os acentos saem depois, por token. Texto já decomposto (letra +
+# marca combinante) usa DECOMPOSED_TOKEN_RE, que mantém as marcas dentro do token.
+# Só as marcas não espaçantes (Mn) dos blocos de diacríticos: os mesmos blocos têm
+# marcas envolventes (Me) e posições livres, que o NFD antigo não removia.
+_MARK_BLOCKS = ((0x0300, 0x036f), (0x1ab0, 0x1aff), (0x1dc0, 0x1dff), (0x20d0, 0x20ff), (0xfe20, 0xfe2f))
+_MARKS = "".join(chr(c) for lo, hi in _MARK_BLOCKS for c in range(lo, hi + 1)
+                 if unicodedata.category(chr(c)) == "Mn")
+MARKS_RE = re.compile(f"[{_MARKS}]")
+# Os atalhos só valem onde as únicas marcas combinantes (Mn) são as de _MARKS: latim,
+# pontuação, símbolos e emoji. Outras escritas têm marcas próprias ("كَتَبَ", sinais
+# do devanágari) que o regex trataria como separador: esse texto vai pelo caminho
+# antigo, NFD + remoção de Mn no texto inteiro.
+OTHER_SCRIPT_RE = re.compile(
+    "[^\x00-\u036f\u1ab0-\u1aff\u1dc0-\u1eff\u2000-\u2bff\ufe20-\ufe2f\U0001f000-\U0001faff]"
+)
+TOKEN_RE = re.compile(r"[^\W\d]+")
+DECOMPOSED_TOKEN_RE = re.compile(rf"(?:[^\W\d]|[{_MARKS}])+")
+# Texto ASCII (já em minúsculas): nada a remover e o filtro len > 2 vai para o regex
+ASCII_TOKEN_RE = re.compile(r"[a-z_]{3,}")
+
+_FOLD_CACHE: dict = {}
+_FOLD_CACHE_MAX = 50_000
+
 
 def strip_accents(text: str) -> str:
     return ''.join(ch for ch in unicodedata.normalize('NFD', text) if unicodedata.category(ch) != 'Mn')
 
+
+def _fold(token: str) -> str:
+    # Acentos são removidos por token (com cache), não no texto inteiro
+    if token.isascii():
+        return token
+    folded = _FOLD_CACHE.get(token)
+    if folded is None:
+        if len(_FOLD_CACHE) >= _FOLD_CACHE_MAX:
+            _FOLD_CACHE.clear()
+        folded = _FOLD_CACHE[token] = strip_accents(token)
+    return folded
+
+
+def _filter(tokens: List[str]) -> List[str]:
+    out = []
+    for t in tokens:
+        if not t.isascii():
+            t = _fold(t)
+        if len(t) > 2 and t not in STOPWORDS:
+            out.append(t)
+    return out
+
+
+def _prepare(text: str) -> Tuple[str, "re.Pattern"]:
+    """(texto, regex de token) para texto não ASCII já em minúsculas."""
+    if OTHER_SCRIPT_RE.search(text):
+        return strip_accents(text), TOKEN_RE
+    return text, DECOMPOSED_TOKEN_RE if MARKS_RE.search(text) else TOKEN_RE
+
+
 def preprocess(text: str, lang: str = "pt-BR") -> List[str]:
     if not text:
         return []
-    text = strip_accents(text.lower())
-    text = PUNCT_RE.sub(" ", text)
-    text = re.sub(r"\d+", " ", text)
-    text = MULTISPACE_RE.sub(" ", text).strip()
-    tokens = text.split(" ")
-    stop = STOP_PT | STOP_EN
-    return [t for t in tokens if t and t not in stop and len(t) > 2]
+    text = text.lower()
+    if text.isascii():
+        return [t for t in ASCII_TOKEN_RE.findall(text) if t not in STOPWORDS]
+    text, token_re = _prepare(text)
+    return _filter(token_re.findall(text))
+
+
+def iter_preprocess(chunks: Union[str, Iterable[str]], lang: str = "pt-BR") -> Iterator[str]:
+    """
+    Variante em streaming de `preprocess` para textos grandes (ex.: páginas de PDF):
+    recebe pedaços de texto e emite os tokens sem montar o texto inteiro.
+    Um token cortado entre dois pedaços é reconstituído.
+    """
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+    carry = ""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        text, token_re = _prepare(carry + chunk.lower())
+        tokens = token_re.findall(text)
+        # Se o pedaço termina no meio de uma palavra, ela continua no próximo
+        carry = tokens.pop() if tokens and token_re.fullmatch(text[-1]) else ""
+        yield from _filter(tokens)
+    if carry:
+        yield from _filter([carry])
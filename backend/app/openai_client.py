@@ -1,35 +1,270 @@
+import asyncio
+import itertools
 import json
 import os
 import re
-from typing import Tuple, Optional, Dict
-from openai import OpenAI, APIConnectionError, RateLimitError, AuthenticationError, BadRequestError
-from .config import OPENAI_MODEL
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Tuple, Optional, Dict, List
+from .cache import get_cache, cache_key
+from .config import (
+    OPENAI_MODEL, OPENAI_BASE_URL, OPENAI_MAX_CONCURRENCY,
+    OPENAI_MAX_CONNECTIONS, OPENAI_KEEPALIVE_CONNECTIONS, OPENAI_KEEPALIVE_EXPIRY,
+    OPENAI_CLASSIFY_TIMEOUT, OPENAI_REPLY_TIMEOUT,
+    OPENAI_RPM, OPENAI_TPM, OPENAI_MAX_RETRIES, OPENAI_BACKOFF_BASE, OPENAI_BACKOFF_MAX,
+    OPENAI_RETRY_BUDGET, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT,
+)
+from .streaming import ReplyStream
+from .prompts import LANG_MAP, Prompt, cached_tokens, get_prompt, record_prompt_call, record_prompt_usage
+from .tracing import record_llm, record_tokens
+from .resilience import (
+    LLMUnavailable, RateLimiter, CircuitBreaker,
+    backoff_delay, retry_after, is_retryable, estimate_tokens,
+)
 
 
-def _get_client():
+# `openai` (e o httpx) custam ~250 ms de import: só são carregados no primeiro
+# uso do LLM, para não pesar no cold start da Lambda (/health, preflight, etc.).
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI
+
+
+class ClientStats:
+    """Contadores do pool HTTP da OpenAI: reuso de conexões e latência por operação."""
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.calls: Dict[str, Dict[str, float]] = {}
+
+    def on_request(self):
+        self.requests += 1
+
+    def on_trace(self, event_name: str):
+        if event_name == "connection.connect_tcp.started":
+            self.new_connections += 1
+
+    def on_call(self, op: str, elapsed_ms: float, ok: bool, usage=None, cancelled: bool = False):
+        c = self.calls.setdefault(op, {
+            "count": 0, "errors": 0, "cancelled": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0,
+            "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0,
+        })
+        c["count"] += 1
+        if cancelled:
+            c["cancelled"] += 1
+        elif not ok:
+            c["errors"] += 1
+        c["total_ms"] += elapsed_ms
+        c["max_ms"] = max(c["max_ms"], elapsed_ms)
+        c["last_ms"] = elapsed_ms
+        self.on_usage(op, usage)
+
+    def on_usage(self, op: str, usage):
+        c = self.calls.get(op)
+        if c is not None and usage is not None:
+            c["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            c["cached_tokens"] += cached_tokens(usage)
+            c["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+    def snapshot(self) -> dict:
+        reused = max(0, self.requests - self.new_connections)
+        return {
+            "http_requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+            "calls": {
+                op: {
+                    "count": c["count"],
+                    "errors": c["errors"],
+                    "cancelled": c["cancelled"],
+                    "avg_ms": round(c["total_ms"] / c["count"], 2) if c["count"] else 0.0,
+                    "max_ms": round(c["max_ms"], 2),
+                    "last_ms": round(c["last_ms"], 2),
+                    "prompt_tokens": c["prompt_tokens"],
+                    "cached_tokens": c["cached_tokens"],
+                    "completion_tokens": c["completion_tokens"],
+                }
+                for op, c in self.calls.items()
+            },
+        }
+
+
+_stats = ClientStats()
+
+
+def client_stats() -> dict:
+    return _stats.snapshot()
+
+
+def _limits() -> "httpx.Limits":
+    import httpx
+
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
+
+
+async def _async_trace(event_name, info):
+    _stats.on_trace(event_name)
+
+
+async def _async_on_request(request: "httpx.Request"):
+    _stats.on_request()
+    request.extensions["trace"] = _async_trace
+
+
+# Cliente único por processo: sobrevive entre requisições e entre
+# invocações "quentes" da Lambda (o módulo fica carregado).
+_async_client: Optional["AsyncOpenAI"] = None
+_async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _get_async_client():
+    # O pool assíncrono pertence a um event loop; se o loop mudou
+    # (ex.: asyncio.run em scripts), recria cliente e semáforo.
+    global _async_client, _async_loop, _llm_semaphore
+    loop = asyncio.get_running_loop()
+    if _async_client is not None and _async_loop is loop:
+        return _async_client
     api_key = os.getenv("OPENAI_API_KEY", "")
     if not api_key:
         return None
     try:
-        return OpenAI(api_key=api_key)
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        _async_client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=OPENAI_BASE_URL,
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(
+                limits=_limits(),
+                event_hooks={"request": [_async_on_request]},
+            ),
+        )
     except Exception:
         return None
+    _async_loop = loop
+    _llm_semaphore = None
+    return _async_client
+
+
+# Limita chamadas simultâneas à OpenAI por processo (0 = sem limite)
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+
 
+@asynccontextmanager
+async def _llm_slot():
+    global _llm_semaphore
+    if OPENAI_MAX_CONCURRENCY <= 0:
+        yield
+        return
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+    async with _llm_semaphore:
+        yield
+
+
+# Limitador RPM/TPM, retries com backoff e circuit breaker (app/resilience.py)
+_limiter = RateLimiter(OPENAI_RPM, OPENAI_TPM)
+_breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+_retry_stats = {"retries": 0, "retryable_errors": 0, "gave_up": 0, "fast_failed": 0}
+
+
+def resilience_stats() -> dict:
+    return {"breaker": _breaker.snapshot(), "rate_limiter": _limiter.snapshot(), **_retry_stats}
+
+
+def _before_attempt(est_tokens: int) -> Tuple[float, bool]:
+    """
+    Reserva cota e checa o circuito; devolve (quanto esperar antes de chamar, se
+    esta tentativa é a sonda do half_open). A cota vem primeiro: se ela estourar,
+    a sonda nem chega a ser tomada.
+    """
+    wait = _limiter.reserve(est_tokens)
+    if wait > OPENAI_RETRY_BUDGET:
+        _limiter.release(est_tokens)
+        _retry_stats["fast_failed"] += 1
+        raise LLMUnavailable("Cota local de RPM/TPM esgotada", wait)
+    if not _breaker.allow():
+        _limiter.release(est_tokens)
+        _retry_stats["fast_failed"] += 1
+        raise LLMUnavailable("OpenAI degradada (circuito aberto)", _breaker.retry_in())
+    return wait, _breaker.state == "half_open"
+
+
+def _after_error(exc: Exception, attempt: int, started: float) -> float:
+    """Delay até a próxima tentativa; relança quando não vale tentar de novo."""
+    if not is_retryable(exc):
+        _breaker.on_success()  # o upstream respondeu (ex.: 400/401): não é degradação
+        raise exc
+    _retry_stats["retryable_errors"] += 1
+    _breaker.on_failure()
+    hint = retry_after(exc)
+    delay = backoff_delay(attempt, OPENAI_BACKOFF_BASE, OPENAI_BACKOFF_MAX, hint)
+    if (attempt >= OPENAI_MAX_RETRIES or _breaker.state == "open"
+            or time.perf_counter() - started + delay > OPENAI_RETRY_BUDGET):
+        _retry_stats["gave_up"] += 1
+        raise LLMUnavailable(f"OpenAI indisponível: {exc.__class__.__name__}", hint or delay) from exc
+    _retry_stats["retries"] += 1
+    return delay
+
+
+async def _acreate(client: "AsyncOpenAI", op: str, prompt: Optional[Prompt] = None, **kwargs):
+    t0 = time.perf_counter()
+    est = estimate_tokens(kwargs.get("messages") or [])
+    r = None
+    cancelled = False
+    try:
+        for attempt in itertools.count():
+            wait, probe = _before_attempt(est)
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+                async with _llm_slot():
+                    r = await client.chat.completions.create(**kwargs)
+            except Exception as e:
+                await asyncio.sleep(_after_error(e, attempt, t0))
+                continue
+            except BaseException:
+                # cancelamento (cliente desconectou, timeout, resposta especulativa
+                # descartada), inclusive na espera pela cota: a sonda não teve resultado
+                if probe:
+                    _breaker.abandon()
+                cancelled = True
+                raise
+            _breaker.on_success()
+            return r
+    finally:
+        elapsed = time.perf_counter() - t0
+        usage = getattr(r, "usage", None)
+        _stats.on_call(op, elapsed * 1000, r is not None, usage, cancelled)
+        if r is not None:
+            record_prompt_call(prompt, elapsed * 1000, usage)
+        record_llm(op, elapsed, "cancelled" if cancelled else "ok" if r is not None else "error", usage)
+
+
+async def _cache_lookup(prompt: Prompt, body_text: str, subject: Optional[str], lang: str):
+    """
+    Retorna (chave, valor_em_cache). Chave None quando o cache está desligado.
+    A leitura do SQLite roda numa thread, fora do event loop.
+    """
+    cache = get_cache()
+    if cache is None:
+        return None, None
+    key = cache_key(prompt.name, subject, body_text, lang, OPENAI_MODEL, prompt.version)
+    hit = await asyncio.to_thread(cache.get, key) if cache.blocking else cache.get(key)
+    return key, hit
+
+
+def _cache_store(key: Optional[str], value: dict) -> None:
+    # `set` não bloqueia em nenhum backend (o SQLite grava numa thread própria)
+    if key is not None:
+        get_cache().set(key, value)
 
-LANG_MAP: Dict[str, Dict[str, str]] = {
-    "pt": {
-        "name": "Português do Brasil",
-        "short": "pt-BR",
-        "improd": "Este e-mail foi classificado como Improdutivo. Portanto, não será gerada uma resposta sugerida.",
-        "team": "Equipe de Atendimento",     
-    },
-    "en": {
-        "name": "English",
-        "short": "en",
-        "improd": "This email has been classified as Unproductive. Therefore, no suggested reply will be generated.",
-        "team": "Support Team",              
-    },
-}
 
 def sanitize_lang(lang: Optional[str]) -> str:
     if not lang:
@@ -41,88 +276,160 @@ def sanitize_lang(lang: Optional[str]) -> str:
     return "pt"
 
 
-CLS_SYSTEM = """
-(Temperatura=0.6)
-Você é um classificador de e-mails para uma grande instituição do setor financeiro (banco/serviços financeiros).
-Responda **somente** em JSON, exatamente neste formato:
-{"category":"Produtivo|Improdutivo","confidence":0.0-1.0}
+def _keyword_classify(body_text: str, subject: Optional[str]) -> Tuple[str, float]:
+    txt = f"{subject or ''} {body_text}".lower()
+    cat = "Improdutivo" if any(w in txt for w in ["feliz", "oferta", "promo", "desconto", "sorteio"]) else "Produtivo"
+    return cat, 0.55
 
-Objetivo: separar rapidamente o que requer ação operacional/atendimento (Produtivo) do que é irrelevante ou sem ação (Improdutivo).
 
-Definições gerais:
-- Produtivo: tratativas de clientes ou parceiros, currículo, solicitações com ação clara, temas de compliance/risco, prazos, reuniões, propostas/contratos, faturas/cobranças, suporte técnico, incidentes, onboarding/KYC, auditoria, reportes regulatórios (ex.: BACEN, CVM), temas de segurança (fraude, phishing, chargeback, disputa), LGPD/privacidade (acesso/retificação/exclusão de dados).
-- Improdutivo: spam, correntes, promoções irrelevantes, envio massivo sem contexto, conversa social sem ação, divulgação genérica, newsletters não solicitadas, conteúdo suspeito/iscas (sem identificação, anexos estranhos, links encurtados) quando não houver pedido claro.
+def _parse_cls(content: str) -> Tuple[str, float]:
+    parsed = json.loads(content)
+    cat = parsed.get("category", "Produtivo")
+    conf = float(parsed.get("confidence", 0.5))
+    return cat, conf
 
-Sinais de PRODUTIVO: pedido/ação ou prazo claro; cita conta/contrato/transação/ticket/ID; envolve obrigação regulatória/compliance/jurídico/risco/segurança.
-Sinais de IMPRODUTIVO: promoção genérica; felicitações sem relação de negócio; pedido vago; marketing puro; mensagens repetitivas sem call-to-action.
 
-Regras:
-- Não invente dados. Classifique usando apenas o conteúdo recebido.
-- Se houver indício de fraude/phishing **sem** ação clara, classifique como Improdutivo (tratado fora do fluxo).
-- A confiança deve refletir a clareza dos sinais (0.0 a 1.0).
-- **Não** inclua nada além do JSON pedido (sem comentários/explicações).
-"""
-
-def gen_system_for(lang_code: str) -> str:
-    cfg = LANG_MAP[lang_code]
-    signature = ("Best regards,\n" + cfg["team"]) if lang_code == "en" else ("Atenciosamente,\n" + cfg["team"])
-    example_greeting = "Hi," if lang_code == "en" else "Olá,"
-
-    return f"""
-Você redige respostas **curtas, objetivas e educadas** para e-mails classificados como Produtivo em uma grande instituição do setor financeiro.
-Saída **somente** como JSON, exatamente neste formato:
-{{"suggested_reply":"<corpo_do_email_em_texto_puro_sem_assunto>"}}
-
-Regras GERAIS:
-- Forneça esses dados quando for necessário ou solicitado: Site da empresa é www.financecorp.com.br (Brasil) e www.financecorp.com (internacional). Telefone para contato: +55 11 4002-8922 (Brasil) e +1 800 123 4567 (EUA).
-- **Responda sempre em {cfg['name']}** (não mude o idioma).
-- Tom profissional, cordial e direto; sem jargões desnecessários.
-- **Não** compartilhe dados sensíveis (LGPD). Peça apenas o mínimo (ex.: ID do ticket, últimos 4 dígitos, CPF mascarado).
-- **Não** prometa prazos rígidos ou garantias; use linguagem de melhor esforço.
-- Se houver suspeita de fraude/riscos, indique canal seguro e evite links/senhas.
-
-FORMATO (texto puro), **sem linha de assunto**:
-1) Saudação (ex.: "{example_greeting}")
-2) Corpo em 1 a 3 frases objetivas
-3) Fechamento e assinatura:
+async def aclassify_only(body_text: str, subject: Optional[str], language: str = "pt") -> Tuple[str, float]:
+    """Classificação pelo LLM (com cache); sem chave da OpenAI, por palavras-chave."""
+    client = _get_async_client()
+    if client is None:
+        return _keyword_classify(body_text, subject)
 
-{signature}
-""".strip()
+    prompt = get_prompt("classify", sanitize_lang(language))
+    key, hit = await _cache_lookup(prompt, body_text, subject, prompt.lang)
+    if hit is not None:
+        return hit["category"], float(hit["confidence"])
+    return await _aclassify_llm(client, prompt, key, body_text, subject)
 
 
-def classify_only(body_text: str, subject: Optional[str], language: str = "pt") -> Tuple[str, float]:
-    client = _get_client()
-    if client is None:
-        txt = f"{subject or ''} {body_text}".lower()
-        cat = "Improdutivo" if any(w in txt for w in ["feliz", "oferta", "promo", "desconto", "sorteio"]) else "Produtivo"
-        return cat, 0.55
-
-    user = (
-        f"Assunto: {subject or '(sem)'}\n"
-        f"Conteúdo:\n{body_text}\n\n"
-        "Classifique e responda estritamente no esquema JSON indicado."
-    )
+async def _aclassify_llm(client, prompt: Prompt, key: Optional[str], body_text: str,
+                         subject: Optional[str]) -> Tuple[str, float]:
     try:
-        r = client.chat.completions.create(
+        r = await _acreate(
+            client, "classify", prompt,
             model=OPENAI_MODEL,
             temperature=0.0,
-            messages=[
-                {"role": "system", "content": CLS_SYSTEM},
-                {"role": "user", "content": user},
-            ],
+            messages=prompt.messages(body_text, subject),
             response_format={"type": "json_object"},
-            timeout=20,
+            timeout=OPENAI_CLASSIFY_TIMEOUT,
         )
-        parsed = json.loads(r.choices[0].message.content)
-        cat = parsed.get("category", "Produtivo")
-        conf = float(parsed.get("confidence", 0.5))
+        cat, conf = _parse_cls(r.choices[0].message.content)
+        _cache_store(key, {"category": cat, "confidence": conf})
         return cat, conf
-    except (AuthenticationError, BadRequestError, RateLimitError, APIConnectionError):
-        return "Produtivo", 0.5
+    except LLMUnavailable:
+        # Melhor um 503 com Retry-After do que uma classificação inventada
+        raise
     except Exception:
         return "Produtivo", 0.5
 
 
+def _parse_cls_batch(content: str, ids: List[str]) -> Dict[str, Tuple[str, float]]:
+    """Só os itens válidos, com id conhecido; o que faltar volta para chamadas individuais."""
+    results = json.loads(content).get("results")
+    if not isinstance(results, list):
+        raise ValueError("resposta do lote sem 'results'")
+    wanted = set(ids)
+    out = {}
+    for item in results:
+        if not isinstance(item, dict):
+            continue
+        rid, cat = str(item.get("id")), item.get("category")
+        if rid not in wanted or cat not in ("Produtivo", "Improdutivo"):
+            continue
+        try:
+            conf = min(1.0, max(0.0, float(item.get("confidence", 0.5))))
+        except (TypeError, ValueError):
+            continue
+        out[rid] = (cat, conf)
+    return out
+
+
+class BatchStats:
+    """Classificação em micro-lotes: tamanho dos lotes e itens que caíram em chamadas individuais."""
+
+    def __init__(self):
+        self.batches = 0
+        self.batched_items = 0
+        self.cache_hits = 0
+        self.parse_errors = 0
+        self.fallback_items = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "batches": self.batches,
+            "batched_items": self.batched_items,
+            "avg_batch_size": round(self.batched_items / self.batches, 2) if self.batches else 0.0,
+            "cache_hits": self.cache_hits,
+            "parse_errors": self.parse_errors,
+            "fallback_items": self.fallback_items,
+        }
+
+
+_batch_stats = BatchStats()
+
+
+async def aclassify_many(items: List[Tuple[str, Optional[str]]], language: str = "pt") -> List[Tuple[str, float]]:
+    """
+    Classifica vários e-mails `(corpo, assunto)` numa única chamada (prompt
+    `classify_batch`), na mesma ordem. Itens em cache não vão ao LLM e o cache é
+    o mesmo da classificação individual. Resposta inválida ou item ausente/
+    malformado cai em chamadas individuais só para os itens afetados.
+    """
+    client = _get_async_client()
+    if client is None:
+        return [_keyword_classify(body, subject) for body, subject in items]
+
+    lang = sanitize_lang(language)
+    single = get_prompt("classify", lang)
+    out: List[Optional[Tuple[str, float]]] = [None] * len(items)
+    keys: List[Optional[str]] = [None] * len(items)
+    todo = []
+    looked = await asyncio.gather(*(_cache_lookup(single, body, subject, lang) for body, subject in items))
+    for i, (keys[i], hit) in enumerate(looked):
+        if hit is not None:
+            out[i] = hit["category"], float(hit["confidence"])
+            _batch_stats.cache_hits += 1
+        else:
+            todo.append(i)
+
+    parsed: Dict[str, Tuple[str, float]] = {}
+    if len(todo) > 1:
+        prompt = get_prompt("classify_batch", lang)
+        ids = [f"e{n}" for n in range(1, len(todo) + 1)]
+        _batch_stats.batches += 1
+        _batch_stats.batched_items += len(todo)
+        try:
+            r = await _acreate(
+                client, "classify_batch", prompt,
+                model=OPENAI_MODEL,
+                temperature=0.0,
+                messages=prompt.batch_messages([(rid, items[i][0], items[i][1]) for rid, i in zip(ids, todo)]),
+                response_format={"type": "json_object"},
+                timeout=OPENAI_CLASSIFY_TIMEOUT,
+            )
+            parsed = _parse_cls_batch(r.choices[0].message.content, ids)
+        except LLMUnavailable:
+            raise
+        except Exception:
+            _batch_stats.parse_errors += 1
+        for rid, i in zip(ids, todo):
+            if rid in parsed:
+                out[i] = parsed[rid]
+                _cache_store(keys[i], {"category": parsed[rid][0], "confidence": parsed[rid][1]})
+
+    missing = [i for i in todo if out[i] is None]
+    if len(todo) > 1:
+        _batch_stats.fallback_items += len(missing)
+    singles = await asyncio.gather(*(_aclassify_llm(client, single, keys[i], *items[i]) for i in missing))
+    for i, result in zip(missing, singles):
+        out[i] = result
+    return out
+
+
+def batch_stats() -> dict:
+    return _batch_stats.snapshot()
+
+
 def _strip_subject_lines(text: str) -> str:
     
     if not text:
@@ -135,10 +442,7 @@ def _strip_subject_lines(text: str) -> str:
     return "\n".join(lines).strip()
 
 
-def generate_reply(body_text: str, subject: Optional[str], language: str = "pt") -> str:
-
-    client = _get_client()
-    lang_code = sanitize_lang(language)
+def _reply_fallback(lang_code: str) -> str:
     cfg = LANG_MAP[lang_code]
 
     # Fallback simples (quando OpenAI indisponível/timeout)
@@ -148,34 +452,162 @@ def generate_reply(body_text: str, subject: Optional[str], language: str = "pt")
         else "Olá,\n\nNosso serviço de IA está temporariamente indisponível. Tente novamente mais tarde.\n\n"
     )
     fallback_signature = ("Best regards,\n" + cfg["team"]) if lang_code == "en" else ("Atenciosamente,\n" + cfg["team"])
-    fallback_body = fallback_core + fallback_signature
+    return fallback_core + fallback_signature
+
+
+def _parse_reply(content: str, fallback: str) -> str:
+    parsed = json.loads(content)
+    reply = (parsed.get("suggested_reply") or "").strip()
+    reply = _strip_subject_lines(reply)
+    return reply or fallback
+
+
+def reply_call_tokens(body_text: str, subject: Optional[str], language: str, reply: Optional[str] = None) -> int:
+    """Estimativa local dos tokens de uma chamada de resposta (prompt + saída, se houver)."""
+    from .budget import estimate_tokens as text_tokens
+
+    lang_code = sanitize_lang(language)
+    return estimate_tokens(get_prompt("reply", lang_code).messages(body_text, subject), 0) + text_tokens(reply or "")
+
+
+async def agenerate_reply(body_text: str, subject: Optional[str], language: str = "pt") -> str:
+    """
+    Resposta sugerida pelo LLM (com cache); texto de fallback se a resposta vier
+    inválida. LLMUnavailable (retries esgotados, circuito aberto) sobe para o chamador.
+    """
+    client = _get_async_client()
+    lang_code = sanitize_lang(language)
+    fallback_body = _reply_fallback(lang_code)
 
     if client is None:
         return fallback_body
 
-    system = gen_system_for(lang_code)
-    user = (
-        f"IDIOMA DA RESPOSTA: {cfg['name']} ({cfg['short']}). Responda somente neste idioma.\n\n"
-        f"Assunto original (apenas contexto, NÃO inclua na resposta): {subject or '(sem)'}\n"
-        f"Conteúdo do email recebido:\n{body_text}\n\n"
-        "Gere o corpo do e-mail (saudação, 1–3 frases objetivas e assinatura), "
-        "SEM linha de assunto. Retorne somente JSON no formato especificado."
-    )
+    prompt = get_prompt("reply", lang_code)
+    key, hit = await _cache_lookup(prompt, body_text, subject, lang_code)
+    if hit is not None:
+        return hit["suggested_reply"]
 
     try:
-        r = client.chat.completions.create(
+        r = await _acreate(
+            client, "reply", prompt,
             model=OPENAI_MODEL,
             temperature=0.2,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
+            messages=prompt.messages(body_text, subject),
             response_format={"type": "json_object"},
-            timeout=25,
+            timeout=OPENAI_REPLY_TIMEOUT,
         )
-        parsed = json.loads(r.choices[0].message.content)
-        reply = (parsed.get("suggested_reply") or "").strip()
-        reply = _strip_subject_lines(reply) 
-        return reply or fallback_body
+        reply = _parse_reply(r.choices[0].message.content, fallback_body)
+        if reply != fallback_body:
+            _cache_store(key, {"suggested_reply": reply})
+        return reply
+    except LLMUnavailable:
+        # Como na classificação: 503 com Retry-After, não um texto de "indisponível"
+        raise
     except Exception:
         return fallback_body
+
+
+async def astream_reply(body_text: str, subject: Optional[str], language: str = "pt") -> AsyncIterator[str]:
+    """
+    Versão em streaming de `agenerate_reply`: emite pedaços da resposta conforme
+    o modelo gera, já sem linhas de assunto (ver app/streaming.py). O prompt e a
+    chave de cache são os mesmos; cache hit sai num pedaço só. A latência
+    registrada em "reply_stream" é até o início do stream (TTFB do upstream).
+    """
+    client = _get_async_client()
+    lang_code = sanitize_lang(language)
+    fallback_body = _reply_fallback(lang_code)
+
+    if client is None:
+        yield fallback_body
+        return
+
+    prompt = get_prompt("reply", lang_code)
+    key, hit = await _cache_lookup(prompt, body_text, subject, lang_code)
+    if hit is not None:
+        yield hit["suggested_reply"]
+        return
+
+    out = ReplyStream()
+    try:
+        stream = await _acreate(
+            client, "reply_stream", prompt,
+            model=OPENAI_MODEL,
+            temperature=0.2,
+            messages=prompt.messages(body_text, subject),
+            response_format={"type": "json_object"},
+            timeout=OPENAI_REPLY_TIMEOUT,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+    except Exception:
+        yield fallback_body
+        return
+
+    try:
+        async for chunk in stream:
+            if chunk.usage is not None:
+                _stats.on_usage("reply_stream", chunk.usage)
+                record_tokens("reply_stream", chunk.usage)
+                record_prompt_usage(prompt, chunk.usage)
+            if not chunk.choices:
+                continue
+            piece = out.feed(chunk.choices[0].delta.content or "")
+            if piece:
+                yield piece
+    except Exception:
+        pass
+    finally:
+        await stream.close()
+
+    tail = out.flush()
+    if tail:
+        yield tail
+    if out.reply:
+        if out.complete:
+            _cache_store(key, {"suggested_reply": out.reply})
+        return
+    # O modelo não devolveu o JSON esperado: tenta o parse do conteúdo inteiro
+    try:
+        yield _parse_reply("".join(out.raw), fallback_body)
+    except Exception:
+        yield fallback_body
+
+
+# ===== modo combinado: classificação + resposta numa única chamada =====
+async def aclassify_and_reply(body_text: str, subject: Optional[str], language: str = "pt") -> Tuple[str, float, str]:
+    """
+    Classifica e gera a resposta numa única chamada (LLM_MODE=combined).
+    Retorna (categoria, confiança, resposta); a resposta vem vazia quando a
+    categoria é Improdutivo ou o modelo não a preencheu.
+    """
+    client = _get_async_client()
+    lang_code = sanitize_lang(language)
+
+    if client is None:
+        cat, conf = _keyword_classify(body_text, subject)
+        return cat, conf, "" if cat == "Improdutivo" else _reply_fallback(lang_code)
+
+    prompt = get_prompt("combined", lang_code)
+    key, hit = await _cache_lookup(prompt, body_text, subject, lang_code)
+    if hit is not None:
+        return hit["category"], float(hit["confidence"]), hit["suggested_reply"]
+
+    try:
+        r = await _acreate(
+            client, "combined", prompt,
+            model=OPENAI_MODEL,
+            temperature=0.0,
+            messages=prompt.messages(body_text, subject),
+            response_format={"type": "json_object"},
+            timeout=OPENAI_REPLY_TIMEOUT,
+        )
+        content = r.choices[0].message.content
+        cat, conf = _parse_cls(content)
+        reply = _strip_subject_lines((json.loads(content).get("suggested_reply") or "").strip())
+        _cache_store(key, {"category": cat, "confidence": conf, "suggested_reply": reply})
+        return cat, conf, reply
+    except LLMUnavailable:
+        raise
+    except Exception:
+        return "Produtivo", 0.5, _reply_fallback(lang_code)
@@ -1,8 +1,11 @@
 # app/pdf.py
+import asyncio
 import io
-from typing import Tuple
-from pypdf import PdfReader
-from .config import PDF_MAX_PAGES, TEXT_MAX_CHARS
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Optional, Tuple
+from .config import PDF_MAX_PAGES, TEXT_MAX_CHARS, PDF_TIME_BUDGET, PDF_WORKERS
+from .tracing import stage
 
 def _decode_txt(blob: bytes) -> str:
     try:
@@ -10,34 +13,106 @@ def _decode_txt(blob: bytes) -> str:
     except UnicodeDecodeError:
         return blob.decode("latin-1", errors="ignore")
 
-def extract_text_from_blob(blob: bytes, filename: str) -> Tuple[str, dict]:
-    name = (filename or "").lower()
+def _truncate(text: str) -> str:
+    if len(text) > TEXT_MAX_CHARS:
+        text = text[:TEXT_MAX_CHARS] + "\n[...]"
+    return text
 
-    if name.endswith(".txt"):
-        text = _decode_txt(blob)
-        if len(text) > TEXT_MAX_CHARS:
-            text = text[:TEXT_MAX_CHARS] + "\n[...]"
-        return text.strip(), {"type": "txt", "pages": 1, "size_bytes": len(blob)}
+def _extract_pdf(stream: BinaryIO, size_bytes: int) -> Tuple[str, dict]:
+    """
+    Extrai página a página e para assim que o orçamento de caracteres
+    (TEXT_MAX_CHARS) é atingido ou o de tempo (PDF_TIME_BUDGET) se esgota.
 
-    if not name.endswith(".pdf"):
-        raise ValueError("Apenas arquivos .pdf ou .txt são suportados")
+    O tempo só é conferido entre páginas: uma página que já começou vai até o
+    fim, então o pior caso é PDF_TIME_BUDGET mais a página mais lenta. Não dá
+    para interromper `extract_text` no meio — threads não são canceláveis e um
+    processo separado não serve na Lambda (ver `_get_executor`).
+    """
+    from pypdf import PdfReader  # import tardio: só o caminho de PDF paga o custo
 
-    reader = PdfReader(io.BytesIO(blob))
+    t0 = time.perf_counter()
+    reader = PdfReader(stream)
     pages_count = len(reader.pages)
     limit = min(pages_count, PDF_MAX_PAGES)
 
     parts = []
+    chars = 0
+    stopped = None
     for i in range(limit):
+        if PDF_TIME_BUDGET > 0 and time.perf_counter() - t0 > PDF_TIME_BUDGET:
+            stopped = "time_budget"
+            break
         txt = reader.pages[i].extract_text() or ""
         parts.append(txt)
+        chars += len(txt) + 2
+        if chars > TEXT_MAX_CHARS and i + 1 < limit:
+            stopped = "char_budget"
+            break
 
-    text = ("\n\n".join(parts)).strip()
-    if len(text) > TEXT_MAX_CHARS:
-        text = text[:TEXT_MAX_CHARS] + "\n[...]"
+    text = _truncate(("\n\n".join(parts)).strip())
+    elapsed = max(time.perf_counter() - t0, 1e-9)
 
     return text, {
         "type": "pdf",
         "pages": pages_count,
-        "pages_processed": limit,
-        "size_bytes": len(blob),
+        "pages_processed": len(parts),
+        "size_bytes": size_bytes,
+        "stopped": stopped,
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "pages_per_sec": round(len(parts) / elapsed, 1),
+        "bytes_per_sec": round(size_bytes / elapsed),
     }
+
+def extract_text_from_file(fobj: BinaryIO, kind: str, size_bytes: int) -> Tuple[str, dict]:
+    """
+    Extrai direto de um arquivo aberto (ex.: o spool do upload), sem copiar
+    tudo para memória. `kind` vem de `uploads.sniff_kind` ('pdf' | 'txt').
+    """
+    fobj.seek(0)
+    if kind == "txt":
+        # Só o necessário para TEXT_MAX_CHARS (até 4 bytes por caractere em UTF-8)
+        head = fobj.read(TEXT_MAX_CHARS * 4 + 1)
+        try:
+            text = head.decode("utf-8")
+        except UnicodeDecodeError as e:
+            text = head[:e.start].decode("utf-8") if e.start >= len(head) - 3 else _decode_txt(head)
+        return _truncate(text).strip(), {"type": "txt", "pages": 1, "size_bytes": size_bytes}
+
+    if kind != "pdf":
+        raise ValueError("Apenas arquivos .pdf ou .txt são suportados")
+
+    return _extract_pdf(fobj, size_bytes)
+
+def extract_text_from_blob(blob: bytes, filename: str) -> Tuple[str, dict]:
+    name = (filename or "").lower()
+
+    if name.endswith(".txt"):
+        text = _truncate(_decode_txt(blob))
+        return text.strip(), {"type": "txt", "pages": 1, "size_bytes": len(blob)}
+
+    if not name.endswith(".pdf"):
+        raise ValueError("Apenas arquivos .pdf ou .txt são suportados")
+
+    return _extract_pdf(io.BytesIO(blob), len(blob))
+
+# pypdf é CPU-bound e puro Python: um pool de threads tira o trabalho do
+# event loop. (ProcessPool não funciona na Lambda — não há /dev/shm.)
+_executor: Optional[ThreadPoolExecutor] = None
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(1, PDF_WORKERS), thread_name_prefix="pdf")
+    return _executor
+
+async def aextract_text_from_blob(blob: bytes, filename: str) -> Tuple[str, dict]:
+    """Versão assíncrona: roda a extração no pool de workers."""
+    loop = asyncio.get_running_loop()
+    with stage("extract"):
+        return await loop.run_in_executor(_get_executor(), extract_text_from_blob, blob, filename)
+
+async def aextract_text_from_file(fobj: BinaryIO, kind: str, size_bytes: int) -> Tuple[str, dict]:
+    loop = asyncio.get_running_loop()
+    # inclui a espera por um worker livre do pool
+    with stage("extract"):
+        return await loop.run_in_executor(_get_executor(), extract_text_from_file, fobj, kind, size_bytes)
@@ -0,0 +1,275 @@
+# app/prompts.py
+"""
+Registro de prompts: montados uma vez no import e versionados por hash.
+
+Cada prompt tem uma parte estática — a mensagem de sistema e o início da
+mensagem do usuário (idioma e instruções) — e só depois vem o que muda por
+requisição (assunto e conteúdo). Assim chamadas diferentes compartilham o
+maior prefixo possível, que é o que o prompt caching da OpenAI reaproveita
+(prefixos a partir de 1024 tokens, em blocos de 128; ver `cached_tokens`).
+
+A versão (sha1 da parte estática + template) entra na chave do cache de
+resultados e separa as estatísticas por prompt em `/debug/stats`: dá para
+comparar duas versões (A/B entre deploys ou no bench/replay.py) pela
+proporção de tokens de entrada em cache e pela latência.
+"""
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .budget import estimate_tokens
+
+# Mínimo de tokens de prefixo para o cache de prompt da OpenAI
+PROVIDER_CACHE_MIN_TOKENS = 1024
+
+LANG_MAP: Dict[str, Dict[str, str]] = {
+    "pt": {
+        "name": "Português do Brasil",
+        "short": "pt-BR",
+        "improd": "Este e-mail foi classificado como Improdutivo. Portanto, não será gerada uma resposta sugerida.",
+        "team": "Equipe de Atendimento",     
+    },
+    "en": {
+        "name": "English",
+        "short": "en",
+        "improd": "This email has been classified as Unproductive. Therefore, no suggested reply will be generated.",
+        "team": "Support Team",              
+    },
+}
+
+
+CLS_SYSTEM = """
+(Temperatura=0.6)
+Você é um classificador de e-mails para uma grande instituição do setor financeiro (banco/serviços financeiros).
+Responda **somente** em JSON, exatamente neste formato:
+{"category":"Produtivo|Improdutivo","confidence":0.0-1.0}
+
+Objetivo: separar rapidamente o que requer ação operacional/atendimento (Produtivo) do que é irrelevante ou sem ação (Improdutivo).
+
+Definições gerais:
+- Produtivo: tratativas de clientes ou parceiros, currículo, solicitações com ação clara, temas de compliance/risco, prazos, reuniões, propostas/contratos, faturas/cobranças, suporte técnico, incidentes, onboarding/KYC, auditoria, reportes regulatórios (ex.: BACEN, CVM), temas de segurança (fraude, phishing, chargeback, disputa), LGPD/privacidade (acesso/retificação/exclusão de dados).
+- Improdutivo: spam, correntes, promoções irrelevantes, envio massivo sem contexto, conversa social sem ação, divulgação genérica, newsletters não solicitadas, conteúdo suspeito/iscas (sem identificação, anexos estranhos, links encurtados) quando não houver pedido claro.
+
+Sinais de PRODUTIVO: pedido/ação ou prazo claro; cita conta/contrato/transação/ticket/ID; envolve obrigação regulatória/compliance/jurídico/risco/segurança.
+Sinais de IMPRODUTIVO: promoção genérica; felicitações sem relação de negócio; pedido vago; marketing puro; mensagens repetitivas sem call-to-action.
+
+Regras:
+- Não invente dados. Classifique usando apenas o conteúdo recebido.
+- Se houver indício de fraude/phishing **sem** ação clara, classifique como Improdutivo (tratado fora do fluxo).
+- A confiança deve refletir a clareza dos sinais (0.0 a 1.0).
+- **Não** inclua nada além do JSON pedido (sem comentários/explicações).
+"""
+
+def gen_system_for(lang_code: str) -> str:
+    cfg = LANG_MAP[lang_code]
+    signature = ("Best regards,\n" + cfg["team"]) if lang_code == "en" else ("Atenciosamente,\n" + cfg["team"])
+    example_greeting = "Hi," if lang_code == "en" else "Olá,"
+
+    return f"""
+Você redige respostas **curtas, objetivas e educadas** para e-mails classificados como Produtivo em uma grande instituição do setor financeiro.
+Saída **somente** como JSON, exatamente neste formato:
+{{"suggested_reply":"<corpo_do_email_em_texto_puro_sem_assunto>"}}
+
+Regras GERAIS:
+- Forneça esses dados quando for necessário ou solicitado: Site da empresa é www.financecorp.com.br (Brasil) e www.financecorp.com (internacional). Telefone para contato: +55 11 4002-8922 (Brasil) e +1 800 123 4567 (EUA).
+- **Responda sempre em {cfg['name']}** (não mude o idioma).
+- Tom profissional, cordial e direto; sem jargões desnecessários.
+- **Não** compartilhe dados sensíveis (LGPD). Peça apenas o mínimo (ex.: ID do ticket, últimos 4 dígitos, CPF mascarado).
+- **Não** prometa prazos rígidos ou garantias; use linguagem de melhor esforço.
+- Se houver suspeita de fraude/riscos, indique canal seguro e evite links/senhas.
+
+FORMATO (texto puro), **sem linha de assunto**:
+1) Saudação (ex.: "{example_greeting}")
+2) Corpo em 1 a 3 frases objetivas
+3) Fechamento e assinatura:
+
+{signature}
+""".strip()
+
+
+def combined_system_for(lang_code: str) -> str:
+    return f"""
+Você executa duas tarefas numa única resposta: classificar o e-mail recebido e, se ele for Produtivo, redigir a resposta sugerida.
+Responda **somente** em JSON, exatamente neste formato:
+{{"category":"Produtivo|Improdutivo","confidence":0.0-1.0,"suggested_reply":"<corpo_do_email_ou_vazio>"}}
+
+- Se a categoria for Improdutivo, use "suggested_reply":"".
+- Ignore os formatos JSON citados nas seções abaixo; use apenas o formato acima.
+
+### TAREFA 1 — CLASSIFICAÇÃO
+{CLS_SYSTEM.strip()}
+
+### TAREFA 2 — RESPOSTA SUGERIDA (somente se Produtivo)
+{gen_system_for(lang_code)}
+""".strip()
+
+
+CLS_BATCH_SYSTEM = f"""
+Você recebe VÁRIOS e-mails numa única mensagem, cada um começando por "### E-MAIL <id>", e classifica cada um de forma independente.
+Responda **somente** em JSON, exatamente neste formato, com um item por e-mail e os mesmos ids:
+{{"results":[{{"id":"<id>","category":"Produtivo|Improdutivo","confidence":0.0-1.0}}]}}
+
+- Um e-mail não influencia a classificação de outro.
+- Ignore o formato JSON citado na seção abaixo; use apenas o formato acima.
+
+### CRITÉRIOS DE CLASSIFICAÇÃO
+{CLS_SYSTEM.strip()}
+""".strip()
+
+
+# Início estático da mensagem do usuário e template da parte variável, por tipo
+_CLS_PREAMBLE = "Classifique e responda estritamente no esquema JSON indicado."
+_CLS_TAIL = "Assunto: {subject}\nConteúdo:\n{body}"
+_CLS_BATCH_PREAMBLE = "Classifique cada e-mail abaixo e responda estritamente no esquema JSON indicado, com todos os ids."
+_CLS_BATCH_TAIL = "### E-MAIL {id}\nAssunto: {subject}\nConteúdo:\n{body}"
+
+
+def _reply_preamble(cfg: Dict[str, str]) -> str:
+    return (
+        f"IDIOMA DA RESPOSTA: {cfg['name']} ({cfg['short']}). Responda somente neste idioma.\n"
+        "Gere o corpo do e-mail (saudação, 1–3 frases objetivas e assinatura), "
+        "SEM linha de assunto. Retorne somente JSON no formato especificado."
+    )
+
+
+_REPLY_TAIL = "Assunto original (apenas contexto, NÃO inclua na resposta): {subject}\nConteúdo do email recebido:\n{body}"
+
+
+def _combined_preamble(cfg: Dict[str, str]) -> str:
+    return (
+        f"IDIOMA DA RESPOSTA: {cfg['name']} ({cfg['short']}).\n"
+        "Classifique e, se Produtivo, gere o corpo da resposta (sem linha de assunto). "
+        "Retorne somente JSON no formato especificado."
+    )
+
+
+class Prompt:
+    __slots__ = ("name", "lang", "system", "preamble", "tail", "version", "static_tokens")
+
+    def __init__(self, name: str, lang: str, system: str, preamble: str, tail: str):
+        self.name = name
+        self.lang = lang
+        self.system = system
+        self.preamble = preamble
+        self.tail = tail
+        raw = "\x1f".join((system, preamble, tail))
+        self.version = f"{name}-{hashlib.sha1(raw.encode('utf-8')).hexdigest()[:10]}"
+        self.static_tokens = estimate_tokens(system) + estimate_tokens(preamble)
+
+    def messages(self, body_text: str, subject: Optional[str]) -> List[dict]:
+        variable = self.tail.format(subject=subject or "(sem)", body=body_text)
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": f"{self.preamble}\n\n{variable}"},
+        ]
+
+    def batch_messages(self, items: List[Tuple[str, str, Optional[str]]]) -> List[dict]:
+        """Vários e-mails numa mensagem só (prompts *_batch): items = [(id, corpo, assunto)]."""
+        variable = "\n\n".join(
+            # um corpo com o próprio marcador não pode abrir um item falso
+            self.tail.format(id=i, subject=subject or "(sem)", body=body.replace("### E-MAIL", "# E-MAIL"))
+            for i, body, subject in items
+        )
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": f"{self.preamble}\n\n{variable}"},
+        ]
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "lang": self.lang,
+            "static_tokens": self.static_tokens,
+            # abaixo do mínimo, o prefixo estático sozinho nunca vira cache no provedor
+            "provider_cacheable": self.static_tokens >= PROVIDER_CACHE_MIN_TOKENS,
+        }
+
+
+def _build() -> Dict[Tuple[str, str], Prompt]:
+    registry = {}
+    for lang, cfg in LANG_MAP.items():
+        # a classificação não depende do idioma: mesmo texto (e versão) para todos
+        registry[("classify", lang)] = Prompt("classify", lang, CLS_SYSTEM, _CLS_PREAMBLE, _CLS_TAIL)
+        registry[("classify_batch", lang)] = Prompt(
+            "classify_batch", lang, CLS_BATCH_SYSTEM, _CLS_BATCH_PREAMBLE, _CLS_BATCH_TAIL,
+        )
+        registry[("reply", lang)] = Prompt("reply", lang, gen_system_for(lang), _reply_preamble(cfg), _REPLY_TAIL)
+        registry[("combined", lang)] = Prompt(
+            "combined", lang, combined_system_for(lang), _combined_preamble(cfg), _CLS_TAIL,
+        )
+    return registry
+
+
+_REGISTRY = _build()
+
+
+def get_prompt(name: str, lang: str) -> Prompt:
+    return _REGISTRY[(name, lang if (name, lang) in _REGISTRY else "pt")]
+
+
+class PromptStats:
+    """Por versão: chamadas, latência e tokens de entrada (total e em cache no provedor)."""
+
+    def __init__(self):
+        self.by_version: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, prompt: Prompt) -> dict:
+        e = self.by_version.get(prompt.version)
+        if e is None:
+            e = self.by_version[prompt.version] = {
+                **prompt.describe(), "calls": 0, "total_ms": 0.0, "prompt_tokens": 0, "cached_tokens": 0,
+            }
+        return e
+
+    def on_call(self, prompt: Prompt, elapsed_ms: float) -> None:
+        with self._lock:
+            e = self._entry(prompt)
+            e["calls"] += 1
+            e["total_ms"] += elapsed_ms
+
+    def on_usage(self, prompt: Prompt, usage) -> None:
+        if usage is None:
+            return
+        with self._lock:
+            e = self._entry(prompt)
+            e["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            e["cached_tokens"] += cached_tokens(usage)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            out = {}
+            for version, e in sorted(self.by_version.items()):
+                out[version] = {
+                    **{k: e[k] for k in ("name", "lang", "static_tokens", "provider_cacheable", "calls",
+                                         "prompt_tokens", "cached_tokens")},
+                    "cached_ratio": round(e["cached_tokens"] / e["prompt_tokens"], 4) if e["prompt_tokens"] else 0.0,
+                    "avg_ms": round(e["total_ms"] / e["calls"], 2) if e["calls"] else 0.0,
+                }
+            return out
+
+
+def cached_tokens(usage) -> int:
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+
+
+_stats = PromptStats()
+
+
+def record_prompt_call(prompt: Optional[Prompt], elapsed_ms: float, usage=None) -> None:
+    if prompt is not None:
+        _stats.on_call(prompt, elapsed_ms)
+        _stats.on_usage(prompt, usage)
+
+
+def record_prompt_usage(prompt: Optional[Prompt], usage) -> None:
+    if prompt is not None:
+        _stats.on_usage(prompt, usage)
+
+
+def prompt_stats() -> dict:
+    return {
+        "versions": {f"{p.name}/{p.lang}": p.version for p in _REGISTRY.values()},
+        "by_version": _stats.snapshot(),
+    }
@@ -0,0 +1,201 @@
+# app/resilience.py
+"""
+Proteções das chamadas à OpenAI sob carga:
+
+- TokenBucket: limitador no cliente, dimensionado pela cota RPM/TPM;
+- backoff exponencial com jitter, respeitando Retry-After;
+- CircuitBreaker: falha rápido quando o upstream está degradado.
+
+Sem dependência do SDK: a classificação dos erros (`is_retryable`,
+`retry_after`) inspeciona atributos das exceções do `openai`.
+"""
+import random
+import threading
+import time
+from typing import Optional
+
+
+class LLMUnavailable(Exception):
+    """Upstream indisponível (429/timeout/5xx após os retries, ou circuito aberto)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Balde com reposição contínua (`per_minute` por minuto). `reserve(n)` consome
+    já — o saldo pode ficar negativo — e devolve quanto esperar antes de usar.
+    Assim funciona igual para chamadas síncronas e assíncronas.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n: float = 1.0) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+            self.level -= n
+            return max(0.0, -self.level / self.rate)
+
+    def refund(self, n: float) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self.level = min(self.capacity, self.level + n)
+
+
+class RateLimiter:
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.throttled = 0
+        self.wait_total = 0.0
+
+    def reserve(self, est_tokens: int) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(est_tokens))
+        if wait > 0:
+            self.throttled += 1
+            self.wait_total += wait
+        return wait
+
+    def release(self, est_tokens: int) -> None:
+        if self.requests is not None:
+            self.requests.refund(1)
+        if self.tokens is not None:
+            self.tokens.refund(est_tokens)
+
+    def snapshot(self) -> dict:
+        return {
+            "rpm_available": round(self.requests.level, 1) if self.requests else None,
+            "tpm_available": round(self.tokens.level) if self.tokens else None,
+            "throttled_calls": self.throttled,
+            "throttled_wait_s": round(self.wait_total, 3),
+        }
+
+
+class CircuitBreaker:
+    """closed → (N falhas seguidas) → open → (reset_timeout) → half_open → 1 sonda."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_count = 0
+        self.rejected = 0
+        self._probe = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = "half_open"
+                self._probe = False
+            if self.state == "half_open":
+                if self._probe:
+                    self.rejected += 1
+                    return False
+                self._probe = True
+            return True
+
+    def abandon(self) -> None:
+        """Sonda cancelada sem resultado: libera outra tentativa no half_open."""
+        with self._lock:
+            self._probe = False
+
+    def retry_in(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe = False
+
+    def on_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold > 0:
+                if self.state != "open":
+                    self.open_count += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probe = False
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.open_count,
+            "rejected_calls": self.rejected,
+            "retry_in_s": round(self.retry_in(), 2) if self.state == "open" else 0.0,
+        }
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """Exponencial com "equal jitter"; nunca menor que o Retry-After do servidor."""
+    exp = min(cap, base * (2 ** attempt))
+    delay = exp / 2 + random.uniform(0, exp / 2)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+
+def retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def is_retryable(exc: Exception) -> bool:
+    """429 (exceto cota esgotada), 408/409, 5xx, timeout e erro de conexão."""
+    import openai
+
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.RateLimitError):
+        return getattr(exc, "code", None) != "insufficient_quota"
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in (408, 409) or exc.status_code >= 500
+    return False
+
+
+def estimate_tokens(messages: list, max_completion: int = 300) -> int:
+    """Estimativa local (app/budget.py) para o balde de TPM."""
+    from .budget import estimate_tokens as text_tokens
+
+    return sum(text_tokens(m.get("content") or "") for m in messages) + max_completion
@@ -0,0 +1,208 @@
+# app/streaming.py
+"""
+Peças do /classify-stream (SSE):
+
+- `JsonStringStream`: extrai, pedaço a pedaço, o valor de uma chave string de
+  um JSON que ainda está chegando (`{"suggested_reply":"..."}`), decodificando
+  escapes (inclusive \\uXXXX e pares surrogate) mesmo quando cortados entre pedaços;
+- `SubjectLineFilter`: versão incremental de `_strip_subject_lines` — descarta
+  linhas "Assunto:/Subject:" e o espaço em branco das pontas, emitindo o resto
+  assim que dá para decidir;
+- `sse`: formata um evento Server-Sent Events.
+"""
+import json
+import re
+
+_HEX = frozenset("0123456789abcdefABCDEF")
+# As mesmas quebras de linha de str.splitlines() (\r\n conta como uma só)
+LINE_BREAKS = frozenset("\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029")
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class JsonStringStream:
+    def __init__(self, key: str):
+        self._start_re = re.compile(r'"%s"\s*:\s*"' % re.escape(key))
+        self._seek = ""          # texto antes de achar a chave
+        self._esc = ""           # escape incompleto (ex.: "\\u00")
+        self._high = ""          # metade alta de um par surrogate
+        self.started = False
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        if self.done or not chunk:
+            return ""
+        if not self.started:
+            self._seek += chunk
+            m = self._start_re.search(self._seek)
+            if m is None:
+                return ""
+            self.started = True
+            chunk, self._seek = self._seek[m.end():], ""
+
+        out = []
+        i, n = 0, len(chunk)
+        while i < n:
+            if self._esc:
+                need = 6 if self._esc.startswith("\\u") or (len(self._esc) == 1 and chunk[i] == "u") else 2
+                take = min(need - len(self._esc), n - i)
+                self._esc += chunk[i:i + take]
+                i += take
+                if len(self._esc) < need:
+                    break
+                out.append(self._decode_escape())
+                continue
+            j = i
+            while j < n and chunk[j] not in '"\\':
+                j += 1
+            if j > i:
+                out.append(self._flush_high() + chunk[i:j])
+            if j == n:
+                break
+            if chunk[j] == '"':
+                out.append(self._flush_high())
+                self.done = True
+                break
+            self._esc = "\\"
+            i = j + 1
+        return "".join(out)
+
+    def _decode_escape(self) -> str:
+        esc, self._esc = self._esc, ""
+        if esc.startswith("\\u") and not all(c in _HEX for c in esc[2:]):
+            return self._flush_high()  # escape inválido: descarta
+        if esc.startswith("\\u"):
+            code = int(esc[2:], 16)
+            if 0xD800 <= code <= 0xDBFF:
+                prev, self._high = self._flush_high(), esc
+                return prev
+            if 0xDC00 <= code <= 0xDFFF and self._high:
+                pair, self._high = self._high + esc, ""
+                return json.loads(f'"{pair}"')
+        try:
+            return self._flush_high() + json.loads(f'"{esc}"')
+        except ValueError:
+            return self._flush_high()
+
+    def _flush_high(self) -> str:
+        # surrogate alto sem par: vira U+FFFD, como faria um decoder tolerante
+        if not self._high:
+            return ""
+        self._high = ""
+        return "�"
+
+
+class SubjectLineFilter:
+    """
+    Mesmo resultado de `_strip_subject_lines(texto_inteiro)`, mas incremental, com
+    as mesmas quebras de linha de `splitlines()` (LINE_BREAKS). Uma linha fica retida só enquanto ainda pode virar "Assunto:"/"Subject:";
+    quebras de linha e espaços ficam retidos até aparecer conteúdo depois deles
+    (equivale ao .strip() final).
+    """
+
+    _DROP_RE = re.compile(r"\s*(assunto|subject)\s*:", re.I)
+    _MAYBE_RE = re.compile(r"\s*(assunto|subject)\s*", re.I)
+    _WORDS = ("assunto", "subject")
+
+    def __init__(self):
+        self._line = ""          # início da linha atual, ainda indeciso
+        self._decided = False    # linha atual já liberada (ou descartada)
+        self._dropping = False
+        self._pending_ws = ""    # espaço/quebras retidos
+        self._emitted = False
+        self._after_cr = False
+
+    def feed(self, chunk: str) -> str:
+        out = []
+        for ch in chunk:
+            if self._after_cr:
+                self._after_cr = False
+                if ch == "\n":
+                    continue
+            if ch in LINE_BREAKS:
+                self._after_cr = ch == "\r"
+                self._end_line(out)
+                continue
+            if self._decided:
+                if not self._dropping:
+                    self._emit(ch, out)
+                continue
+            self._line += ch
+            self._decide(out)
+        return "".join(out)
+
+    def flush(self) -> str:
+        out = []
+        if not self._decided and not self._DROP_RE.match(self._line):
+            self._emit_text(self._line, out)
+        self._line = ""
+        return "".join(out)
+
+    def _decide(self, out):
+        if self._DROP_RE.match(self._line):
+            self._decided = self._dropping = True
+            return
+        head = self._line.lstrip().lower()
+        if not head or self._MAYBE_RE.fullmatch(self._line) or any(w.startswith(head) for w in self._WORDS):
+            return
+        self._decided = True
+        self._emit_text(self._line, out)
+
+    def _end_line(self, out):
+        if not self._decided:
+            if self._DROP_RE.match(self._line):
+                self._dropping = True
+            else:
+                self._emit_text(self._line, out)
+        if not self._dropping:
+            self._emit("\n", out)
+        self._line = ""
+        self._decided = self._dropping = False
+
+    def _emit_text(self, text: str, out):
+        for ch in text:
+            self._emit(ch, out)
+
+    def _emit(self, ch: str, out):
+        if ch.isspace():
+            if self._emitted:
+                self._pending_ws += ch
+            return
+        if self._pending_ws:
+            out.append(self._pending_ws)
+            self._pending_ws = ""
+        out.append(ch)
+        self._emitted = True
+
+
+class ReplyStream:
+    """Pedaços crus do modelo → texto da resposta já filtrado, pronto para o cliente."""
+
+    def __init__(self, key: str = "suggested_reply"):
+        self._json = JsonStringStream(key)
+        self._filter = SubjectLineFilter()
+        self.raw = []
+        self.text = []
+
+    def feed(self, chunk: str) -> str:
+        self.raw.append(chunk)
+        piece = self._filter.feed(self._json.feed(chunk))
+        if piece:
+            self.text.append(piece)
+        return piece
+
+    def flush(self) -> str:
+        piece = self._filter.flush()
+        if piece:
+            self.text.append(piece)
+        return piece
+
+    @property
+    def reply(self) -> str:
+        return "".join(self.text)
+
+    @property
+    def complete(self) -> bool:
+        return self._json.done
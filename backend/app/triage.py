@@ -0,0 +1,241 @@
+# app/triage.py
+import asyncio
+from typing import AsyncIterator, Optional, Tuple
+from .budget import apply_budget, record_usage
+from .config import LANGID_MIN_CONFIDENCE, LLM_MODE
+from .langid import REPLY_LANG, detect_language
+from .openai_client import (
+    agenerate_reply, aclassify_and_reply, astream_reply, sanitize_lang, reply_call_tokens,
+)
+from .local_classifier import classify_local
+from .dedup import classify_deduplicated
+from .batcher import classify_batched
+from .history import record_result
+from .tracing import stage
+
+
+# ===== template padrão para improdutivo =====
+def canned_improdutivo(lang_code: str) -> str:
+    code = sanitize_lang(lang_code)
+    if code == "en":
+        return "Thanks for reaching out! We've recorded your message."
+    return "Obrigado pela mensagem! Registramos seu contato."
+
+
+# ===== idioma da resposta (compartilhado entre API e worker) =====
+def _sanitize_requested_lang(code: Optional[str]) -> str:
+    if not code:
+        return "auto"
+    c = code.strip().lower()
+    if c in ("pt", "pt-br", "pt_br"):
+        return "pt"
+    if c.startswith("en"):
+        return "en"
+    if c == "auto":
+        return "auto"
+    # es, fr-CA, it_IT...: mesmo mapeamento do detector para os idiomas de resposta
+    return REPLY_LANG.get(c.replace("_", "-").split("-")[0], "pt")
+
+
+def decide_language(requested: str, text_blob: str,
+                    accept_language: Optional[str], x_user_lang: Optional[str]) -> str:
+    """
+    Retorna 'pt' ou 'en'.
+    Prioridade: X-User-Lang > Accept-Language > identificador de idioma (app/langid.py) > default pt.
+    """
+    req = _sanitize_requested_lang(requested)
+    if req in ("pt", "en"):
+        return req
+
+    # Headers
+    for h in (x_user_lang, accept_language):
+        if not h:
+            continue
+        h = h.lower()
+        if "pt" in h:
+            return "pt"
+        if "en" in h:
+            return "en"
+
+    # Trigramas sobre uma amostra do começo do texto; es/it → pt, fr/de → en
+    detected, _ = detect_language(text_blob, LANGID_MIN_CONFIDENCE)
+    if detected:
+        return REPLY_LANG[detected]
+
+    # Default
+    return "pt"
+
+
+class SpeculationStats:
+    """LLM_MODE=speculative: quanto da geração antecipada foi aproveitado."""
+
+    def __init__(self):
+        self.speculated = 0
+        self.used = 0
+        self.discarded = 0
+        self.cancelled_inflight = 0
+        self.tokens_total = 0
+        self.tokens_wasted = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "speculated": self.speculated,
+            "used": self.used,
+            "discarded": self.discarded,
+            "cancelled_inflight": self.cancelled_inflight,
+            "tokens_total": self.tokens_total,
+            "tokens_wasted": self.tokens_wasted,
+            "wasted_token_rate": round(self.tokens_wasted / self.tokens_total, 4) if self.tokens_total else 0.0,
+        }
+
+
+_spec_stats = SpeculationStats()
+
+
+def speculation_stats() -> dict:
+    return _spec_stats.snapshot()
+
+
+async def _classify(cls_text: str, subject: Optional[str], lang: str, calls: list) -> Tuple[str, float]:
+    """Classificação pelo LLM, a menos que um quase duplicado recente já tenha o veredito."""
+    async def llm():
+        calls.append("classify")
+        return await classify_batched(cls_text, subject, lang)
+
+    category, confidence, _ = await classify_deduplicated(subject, cls_text, llm)
+    return category, confidence
+
+
+async def _speculate(cls_text: str, reply_text: str, subject: Optional[str], lang: str,
+                     calls: list) -> Tuple[str, float, str]:
+    """
+    Classificação e resposta em paralelo. Se o e-mail for Improdutivo a resposta
+    é cancelada (ou descartada, se já tiver chegado) e os tokens dela contam como
+    desperdício — estimados localmente; uma chamada cancelada conta só o prompt.
+    """
+    reply_task = asyncio.ensure_future(agenerate_reply(reply_text, subject, lang))
+    _spec_stats.speculated += 1
+    try:
+        category, confidence = await _classify(cls_text, subject, lang, calls)
+    except BaseException:
+        reply_task.cancel()
+        raise
+
+    if category != "Improdutivo":
+        suggested = await reply_task
+        _spec_stats.used += 1
+        _spec_stats.tokens_total += reply_call_tokens(reply_text, subject, lang, suggested)
+        return category, confidence, suggested
+
+    if reply_task.done():
+        # A resposta descartada pode ter falhado (ex.: LLMUnavailable): conta só o prompt
+        failed = reply_task.exception() is not None
+        wasted = reply_call_tokens(reply_text, subject, lang, None if failed else reply_task.result())
+    else:
+        reply_task.cancel()
+        _spec_stats.cancelled_inflight += 1
+        wasted = reply_call_tokens(reply_text, subject, lang)
+    _spec_stats.discarded += 1
+    _spec_stats.tokens_total += wasted
+    _spec_stats.tokens_wasted += wasted
+    return category, confidence, canned_improdutivo(lang)
+
+
+async def triage(body_text: str, subject: Optional[str], lang: str,
+                 mode: Optional[str] = None, meta: Optional[dict] = None,
+                 count: int = 1) -> Tuple[str, float, str]:
+    """
+    Fluxo classificação → resposta sugerida. Retorna (categoria, confiança, resposta).
+    `mode` sobrepõe LLM_MODE ("two_call" | "combined" | "speculative"). Se `meta` for passado,
+    recebe o relatório de tokens em meta["tokens"]. O resultado entra no histórico (app/history.py)
+    `count` vezes: quantos itens de entrada ele responde.
+    """
+    category, confidence, suggested = await _triage(body_text, subject, lang, mode or LLM_MODE, meta)
+    record_result(category, confidence, lang, count)
+    return category, confidence, suggested
+
+
+async def _triage(body_text: str, subject: Optional[str], lang: str,
+                  mode: str, meta: Optional[dict]) -> Tuple[str, float, str]:
+    with stage("budget"):
+        cls_text, reply_text, report = apply_budget(body_text)
+    calls = []
+
+    try:
+        # Casos óbvios resolvidos localmente, sem chamada de classificação ao LLM
+        with stage("local"):
+            local = classify_local(subject, cls_text)
+        if local is not None:
+            category, confidence = local
+            if category == "Improdutivo":
+                return category, confidence, canned_improdutivo(lang)
+            calls.append("reply")
+            return category, confidence, await agenerate_reply(reply_text, subject, lang)
+
+        if mode == "combined":
+            # Uma chamada só: recebe o orçamento da resposta. Com veredito de um
+            # quase duplicado, só a resposta (quando Produtivo) vai ao LLM.
+            suggested = None
+
+            async def combined():
+                nonlocal suggested
+                calls.append("reply")
+                category, confidence, suggested = await aclassify_and_reply(reply_text, subject, lang)
+                return category, confidence
+
+            category, confidence, _ = await classify_deduplicated(subject, cls_text, combined)
+            if category == "Improdutivo":
+                return category, confidence, canned_improdutivo(lang)
+            if not suggested:
+                calls.append("reply")
+                suggested = await agenerate_reply(reply_text, subject, lang)
+            return category, confidence, suggested
+
+        if mode == "speculative":
+            calls.append("reply")
+            return await _speculate(cls_text, reply_text, subject, lang, calls)
+
+        category, confidence = await _classify(cls_text, subject, lang, calls)
+        if category == "Improdutivo":
+            suggested = canned_improdutivo(lang)
+        else:
+            calls.append("reply")
+            suggested = await agenerate_reply(reply_text, subject, lang)
+        return category, confidence, suggested
+    finally:
+        tokens = record_usage(report, calls)
+        if meta is not None:
+            meta["tokens"] = tokens
+
+
+async def triage_stream(body_text: str, subject: Optional[str], lang: str,
+                        meta: Optional[dict] = None) -> AsyncIterator[Tuple[str, object]]:
+    """
+    Variante em streaming de `triage`: emite ("category", (categoria, confiança))
+    assim que a classificação sai e depois ("delta", texto) com pedaços da resposta.
+    Sempre classifica antes de gerar (o modo combined não permite separar a categoria).
+    """
+    with stage("budget"):
+        cls_text, reply_text, report = apply_budget(body_text)
+    calls = []
+
+    try:
+        with stage("local"):
+            local = classify_local(subject, cls_text)
+        if local is not None:
+            category, confidence = local
+        else:
+            category, confidence = await _classify(cls_text, subject, lang, calls)
+        record_result(category, confidence, lang)
+        yield "category", (category, confidence)
+
+        if category == "Improdutivo":
+            yield "delta", canned_improdutivo(lang)
+            return
+        calls.append("reply")
+        async for piece in astream_reply(reply_text, subject, lang):
+            yield "delta", piece
+    finally:
+        tokens = record_usage(report, calls)
+        if meta is not None:
+            meta["tokens"] = tokens
@@ -0,0 +1,128 @@
+# app/uploads.py
+"""
+Uploads com teto de tamanho e detecção de tipo por magic bytes.
+
+O Starlette já grava as partes multipart num SpooledTemporaryFile (memória
+até 1 MB, depois disco). Aqui garantimos que:
+- o corpo é cortado com 413 enquanto ainda está sendo recebido
+  (`UploadLimitMiddleware`), sem esperar o parse do multipart terminar;
+- o tipo vem dos primeiros bytes do arquivo, não da extensão;
+- o conteúdo é lido direto do arquivo em spool, sem cópia extra em memória.
+"""
+import json
+from typing import BinaryIO, Iterable, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+SNIFF_BYTES = 4096
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    """Middleware ASGI: 413 se o corpo dos `paths` passar de `max_bytes`."""
+
+    def __init__(self, app, max_bytes: int, paths: Iterable[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        declared = headers.get(b"content-length")
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        started = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, started, rejected
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # O parser de form do FastAPI engole exceções (vira 400),
+                    # então o 413 é enviado aqui e o resto da resposta é descartado.
+                    if not started:
+                        started = rejected = True
+                        await self._reject(send)
+                    raise _BodyTooLarge()
+            return message
+
+        async def tracking_send(message):
+            nonlocal started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            pass
+
+    async def _reject(self, send):
+        body = json.dumps(
+            {"detail": f"Arquivo excede o limite de {self.max_bytes} bytes"}, ensure_ascii=False
+        ).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def sniff_kind(head: bytes) -> Optional[str]:
+    """'pdf' | 'txt' | None a partir dos primeiros bytes do arquivo."""
+    if head.lstrip(b"\r\n\t ").startswith(b"%PDF-"):
+        return "pdf"
+    if not head or b"\x00" in head:
+        return None
+    try:
+        head.decode("utf-8")
+        return "txt"
+    except UnicodeDecodeError as e:
+        # Corte no meio de um caractere multibyte no fim da amostra
+        if e.start >= len(head) - 3:
+            return "txt"
+    sample = head.decode("latin-1")
+    printable = sum(ch.isprintable() or ch in "\r\n\t" for ch in sample)
+    return "txt" if printable / len(sample) > 0.95 else None
+
+
+def file_size(fobj: BinaryIO) -> int:
+    pos = fobj.tell()
+    fobj.seek(0, 2)
+    size = fobj.tell()
+    fobj.seek(pos)
+    return size
+
+
+def in_memory(fobj) -> bool:
+    """True se o SpooledTemporaryFile ainda não foi para o disco."""
+    return not getattr(fobj, "_rolled", True)
+
+
+def process_peak_rss_mb() -> Optional[float]:
+    """
+    Pico de RSS do processo desde que ele subiu (`ru_maxrss`), em MB — não é o
+    pico da requisição. A diferença entre duas leituras só é > 0 quando o
+    intervalo elevou o máximo do processo, e inclui as requisições concorrentes.
+    """
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
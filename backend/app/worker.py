@@ -0,0 +1,242 @@
+# app/worker.py
+"""
+Worker dos jobs assíncronos: consome a fila de app/jobs.py e grava o resultado.
+
+Roda dentro da API (JOBS_INLINE_WORKER=true, necessário com JOBS_BACKEND=memory),
+como processo separado, compartilhando o SQLite com a API:
+
+    JOBS_BACKEND=sqlite python -m app.worker --concurrency 4
+
+ou, na Lambda, como outra função disparada pela fila SQS (`sqs_handler`, em
+worker_handler.py) com JOBS_BACKEND=dynamodb. Vários workers podem rodar em
+paralelo: o claim é atômico nos dois backends compartilhados.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import tempfile
+from typing import BinaryIO, Optional
+
+from .config import JOBS_WORKERS, JOBS_POLL_INTERVAL, JOBS_MAX_ATTEMPTS, JOBS_SPOOL_DIR, JOBS_SPOOL_BUCKET
+from .jobs import get_job_store
+from .pdf import aextract_text_from_file
+from .resilience import LLMUnavailable
+from .triage import triage, decide_language
+
+log = logging.getLogger("mail-triage.worker")
+
+# Acorda o worker embutido na API assim que um job entra (sem esperar o poll)
+_wakeup: Optional[asyncio.Event] = None
+
+
+def notify_worker() -> None:
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+class JobFailed(Exception):
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+_s3_client = None
+
+
+def _s3():
+    global _s3_client
+    if _s3_client is None:
+        import boto3  # só com JOBS_SPOOL_BUCKET
+
+        _s3_client = boto3.client("s3")
+    return _s3_client
+
+
+def spool_upload(src: BinaryIO, name: str) -> str:
+    """
+    Copia o upload (em blocos) para onde o worker vai ler: o bucket
+    JOBS_SPOOL_BUCKET (s3://...) ou, sem bucket, JOBS_SPOOL_DIR. Retorna o caminho.
+    """
+    if JOBS_SPOOL_BUCKET:
+        key = f"jobs/{name}.upload"
+        _s3().upload_fileobj(src, JOBS_SPOOL_BUCKET, key)
+        return f"s3://{JOBS_SPOOL_BUCKET}/{key}"
+    os.makedirs(JOBS_SPOOL_DIR, exist_ok=True)
+    path = os.path.join(JOBS_SPOOL_DIR, f"{name}.upload")
+    with open(path, "wb") as out:
+        shutil.copyfileobj(src, out, 1024 * 1024)
+    return path
+
+
+def _open_upload(path: str) -> BinaryIO:
+    if not path.startswith("s3://"):
+        return open(path, "rb")
+    from botocore.exceptions import ClientError
+
+    bucket, key = path[len("s3://"):].split("/", 1)
+    f = tempfile.TemporaryFile()
+    try:
+        _s3().download_fileobj(bucket, key, f)
+    except ClientError as e:
+        f.close()
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+            raise FileNotFoundError(path) from e
+        raise
+    f.seek(0)
+    return f
+
+
+def _result(category: str, confidence: float, suggested: str, lang: str, meta: dict) -> dict:
+    return {
+        "category": category if category in ("Produtivo", "Improdutivo") else "Produtivo",
+        "confidence": max(0.0, min(1.0, confidence)),
+        "suggested_reply": suggested,
+        "language": lang,
+        "meta": meta,
+    }
+
+
+async def _run_text(p: dict) -> dict:
+    lang = decide_language(p.get("language") or "auto", f"{p.get('subject')}\n{p['body']}",
+                           p.get("accept_language"), p.get("x_user_lang"))
+    meta: dict = {}
+    category, confidence, suggested = await triage(p["body"], p.get("subject"), lang, meta=meta)
+    return _result(category, confidence, suggested, lang, meta)
+
+
+async def _run_file(p: dict) -> dict:
+    try:
+        with await asyncio.to_thread(_open_upload, p["path"]) as f:
+            text, meta = await aextract_text_from_file(f, p["file_kind"], p["size"])
+    except FileNotFoundError:
+        raise JobFailed(410, "Arquivo do job não está mais disponível")
+    except ValueError as e:
+        raise JobFailed(400, str(e))
+    if not text or len(text.strip()) < 5:
+        raise JobFailed(422, "Não foi possível extrair texto do arquivo")
+
+    lang = decide_language(p.get("language") or "auto", text, p.get("accept_language"), p.get("x_user_lang"))
+    category, confidence, suggested = await triage(text, p.get("filename"), lang, meta=meta)
+    return _result(category, confidence, suggested, lang, {"file": p.get("filename"), **meta})
+
+
+def _discard_upload(job: dict) -> None:
+    path = (job.get("payload") or {}).get("path")
+    if not path:
+        return
+    try:
+        if path.startswith("s3://"):
+            bucket, key = path[len("s3://"):].split("/", 1)
+            _s3().delete_object(Bucket=bucket, Key=key)
+        else:
+            os.remove(path)
+    except Exception:  # o que sobrar no bucket expira pela regra de ciclo de vida
+        pass
+
+
+async def process_job(store, job: dict) -> None:
+    # Só a entrega que finaliza o job apaga o upload: se a lease venceu e outra
+    # entrega do mesmo job está rodando, ela ainda precisa do arquivo.
+    job_id, attempt = job["id"], job["attempts"]
+    try:
+        run = _run_file if job["kind"] == "file" else _run_text
+        result = await run(job["payload"])
+    except asyncio.CancelledError:
+        # Worker parando: o job volta para a fila na hora, sem esperar a lease
+        store.retry(job_id, attempt, 0, "worker parou antes de terminar o job")
+        raise
+    except LLMUnavailable as e:
+        if attempt < JOBS_MAX_ATTEMPTS:
+            store.retry(job_id, attempt, e.retry_after or JOBS_POLL_INTERVAL, str(e))
+            return
+        won = store.fail(job_id, attempt, 503, str(e))
+    except JobFailed as e:
+        won = store.fail(job_id, attempt, e.status, e.detail)
+    except Exception as e:
+        log.exception("job %s falhou", job_id)
+        won = store.fail(job_id, attempt, 500, str(e) or e.__class__.__name__)
+    else:
+        won = store.complete(job_id, attempt, result)
+    if won:
+        _discard_upload(job)
+    else:
+        log.warning("job %s: entrega %d descartada, o job foi reentregue (lease vencida)", job_id, attempt)
+
+
+async def run_worker(concurrency: int = JOBS_WORKERS, stop: Optional[asyncio.Event] = None,
+                     poll_interval: float = JOBS_POLL_INTERVAL, drain: bool = True) -> None:
+    """
+    Loop de consumo: até `concurrency` jobs em paralelo; termina quando `stop` é
+    setado. Com `drain`, espera os jobs em andamento; sem, cancela e devolve à fila.
+    """
+    global _wakeup
+    _wakeup = asyncio.Event()
+    store = get_job_store()
+    stop = stop or asyncio.Event()
+    slots = asyncio.Semaphore(max(1, concurrency))
+    running = set()
+
+    while not stop.is_set():
+        await slots.acquire()
+        job = store.claim()
+        if job is None:
+            slots.release()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+            continue
+        task = asyncio.ensure_future(process_job(store, job))
+        running.add(task)
+        task.add_done_callback(lambda t: (running.discard(t), slots.release()))
+
+    # Parada limpa: termina o que já começou (o resto fica na fila)
+    if running:
+        if not drain:
+            for task in running:
+                task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+
+def sqs_handler(event: dict, context=None) -> dict:
+    """
+    Entrada da Lambda worker (gatilho SQS, JOBS_BACKEND=dynamodb): cada mensagem é o
+    id de um job. A que não dá para pegar (job já finalizado, em backoff ou com outro
+    worker) é descartada; um retry enfileira mensagem nova.
+    """
+    store = get_job_store()
+
+    async def run():
+        jobs = [job for job in (store.claim_id(r["body"]) for r in event.get("Records", [])) if job is not None]
+        await asyncio.gather(*(process_job(store, job) for job in jobs))
+
+    asyncio.run(run())
+    return {"batchItemFailures": []}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Worker dos jobs de classificação")
+    ap.add_argument("--concurrency", type=int, default=JOBS_WORKERS)
+    ap.add_argument("--poll", type=float, default=JOBS_POLL_INTERVAL)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    async def serve():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, lambda: (stop.set(), notify_worker()))
+        log.info("worker: %s (concurrency=%d)", get_job_store().snapshot().get("backend"), args.concurrency)
+        await run_worker(args.concurrency, stop, args.poll)
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# bench/bench_batching.py
+"""
+Micro-lotes de classificação (app/batcher.py) contra chamadas individuais, no
+fake da OpenAI com custo de prefill e de decode:
+
+- throughput e p50/p95 por e-mail para lotes de até 1 (individual), 4, 8 e 16;
+- tokens por e-mail (entrada + saída) e chamadas à OpenAI;
+- concordância da categoria com a classificação individual;
+- uma rodada com respostas de lote truncadas (`--malformed`), que caem em
+  chamadas individuais só para os itens afetados.
+
+O fake classifica cada item pelo próprio texto, então a concordância aqui
+mede o encaixe dos resultados por id; com um modelo real, rode o
+bench/replay.py com CLASSIFY_BATCH_MAX > 1 para medir a do modelo.
+
+    cd backend && python -m bench.bench_batching --emails 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from bench.fake_openai import start_fake_server
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "labeled_seed.jsonl")
+
+
+def _pct(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[max(0, int(round(q * len(values))) - 1)]
+
+
+def _tokens() -> dict:
+    from app.openai_client import client_stats
+
+    calls = client_stats()["calls"]
+    out = {"calls": 0, "prompt": 0, "completion": 0}
+    for op in ("classify", "classify_batch"):
+        c = calls.get(op) or {}
+        out["calls"] += c.get("count", 0)
+        out["prompt"] += c.get("prompt_tokens", 0)
+        out["completion"] += c.get("completion_tokens", 0)
+    return out
+
+
+async def _run(emails: list, max_items: int, wait_ms: float, concurrency: int) -> dict:
+    from app.batcher import ClassifyBatcher
+    from app.openai_client import aclassify_only, batch_stats
+
+    batcher = ClassifyBatcher(max_items=max_items, wait_ms=wait_ms)
+    sem = asyncio.Semaphore(concurrency)
+    lat, cats = [], [None] * len(emails)
+
+    async def one(i, row):
+        async with sem:
+            t0 = time.perf_counter()
+            if max_items <= 1:
+                cats[i] = (await aclassify_only(row["body"], row["subject"], "pt"))[0]
+            else:
+                cats[i] = (await batcher.classify(row["body"], row["subject"], "pt"))[0]
+            lat.append((time.perf_counter() - t0) * 1000)
+
+    before, stats_before = _tokens(), batch_stats()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i, r) for i, r in enumerate(emails)))
+    elapsed = time.perf_counter() - t0
+    after, stats_after = _tokens(), batch_stats()
+    return {
+        "elapsed": elapsed, "lat": lat, "categories": cats,
+        **{k: after[k] - before[k] for k in after},
+        "fallback": stats_after["fallback_items"] - stats_before["fallback_items"],
+    }
+
+
+async def _main(args, server):
+    from app.openai_client import aclassify_only
+
+    with open(DATA, encoding="utf-8") as f:
+        rows = [json.loads(ln) for ln in f if ln.strip()]
+    emails = (rows * (args.emails // len(rows) + 1))[:args.emails]
+    await aclassify_only("aquecimento", "x", "pt")  # import do SDK, conexões
+
+    n = len(emails)
+    print(f"{n} e-mails, concorrência {args.concurrency}, espera {args.wait_ms} ms; fake {args.latency}s "
+          f"+ {args.latency_per_1k}s/1k tokens de entrada + {args.token_latency}s/token de saída")
+    print(f"{'lote':>20} {'e-mails/s':>10} {'p50(ms)':>8} {'p95(ms)':>8} {'chamadas':>9} "
+          f"{'tok entrada/e-mail':>19} {'tok saída/e-mail':>17} {'concordância':>13} {'fallback':>9}")
+    base = None
+    plan = [(size, 0.0) for size in args.sizes] + [(max(args.sizes), args.malformed)]
+    for size, malformed in plan:
+        server.RequestHandlerClass.malformed_rate = malformed
+        r = await _run(emails, size, args.wait_ms, args.concurrency)
+        if base is None:
+            base = r["categories"]
+        agree = sum(a == b for a, b in zip(base, r["categories"])) / n
+        label = f"{size}" + (f" ({malformed:.0%} truncadas)" if malformed else "")
+        print(f"{label:>20} {n / r['elapsed']:>10.1f} {statistics.median(r['lat']):>8.0f} {_pct(r['lat'], 0.95):>8.0f} "
+              f"{r['calls']:>9} {r['prompt'] / n:>19.0f} {r['completion'] / n:>17.1f} {agree:>13.1%} {r['fallback']:>9}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Classificação em micro-lotes x individual")
+    ap.add_argument("--emails", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--sizes", type=lambda v: [int(x) for x in v.split(",")], default=[1, 4, 8, 16])
+    ap.add_argument("--wait-ms", type=float, default=5.0)
+    ap.add_argument("--latency", type=float, default=0.2)
+    ap.add_argument("--latency-per-1k", type=float, default=0.2)
+    ap.add_argument("--token-latency", type=float, default=0.005)
+    ap.add_argument("--malformed", type=float, default=0.2, help="fração de respostas de lote truncadas na última rodada")
+    args = ap.parse_args()
+
+    server, base_url = start_fake_server(latency=args.latency, latency_per_1k_tokens=args.latency_per_1k,
+                                         token_latency=args.token_latency)
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("CACHE_BACKEND", "none")  # mede o caminho da OpenAI, não o cache
+    os.environ.setdefault("OPENAI_RPM", "0")        # o limitador local distorceria a latência
+    os.environ.setdefault("OPENAI_TPM", "0")
+    asyncio.run(_main(args, server))
+
+
+if __name__ == "__main__":
+    main()
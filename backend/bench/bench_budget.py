@@ -0,0 +1,169 @@
+# bench/bench_budget.py
+"""
+Orçamento de tokens (app/budget.py): latência e custo x acurácia.
+
+Cada e-mail rotulado de data/labeled_seed.jsonl ganha ruído realista —
+assinatura, aviso legal e histórico citado de outro e-mail — e passa pelo
+fluxo two_call com diferentes configurações de limpeza/teto. O fake cobra
+latência por token de prompt (--latency-per-1k) e classifica por palavras-chave,
+então histórico citado de spam contamina a classificação como num LLM real.
+
+    cd backend && python -m bench.bench_budget --latency 0.05 --latency-per-1k 0.4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+from bench.fake_openai import start_fake_server
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "labeled_seed.jsonl")
+
+SIGNATURE = "\n\nAtenciosamente,\nFulano de Tal\nGerente de Contas | FinanceCorp\nTel.: +55 11 4002-8922\n"
+DISCLAIMER = (
+    "\nEsta mensagem e seus anexos são confidenciais e destinados exclusivamente ao destinatário. "
+    "Se você a recebeu por engano, notifique o remetente e apague-a. "
+    "This message is confidential and intended only for the named recipient.\n"
+)
+
+# Limpeza que não pode apagar o pedido: (texto, trecho que tem que sobrar)
+REGRESSIONS = [
+    ("Bom dia, equipe de atendimento.\nObrigado!\nPreciso do boleto da fatura 4471 até sexta, contrato 998.\nMaria",
+     "Preciso do boleto"),
+    ("Hello support team.\nThanks,\nI need a copy of invoice 4471 by Friday, contract 998.\nMary",
+     "I need a copy"),
+    ("Segue o contrato revisado.\n\nEste documento é confidencial e destinado apenas ao destinatário; "
+     "a assinatura do contrato deve ocorrer até dia 10.", "assinatura do contrato"),
+    ("Please see below.\n\nThis report is confidential and meant for the recipient only. "
+     "We need your approval on the budget before Monday.", "approval on the budget"),
+    ("Preciso do boleto da fatura 4471." + SIGNATURE + DISCLAIMER, "Preciso do boleto"),
+]
+
+# (nome, strip, teto classificação, teto resposta)
+VARIANTS = [
+    ("sem orçamento", False, 0, 0),
+    ("só limpeza", True, 0, 0),
+    ("limpeza+400/1200", True, 400, 1200),
+    ("limpeza+48/192", True, 48, 192),
+    ("só teto 48/192", False, 48, 192),
+    ("limpeza+16/64", True, 16, 64),
+]
+
+
+def noisy_emails(rows: list, depth: int, seed: int = 3) -> list:
+    rnd = random.Random(seed)
+    out = []
+    for r in rows:
+        body = r["body"] + SIGNATURE + DISCLAIMER
+        for _ in range(depth):
+            q = rnd.choice(rows)
+            quoted = "\n".join("> " + ln for ln in (q["body"] + SIGNATURE + DISCLAIMER).splitlines())
+            body += f"\nEm ter., 4 de jun. de 2024 às 09:30, Cliente <cliente@exemplo.com> escreveu:\n{quoted}\n"
+        out.append({**r, "body": body})
+    return out
+
+
+def check_regressions() -> int:
+    """Casos em que `strip_noise` apagava o pedido junto com a assinatura/aviso legal."""
+    from app.budget import strip_noise
+
+    failed = 0
+    for text, keep in REGRESSIONS:
+        out = strip_noise(text)
+        if keep not in out:
+            failed += 1
+            print(f"  FALHOU: {keep!r} sumiu de {text[:60]!r}... -> {out!r}")
+    print(f"limpeza: {len(REGRESSIONS) - failed}/{len(REGRESSIONS)} casos de regressão preservam o pedido")
+    return failed
+
+
+def _usage(stats: dict):
+    calls = stats["calls"].values()
+    return sum(c["prompt_tokens"] for c in calls), sum(c["completion_tokens"] for c in calls)
+
+
+def _budget_cost_us(rows: list, strip: bool, cls_max: int, reply_max: int) -> float:
+    from app.budget import apply_budget
+
+    t0 = time.perf_counter()
+    for r in rows:
+        apply_budget(r["body"], strip, cls_max, reply_max)
+    return (time.perf_counter() - t0) / len(rows) * 1e6
+
+
+async def _run(rows: list, strip: bool, cls_max: int, reply_max: int, concurrency: int) -> dict:
+    from app.budget import apply_budget
+    from app.openai_client import aclassify_only, agenerate_reply, client_stats
+
+    p0, c0 = _usage(client_stats())
+    sem = asyncio.Semaphore(concurrency)
+    lat, correct = [], 0
+
+    async def one(r):
+        nonlocal correct
+        async with sem:
+            t0 = time.perf_counter()
+            cls_text, reply_text, _ = apply_budget(r["body"], strip, cls_max, reply_max)
+            cat, _ = await aclassify_only(cls_text, r.get("subject"), "pt")
+            if cat == "Produtivo":
+                await agenerate_reply(reply_text, r.get("subject"), "pt")
+            lat.append((time.perf_counter() - t0) * 1000)
+            correct += cat == r["category"]
+
+    await asyncio.gather(*(one(r) for r in rows))
+    p1, c1 = _usage(client_stats())
+    lat.sort()
+    return {
+        "accuracy": correct / len(rows),
+        "p50": statistics.median(lat),
+        "p95": lat[max(0, int(len(lat) * 0.95) - 1)],
+        "prompt": (p1 - p0) / len(rows),
+        "completion": (c1 - c0) / len(rows),
+        "budget_us": _budget_cost_us(rows, strip, cls_max, reply_max),
+    }
+
+
+async def _main(clean: list, rows: list, args):
+    await _run(rows[:2], False, 0, 0, 2)  # aquecimento (conexões)
+    print(f"{len(rows)} e-mails, histórico citado x{args.depth}; preço US$/1M: in {args.price_in} out {args.price_out}")
+    print(f"{'variante':>18} {'acurácia':>9} {'p50(ms)':>8} {'p95(ms)':>8} {'tok in/email':>13} "
+          f"{'US$/1k emails':>14} {'orçamento(µs)':>14}")
+    runs = [("original s/ ruído", clean, False, 0, 0)] + [(n, rows, *v) for n, *v in VARIANTS]
+    for name, data, strip, cls_max, reply_max in runs:
+        r = await _run(data, strip, cls_max, reply_max, args.concurrency)
+        cost = (r["prompt"] * args.price_in + r["completion"] * args.price_out) / 1e6 * 1000
+        print(f"{name:>18} {r['accuracy']:>9.3f} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['prompt']:>13.0f} "
+              f"{cost:>14.4f} {r['budget_us']:>14.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", default=DATA)
+    ap.add_argument("--depth", type=int, default=3, help="mensagens citadas por e-mail")
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--latency-per-1k", type=float, default=0.4)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--price-in", type=float, default=0.15, help="US$ por 1M tokens de entrada")
+    ap.add_argument("--price-out", type=float, default=0.60, help="US$ por 1M tokens de saída")
+    args = ap.parse_args()
+
+    with open(args.data, encoding="utf-8") as f:
+        clean = [json.loads(ln) for ln in f if ln.strip()]
+    rows = noisy_emails(clean, args.depth)
+
+    _, base_url = start_fake_server(latency=args.latency, latency_per_1k_tokens=args.latency_per_1k)
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("CACHE_BACKEND", "none")  # mede o caminho da OpenAI, não o cache
+    os.environ.setdefault("OPENAI_TPM", "0")        # o limitador local distorceria a latência
+    os.environ.setdefault("OPENAI_RPM", "0")
+    if check_regressions():  # depois do ambiente: importa app.config
+        raise SystemExit(1)
+    asyncio.run(_main(clean, rows, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# bench/bench_coldstart.py
+"""
+Cold start do handler Mangum (`handler.handler`) com eventos sintéticos do API Gateway v2.
+
+Cada rodada é um processo Python novo: mede import do handler, primeira
+invocação de GET /health e primeira de POST /classify (contra o fake OpenAI).
+Também mostra o custo de import por pacote (`python -X importtime`).
+
+    cd backend && python -m bench.bench_coldstart --runs 5
+    python -m bench.bench_coldstart --log cloudwatch.txt   # log com PYTHONPROFILEIMPORTTIME=1
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from bench.fake_openai import start_fake_server
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def apigw_event(method: str, path: str, body: dict = None) -> dict:
+    """Evento HTTP API (payload 2.0) mínimo aceito pelo Mangum."""
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": "",
+        "headers": {"content-type": "application/json", "host": "bench.local"},
+        "requestContext": {
+            "http": {"method": method, "path": path, "protocol": "HTTP/1.1",
+                     "sourceIp": "127.0.0.1", "userAgent": "bench"},
+            "routeKey": "$default",
+            "stage": "$default",
+        },
+        "body": json.dumps(body) if body is not None else None,
+        "isBase64Encoded": False,
+    }
+
+
+CHILD = """
+import json, time
+t0 = time.perf_counter()
+import handler
+t1 = time.perf_counter()
+r1 = handler.handler(json.loads(%(health)r), None)
+t2 = time.perf_counter()
+r2 = handler.handler(json.loads(%(classify)r), None)
+t3 = time.perf_counter()
+assert r1["statusCode"] == 200 and r2["statusCode"] == 200, (r1, r2)
+print(json.dumps({"import": t1 - t0, "health": t2 - t1, "classify": t3 - t2}))
+"""
+
+
+def summarize_importtime(lines, top: int = 12):
+    """Soma o tempo próprio (self) por pacote de topo a partir da saída do -X importtime."""
+    per_pkg = defaultdict(int)
+    for ln in lines:
+        m = IMPORTTIME_RE.search(ln)
+        if m:
+            per_pkg[m.group(4).split(".")[0]] += int(m.group(1))
+    total = sum(per_pkg.values()) or 1
+    print(f"{'pacote':<22} {'ms':>8} {'%':>6}")
+    for pkg, us in sorted(per_pkg.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"{pkg:<22} {us / 1000:>8.1f} {us / total:>6.1%}")
+    print(f"{'total':<22} {total / 1000:>8.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--log", help="arquivo de log com saída do PYTHONPROFILEIMPORTTIME=1")
+    args = ap.parse_args()
+
+    if args.log:
+        with open(args.log, encoding="utf-8", errors="ignore") as f:
+            summarize_importtime(f)
+        return
+
+    _, base_url = start_fake_server(latency=args.latency)
+    env = {**os.environ, "OPENAI_API_KEY": "fake", "OPENAI_BASE_URL": base_url,
+           "CACHE_BACKEND": "none", "AWS_LAMBDA_FUNCTION_NAME": "bench"}
+    code = CHILD % {
+        "health": json.dumps(apigw_event("GET", "/health")),
+        "classify": json.dumps(apigw_event("POST", "/classify", {"subject": "Fatura", "body": "Qual o prazo da fatura 1234?"})),
+    }
+
+    runs = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                             capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"cold start ({args.runs} processos, mediana em ms; fake OpenAI {args.latency}s)")
+    for key in ("import", "health", "classify"):
+        print(f"  {key:<9} {statistics.median(r[key] for r in runs) * 1000:>8.1f}")
+
+    print("\ncusto de import por pacote (import handler):")
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import handler"], cwd=BACKEND_DIR,
+                         env=env, capture_output=True, text=True, check=True)
+    summarize_importtime(out.stderr.splitlines())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# bench/bench_combined.py
+"""
+Compara LLM_MODE=two_call x combined: latência ponta a ponta e tokens de entrada.
+
+    cd backend && python -m bench.bench_combined --latency 0.3 --emails 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from bench.fake_openai import start_fake_server
+
+EMAILS = [
+    ("Fatura 1234", "Olá, poderiam confirmar o vencimento da fatura 1234 em anexo? Preciso pagar até sexta."),
+    ("Acesso bloqueado", "Meu acesso ao internet banking foi bloqueado após troca de senha. Conta 5678-9."),
+    ("Reunião de onboarding", "Podemos agendar a reunião de onboarding/KYC na próxima terça às 10h?"),
+    ("Invoice overdue", "Hi, invoice 9981 is still pending. Could you confirm the payment deadline?"),
+    ("RE: Contrato 778", "Segue o histórico da tratativa do contrato 778 para análise. " * 40),
+]
+
+
+def _prompt_tokens(stats: dict) -> int:
+    return sum(c["prompt_tokens"] for c in stats["calls"].values())
+
+
+async def _run(mode: str, n: int) -> dict:
+    from app.openai_client import client_stats
+    from app.triage import triage
+
+    before = _prompt_tokens(client_stats())
+    lat = []
+    for i in range(n):
+        subject, body = EMAILS[i % len(EMAILS)]
+        t0 = time.perf_counter()
+        await triage(body, subject, "pt", mode=mode)
+        lat.append((time.perf_counter() - t0) * 1000)
+    tokens = _prompt_tokens(client_stats()) - before
+    return {"p50": statistics.median(lat), "mean": statistics.fmean(lat), "tokens": tokens / n}
+
+
+async def _main(n: int):
+    await _run("two_call", 2)  # aquecimento (conexões)
+    print(f"{'modo':>9} {'p50(ms)':>8} {'média(ms)':>10} {'tokens entrada/email':>21}")
+    for mode in ("two_call", "combined"):
+        r = await _run(mode, n)
+        print(f"{mode:>9} {r['p50']:>8.1f} {r['mean']:>10.1f} {r['tokens']:>21.0f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=0.3)
+    ap.add_argument("--emails", type=int, default=20)
+    args = ap.parse_args()
+
+    _, base_url = start_fake_server(latency=args.latency)
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("CACHE_BACKEND", "none")  # mede o caminho da OpenAI, não o cache
+    asyncio.run(_main(args.emails))
+
+
+if __name__ == "__main__":
+    main()
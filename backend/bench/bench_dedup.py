@@ -0,0 +1,183 @@
+# bench/bench_dedup.py
+"""
+Índice de quase duplicados (app/dedup.py) num tráfego com campanhas: cada
+campanha chega em muitas cópias com nome, e-mail e IDs de rastreio diferentes,
+misturadas aos e-mails avulsos de data/labeled_seed.jsonl.
+
+1. índice sozinho: cópias que casaram com o cluster certo, casamentos errados
+   (fonte diferente), µs por consulta e memória por cluster;
+2. ponta a ponta: `triage` (two_call) contra o fake da OpenAI com DEDUP_ENABLED
+   false x true — chamadas de classificação, tempo total e concordância da
+   categoria reaproveitada com a que o LLM daria para a própria cópia.
+
+    cd backend && python -m bench.bench_dedup --copies 40 --latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from bench.fake_openai import start_fake_server
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "labeled_seed.jsonl")
+
+CAMPAIGNS = [
+    ("Black Friday antecipada", "Improdutivo",
+     "Olá {name}, a Black Friday chegou mais cedo para clientes selecionados. Até 70% de desconto em "
+     "eletrônicos, casa e moda, com frete grátis nas compras acima de cem reais. As ofertas são válidas "
+     "somente neste fim de semana e enquanto durarem os estoques. Use o cupom exclusivo no carrinho e "
+     "aproveite. Código da campanha {code}. Enviado para {email}. Para cancelar o recebimento, clique aqui."),
+    ("Your monthly newsletter", "Improdutivo",
+     "Hi {name}, here is your monthly roundup: industry trends, product updates and tips to get more done "
+     "with less effort. This month we look at remote collaboration tools, a case study from a retail "
+     "customer and a short guide to our new reporting dashboard. Tracking {code}. You received this "
+     "email at {email} because you subscribed to our newsletter. Unsubscribe anytime."),
+    ("Aviso de manutenção programada", "Improdutivo",
+     "Prezado(a) {name}, informamos que o internet banking passará por manutenção programada no domingo, "
+     "das duas às seis da manhã. Durante esse período transferências, pagamentos e consultas de saldo "
+     "ficarão indisponíveis. Os cartões continuam funcionando normalmente. Protocolo {code}. Esta é uma "
+     "mensagem automática enviada para {email}, não responda."),
+    ("Webinar invitation", "Improdutivo",
+     "Dear {name}, you are invited to our free webinar on cloud cost optimization next Thursday at 3 pm. "
+     "Our engineers will share practical techniques, live demos and a checklist you can apply right away. "
+     "Seats are limited, so register today using the link below. Registration code {code}. "
+     "This invitation was sent to {email}."),
+    ("Atualização cadastral obrigatória", "Produtivo",
+     "Olá {name}, para continuar usando sua conta é necessário atualizar seus dados cadastrais até o fim "
+     "do mês, conforme as novas regras do Banco Central. Envie um documento com foto e um comprovante de "
+     "residência pelo aplicativo, na área de perfil. Solicitação {code}. Mensagem enviada para {email}."),
+]
+NAMES = ["Maria", "João", "Ana", "Carlos", "Fernanda", "Lucas", "Patricia", "Rafael", "Beatriz", "Diego",
+         "Emily", "James", "Olivia", "Noah", "Sofia", "Liam"]
+
+
+def _copy(template: str, rnd: random.Random) -> str:
+    name = rnd.choice(NAMES)
+    return template.format(name=name, code=f"{rnd.getrandbits(40):010x}",
+                           email=f"{name.lower()}.{rnd.randint(1, 999)}@example.com")
+
+
+def build_stream(copies: int, seed: int = 11) -> list:
+    """[(fonte, rótulo, assunto, corpo)]; fonte = "c<i>" para campanhas, "s<i>" para e-mails avulsos."""
+    rnd = random.Random(seed)
+    with open(DATA, encoding="utf-8") as f:
+        rows = [json.loads(ln) for ln in f if ln.strip()]
+    stream = [(f"s{i}", r["category"], r["subject"], r["body"]) for i, r in enumerate(rows)]
+    for i, (subject, label, template) in enumerate(CAMPAIGNS):
+        stream += [(f"c{i}", label, subject, _copy(template, rnd)) for _ in range(copies)]
+    rnd.shuffle(stream)
+    return stream
+
+
+def _index_only(stream: list) -> None:
+    from app.dedup import MIN_SHINGLES, NearDupIndex, shingles, signature
+
+    index = NearDupIndex(window=3600, max_clusters=10_000)
+    origin = {}
+    matched = other = conflict = short = 0
+    copies = sum(src.startswith("c") for src, *_ in stream)
+    t0 = time.perf_counter()
+    for src, label, subject, body in stream:
+        hashes = shingles(subject, body)
+        if len(hashes) < MIN_SHINGLES:
+            short += 1
+            continue
+        sig = signature(hashes)
+        cluster, _ = index.match(sig)
+        if cluster is None:
+            origin[index.add(sig).id] = (src, label)
+        elif origin[cluster.id][0] == src:
+            matched += 1
+        else:
+            # e-mails avulsos repetidos no seed (ou iguais a menos de números) também casam
+            other += 1
+            conflict += origin[cluster.id][1] != label
+    us = (time.perf_counter() - t0) / len(stream) * 1e6
+    # cópias menos o primeiro de cada campanha, que vira representante
+    expected = copies - len(CAMPAIGNS)
+    print(f"índice: {len(stream)} e-mails ({copies} cópias de {len(CAMPAIGNS)} campanhas), {len(index)} clusters")
+    print(f"  cópias casadas com a própria campanha {matched}/{expected}  casamentos entre fontes diferentes "
+          f"{other} (com rótulo diferente: {conflict})  curtos demais {short}  {us:.0f} µs/e-mail")
+
+    rnd = random.Random(3)
+    tracemalloc.start()
+    big = NearDupIndex(window=3600, max_clusters=10**9)
+    for _ in range(5000):
+        big.add(signature({rnd.getrandbits(32) for _ in range(60)}))
+    print(f"  memória: {tracemalloc.get_traced_memory()[0] / 5000:,.0f} bytes por cluster")
+    tracemalloc.stop()
+
+
+async def _triage_all(stream: list, concurrency: int) -> dict:
+    from app.dedup import dedup_stats
+    from app.openai_client import client_stats
+    from app.triage import triage
+
+    await triage("aquecimento: import do SDK e conexões do pool", "x", "pt")
+    before = client_stats()["calls"].get("classify", {}).get("count", 0)
+    sem = asyncio.Semaphore(concurrency)
+    results = {}
+
+    async def one(i, subject, body):
+        async with sem:
+            results[i] = (await triage(body, subject, "pt"))[0]
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i, s, b) for i, (_, _, s, b) in enumerate(stream)))
+    elapsed = time.perf_counter() - t0
+    calls = client_stats()["calls"].get("classify", {}).get("count", 0) - before
+    return {"elapsed": elapsed, "classify_calls": calls, "categories": [results[i] for i in range(len(stream))],
+            "dedup": dedup_stats()}
+
+
+def _child(args) -> None:
+    """Roda num processo próprio: DEDUP_ENABLED é lido no import da config."""
+    _, base_url = start_fake_server(latency=args.latency)
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    out = asyncio.run(_triage_all(build_stream(args.copies), args.concurrency))
+    print(json.dumps(out))
+
+
+def _end_to_end(args) -> None:
+    runs = {}
+    for flag in ("false", "true"):
+        env = dict(os.environ, DEDUP_ENABLED=flag, CACHE_BACKEND="none", OPENAI_RPM="0", OPENAI_TPM="0")
+        cmd = [sys.executable, "-m", "bench.bench_dedup", "--child", "--copies", str(args.copies),
+               "--latency", str(args.latency), "--concurrency", str(args.concurrency)]
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True)
+        runs[flag] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    off, on = runs["false"], runs["true"]
+    agree = sum(a == b for a, b in zip(off["categories"], on["categories"])) / len(off["categories"])
+    d = on["dedup"]
+    print(f"\nponta a ponta (two_call, fake {args.latency}s, concorrência {args.concurrency}):")
+    print(f"{'DEDUP':>6} {'classify':>9} {'tempo(s)':>9}")
+    print(f"{'off':>6} {off['classify_calls']:>9} {off['elapsed']:>9.2f}")
+    print(f"{'on':>6} {on['classify_calls']:>9} {on['elapsed']:>9.2f}")
+    print(f"  chamadas evitadas {d['llm_calls_avoided']} ({d['avoided_rate']:.1%} das consultas), "
+          f"{d['waited_inflight']} esperaram o representante em andamento")
+    print(f"  categoria igual à do LLM por e-mail: {agree:.1%}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Quase duplicados: cobertura, custo e chamadas evitadas")
+    ap.add_argument("--copies", type=int, default=40, help="cópias por campanha")
+    ap.add_argument("--latency", type=float, default=0.2)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+    _index_only(build_stream(args.copies))
+    _end_to_end(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# bench/bench_history.py
+"""
+Histórico de triagens no servidor (app/history.py), backends memory e sqlite:
+
+1. ingestão: µs por `record` no caminho da requisição (p50/p99, com a thread
+   escritora gravando ao mesmo tempo), linhas/s até tudo estar gravado e, no
+   SQLite, bytes por linha do log;
+2. consulta: latência do `/stats` (contadores por bucket) para janelas de 24 h,
+   7 d e 90 d conforme o log cresce, contra a mesma agregação varrendo o log.
+
+Os instantes são sorteados nos últimos `--days` dias.
+
+    cd backend && python -m bench.bench_history --rows 10000,100000,1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.history import MemoryHistory, SQLiteHistory
+
+CHUNK = 50_000  # registros enfileirados antes de esperar a escritora (limita a memória da fila)
+WINDOWS = (("24h", 86400, 3600), ("7d", 7 * 86400, 3600), ("90d", 90 * 86400, 86400))
+
+
+def _pct(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[max(0, int(round(q * len(values))) - 1)]
+
+
+def _ingest(store, n: int, now: float, days: int, rnd: random.Random) -> dict:
+    lat = []
+    t0 = time.perf_counter()
+    done = 0
+    while done < n:
+        for _ in range(min(CHUNK, n - done)):
+            ts = now - rnd.random() * days * 86400
+            category = "Produtivo" if rnd.random() < 0.6 else "Improdutivo"
+            lang = "pt" if rnd.random() < 0.8 else "en"
+            confidence = 0.5 + rnd.random() / 2
+            t = time.perf_counter()
+            store.record(category, lang, confidence, ts=ts)
+            lat.append(time.perf_counter() - t)
+        done += min(CHUNK, n - done)
+        store.flush()
+    elapsed = time.perf_counter() - t0
+    return {"us_p50": _pct(lat, 0.5) * 1e6, "us_p99": _pct(lat, 0.99) * 1e6, "rows_s": n / elapsed}
+
+
+def _timed(fn, reps: int) -> float:
+    """Mediana em ms."""
+    out = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(out)
+
+
+def _scan(store, since: float, until: float) -> list:
+    """Mesma agregação do /stats direto no log (o que o /stats evita)."""
+    with store._lock:
+        return store._db.execute(
+            "SELECT ts - ts % ?, category, language, COUNT(*), SUM(confidence) FROM history"
+            " WHERE ts >= ? AND ts < ? GROUP BY 1, 2, 3",
+            (store.bucket, int(since), int(until)),
+        ).fetchall()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Histórico no servidor: ingestão e consulta do /stats")
+    ap.add_argument("--rows", type=lambda v: [int(x) for x in v.split(",")], default=[10_000, 100_000, 1_000_000],
+                    help="tamanhos acumulados do log em que a consulta é medida")
+    ap.add_argument("--days", type=int, default=90)
+    ap.add_argument("--reps", type=int, default=20)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-history-")
+    path = os.path.join(tmp, "history.sqlite3")
+    stores = {"memory": MemoryHistory(queue_max=CHUNK), "sqlite": SQLiteHistory(path=path, queue_max=CHUNK)}
+    rnd = random.Random(7)
+    now = time.time()
+
+    print(f"instantes nos últimos {args.days} dias; bucket {stores['memory'].bucket} s; consulta = mediana de "
+          f"{args.reps} (ms)")
+    head = "  ".join(f"{'stats ' + name:>11}" for name, _, _ in WINDOWS)
+    scan = "  ".join(f"{'log ' + name:>10}" for name, _, _ in WINDOWS)
+    print(f"{'backend':>8} {'linhas':>9} {'record p50/p99 µs':>18} {'linhas/s':>9} {'B/linha':>8}  {head}  {scan}")
+    total = 0
+    for target in args.rows:
+        n = target - total
+        total = target
+        for name, store in stores.items():
+            ing = _ingest(store, n, now, args.days, rnd)
+            q = "  ".join(f"{_timed(lambda: store.query(now - span, now, step), args.reps):>11.2f}"
+                          for _, span, step in WINDOWS)
+            size, s = "", ""
+            if name == "sqlite":
+                store._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                size = f"{os.path.getsize(path) / total:.0f}"
+                s = "  ".join(f"{_timed(lambda: _scan(store, now - span, now), max(3, args.reps // 5)):>10.1f}"
+                              for _, span, _ in WINDOWS)
+            print(f"{name:>8} {total:>9,} {ing['us_p50']:>8.1f} / {ing['us_p99']:>7.1f} {ing['rows_s']:>9,.0f} "
+                  f"{size:>8}  {q}  {s}")
+
+    # a agregação pelos contadores e pelo log tem que bater
+    sqlite = stores["sqlite"]
+    by_counters = sqlite.query(now - 7 * 86400, now)["by_category"]
+    by_log = {}
+    for _, category, _, count, _ in _scan(sqlite, now - 7 * 86400 - (now - 7 * 86400) % sqlite.bucket, now):
+        key = "Produtivo" if category == 1 else "Improdutivo"
+        by_log[key] = by_log.get(key, 0) + count
+    print(f"\n7d pelos contadores {by_counters} / pelo log {by_log}")
+    for name, store in stores.items():
+        store.close()
+        print(f"{name}: {store.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# bench/bench_langid.py
+"""
+Identificador de idioma (app/langid.py) x heurística anterior de substrings
+em `decide_language`:
+
+1. acurácia em data/langid_eval.jsonl — idioma exato e idioma de resposta
+   (pt/en, após `REPLY_LANG`), mais a parcela que cai no default pt;
+2. acurácia por tamanho do texto (prefixos de 15 a 240 caracteres);
+3. µs por chamada para textos de 100 a 100k caracteres (a heurística varre o
+   texto inteiro; o detector só a amostra de LANGID_SAMPLE_CHARS).
+
+    cd backend && python -m bench.bench_langid --n 2000
+"""
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+
+from app.config import LANGID_MIN_CONFIDENCE
+from app.langid import REPLY_LANG, get_langid
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "langid_eval.jsonl")
+
+
+def legacy_decide(text: str) -> str:
+    """Heurística de vocabulário usada em decide_language até aqui."""
+    t = (text or "").lower()
+    pt_hits = any(w in t for w in ["obrigado", "por favor", "fatura", "reunião", "prazo", "anexo", "protocolo"])
+    en_hits = any(w in t for w in ["thanks", "please", "invoice", "meeting", "deadline", "attached", "ticket"])
+    if pt_hits and not en_hits:
+        return "pt"
+    if en_hits and not pt_hits:
+        return "en"
+    return "pt"
+
+
+def langid_decide(model, text: str):
+    lang, conf = model.detect(text)
+    if lang is None or conf < LANGID_MIN_CONFIDENCE:
+        return None, "pt"
+    return lang, REPLY_LANG[lang]
+
+
+def _accuracy(model, rows: list) -> None:
+    legacy_ok = new_ok = exact = fallback = 0
+    for r in rows:
+        expected = REPLY_LANG[r["lang"]]
+        legacy_ok += legacy_decide(r["text"]) == expected
+        lang, reply = langid_decide(model, r["text"])
+        new_ok += reply == expected
+        exact += lang == r["lang"]
+        fallback += lang is None
+    n = len(rows)
+    print(f"{n} textos ({', '.join(sorted({r['lang'] for r in rows}))})")
+    print(f"  heurística  idioma de resposta {legacy_ok / n:6.1%}")
+    print(f"  langid      idioma de resposta {new_ok / n:6.1%}  idioma exato {exact / n:6.1%}"
+          f"  default pt (confiança < {LANGID_MIN_CONFIDENCE}) {fallback / n:5.1%}")
+
+
+def _by_length(model, rows: list, lengths) -> None:
+    by_lang = defaultdict(list)
+    for r in rows:
+        by_lang[r["lang"]].append(r["text"])
+    print("\nacurácia por tamanho (prefixo de e-mails do mesmo idioma; exato / resposta / heurística)")
+    for size in lengths:
+        exact = reply = legacy = total = 0
+        for lang, texts in by_lang.items():
+            # cada texto vira começo de um "e-mail" com os seguintes, cortado em `size`
+            for i in range(len(texts)):
+                blob = " ".join(texts[i:] + texts[:i])[:size]
+                found, r = langid_decide(model, blob)
+                exact += found == lang
+                reply += r == REPLY_LANG[lang]
+                legacy += legacy_decide(blob) == REPLY_LANG[lang]
+                total += 1
+        print(f"  {size:>4} chars  {exact / total:6.1%} / {reply / total:6.1%} / {legacy / total:6.1%}")
+
+
+def _per_call_us(fn, text: str, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn(text)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def _speed(model, rows: list, n: int) -> None:
+    base = " ".join(r["text"] for r in rows if r["lang"] == "pt")
+    print("\nµs por chamada            heurística     langid")
+    for size in (100, 1_000, 10_000, 100_000):
+        text = (base * (size // len(base) + 1))[:size]
+        reps = max(20, n if size <= 1_000 else n // 10)
+        old = _per_call_us(legacy_decide, text, reps)
+        new = _per_call_us(model.detect, text, reps)
+        print(f"  {size:>7} chars        {old:10.1f} {new:10.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Identificação de idioma: acurácia e custo")
+    ap.add_argument("data", nargs="?", default=DATA)
+    ap.add_argument("--n", type=int, default=2000)
+    args = ap.parse_args()
+
+    model = get_langid()
+    if model is None:
+        raise SystemExit("perfis ausentes: python -m app.langid build data/langid")
+    with open(args.data, encoding="utf-8") as f:
+        rows = [json.loads(ln) for ln in f if ln.strip()]
+
+    _accuracy(model, rows)
+    _by_length(model, rows, (15, 30, 60, 120, 240))
+    _speed(model, rows, args.n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# bench/bench_nlp.py
+"""
+Micro-benchmark de `app.nlp.preprocess` (versão antiga x atual) em textos de ~12k chars.
+Também confere que as duas versões (e `iter_preprocess`) produzem os mesmos tokens.
+
+    cd backend && python -m bench.bench_nlp --chars 12000 --repeat 200
+"""
+import argparse
+import random
+import re
+import timeit
+import unicodedata
+
+from app.nlp import STOP_PT, STOP_EN, preprocess, iter_preprocess
+
+SAMPLE = (
+    "Olá, equipe! Não recebi o boleto da fatura nº 2024-118 referente à reunião de ontem. "
+    "Poderiam reenviar até sexta-feira? Também preciso do relatório de conciliação (anexo). "
+    "Hi team, please find attached the invoice #4471; the deadline is 10/12. Thanks!! "
+    "Atenção: ação de cobrança — verificação pendente, protocolo ABC_123x, você já viu? "
+)
+
+
+# Outras escritas, com marcas combinantes fora dos blocos latinos (árabe, hebraico,
+# devanágari, tailandês), mais grego, cirílico, vietnamita e emoji com seletor de variação
+SCRIPTS = [
+    "كَتَبَ الولد الرسالة إلى المدير",
+    "שָׁלוֹם עֲלֵיכֶם, תּוֹדָה רַבָּה",
+    "नमस्ते, कृपया चालान भेजें",
+    "สวัสดีครับ ขอบคุณมาก",
+    "Καλημέρα, παρακαλώ στείλτε το τιμολόγιο",
+    "Здравствуйте, пришлите счёт, пожалуйста",
+    "Xin chào, vui lòng gửi hóa đơn",
+    "Obrigado ❤️ pelo retorno a\ufe0fb ﬁnal",
+]
+
+
+def legacy_preprocess(text: str, lang: str = "pt-BR"):
+    """Implementação anterior, mantida só para comparação."""
+    if not text:
+        return []
+    text = ''.join(ch for ch in unicodedata.normalize('NFD', text.lower()) if unicodedata.category(ch) != 'Mn')
+    text = re.compile(r"[^\w\s]", re.UNICODE).sub(" ", text)
+    text = re.sub(r"\d+", " ", text)
+    text = re.compile(r"\s+").sub(" ", text).strip()
+    tokens = text.split(" ")
+    stop = STOP_PT | STOP_EN
+    return [t for t in tokens if t and t not in stop and len(t) > 2]
+
+
+def _fuzz(n: int, seed: int = 3):
+    rnd = random.Random(seed)
+    alphabet = "aeiouçãõéêíóúàü_-.,;:!?'\"()/\\ 0123456789\n\tÀÉÑßÆœ€²½éñكتَبשׁनमस्ไม่Ωж\ufe0f\u20dd\u1abe"
+    return ["".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 200))) for _ in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chars", type=int, default=12000)
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    text = (SAMPLE * (args.chars // len(SAMPLE) + 1))[: args.chars]
+    ascii_text = "".join(
+        ch for ch in unicodedata.normalize("NFD", text) if unicodedata.category(ch) != "Mn"
+    ).encode("ascii", "ignore").decode()
+
+    for case in [text, ascii_text, *SCRIPTS, *_fuzz(2000)]:
+        expected = legacy_preprocess(case)
+        assert preprocess(case) == expected, case
+        pieces = [case[i:i + 37] for i in range(0, len(case), 37)]
+        assert list(iter_preprocess(pieces)) == expected, case
+    print(f"equivalência: ok (texto base + {len(SCRIPTS)} escritas + 2000 casos aleatórios)")
+
+    print(f"{args.chars} chars, {args.repeat} repetições")
+    for label, sample in (("acentuado", text), ("ascii", ascii_text)):
+        old = timeit.timeit(lambda: legacy_preprocess(sample), number=args.repeat) / args.repeat
+        new = timeit.timeit(lambda: preprocess(sample), number=args.repeat) / args.repeat
+        chunks = [sample[i:i + 2000] for i in range(0, len(sample), 2000)]
+        stream = timeit.timeit(lambda: sum(1 for _ in iter_preprocess(chunks)), number=args.repeat) / args.repeat
+        print(f"[{label}]")
+        print(f"  antigo:           {old * 1e6:9.1f} µs")
+        print(f"  preprocess:       {new * 1e6:9.1f} µs  ({old / new:.1f}x)")
+        print(f"  iter_preprocess:  {stream * 1e6:9.1f} µs  ({old / stream:.1f}x, pedaços de 2000)")
+
+
+if __name__ == "__main__":
+    main()
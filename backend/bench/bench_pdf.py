@@ -0,0 +1,90 @@
+# bench/bench_pdf.py
+"""
+Benchmark da extração de PDF sobre um corpus sintético de documentos multipágina.
+
+Compara a extração antiga (todas as páginas até PDF_MAX_PAGES, truncando no fim)
+com `extract_text_from_blob`, que para no orçamento de caracteres/tempo.
+
+    cd backend && python -m bench.bench_pdf --pages 5,30,100
+"""
+import argparse
+import io
+import statistics
+import time
+
+from pypdf import PdfReader
+
+LINE = "Prezados, segue o relatorio de conciliacao da fatura {n} referente ao contrato {p}."
+
+
+def make_pdf(pages: int, lines_per_page: int = 40) -> bytes:
+    """PDF mínimo (Helvetica, texto simples) com `pages` páginas."""
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for p in range(pages):
+        ops = ["BT /F1 10 Tf 40 800 Td 12 TL"]
+        for n in range(lines_per_page):
+            ops.append(f"({LINE.format(n=n, p=p)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objs.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objs)
+        objs.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objs))
+    objs[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objs, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (i, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1))
+    for off in offsets:
+        out.write(b"%010d 00000 n \n" % off)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref))
+    return out.getvalue()
+
+
+def _extract_full(blob: bytes, max_pages: int, max_chars: int) -> str:
+    reader = PdfReader(io.BytesIO(blob))
+    parts = [reader.pages[i].extract_text() or "" for i in range(min(len(reader.pages), max_pages))]
+    return "\n\n".join(parts).strip()[:max_chars]
+
+
+def _time(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", default="5,30,100")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    from app.config import PDF_MAX_PAGES, TEXT_MAX_CHARS
+    from app.pdf import extract_text_from_blob
+
+    print(f"PDF_MAX_PAGES={PDF_MAX_PAGES} TEXT_MAX_CHARS={TEXT_MAX_CHARS}")
+    print(f"{'páginas':>8} {'KB':>6} {'antigo(ms)':>11} {'novo(ms)':>9} {'págs lidas':>11} {'págs/s':>8} {'MB/s':>6}")
+    for pages in (int(x) for x in args.pages.split(",")):
+        blob = make_pdf(pages)
+        old = _time(lambda: _extract_full(blob, PDF_MAX_PAGES, TEXT_MAX_CHARS), args.repeat)
+        new = _time(lambda: extract_text_from_blob(blob, "doc.pdf"), args.repeat)
+        _, meta = extract_text_from_blob(blob, "doc.pdf")
+        print(f"{pages:>8} {len(blob) / 1024:>6.0f} {old * 1000:>11.1f} {new * 1000:>9.1f} "
+              f"{meta['pages_processed']:>11} {meta['pages_per_sec']:>8.0f} {meta['bytes_per_sec'] / 1e6:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# bench/bench_prompts.py
+"""
+Registro de prompts (app/prompts.py):
+
+1. custo de montar as mensagens: f-string a cada chamada x registro pré-montado;
+2. prefixo estático de cada prompt atual e se ele alcança o mínimo do prompt
+   caching do provedor (1024 tokens);
+3. tokens de entrada em cache e latência por versão, no fake (que imita o
+   caching da OpenAI): os prompts atuais e uma variante longa com exemplos
+   few-shot, com a parte estática primeiro x variável primeiro.
+
+    cd backend && python -m bench.bench_prompts --emails 40 --latency-per-1k 0.4
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from bench.fake_openai import start_fake_server
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "labeled_seed.jsonl")
+
+
+def _legacy_reply_messages(body: str, subject: str, lang: str) -> list:
+    """Montagem anterior ao registro: system por f-string e assunto antes das instruções."""
+    from app.prompts import LANG_MAP, gen_system_for
+
+    cfg = LANG_MAP[lang]
+    user = (
+        f"IDIOMA DA RESPOSTA: {cfg['name']} ({cfg['short']}). Responda somente neste idioma.\n\n"
+        f"Assunto original (apenas contexto, NÃO inclua na resposta): {subject or '(sem)'}\n"
+        f"Conteúdo do email recebido:\n{body}\n\n"
+        "Gere o corpo do e-mail (saudação, 1–3 frases objetivas e assinatura), "
+        "SEM linha de assunto. Retorne somente JSON no formato especificado."
+    )
+    return [{"role": "system", "content": gen_system_for(lang)}, {"role": "user", "content": user}]
+
+
+def _build_cost(rows: list, n: int):
+    from app.prompts import get_prompt
+
+    def run(fn):
+        t0 = time.perf_counter()
+        for i in range(n):
+            r = rows[i % len(rows)]
+            fn(r["body"], r["subject"], "pt")
+        return (time.perf_counter() - t0) / n * 1e6
+
+    legacy = run(_legacy_reply_messages)
+    registry = run(lambda b, s, lang: get_prompt("reply", lang).messages(b, s))
+    print(f"montagem das mensagens (reply): f-string {legacy:.2f} µs  registro {registry:.2f} µs")
+
+
+def _few_shot(rows: list, k: int) -> str:
+    lines = ["", "Exemplos rotulados:"]
+    for r in rows[:k]:
+        lines.append(json.dumps({"assunto": r["subject"], "conteudo": r["body"], "category": r["category"]},
+                                ensure_ascii=False))
+    return "\n".join(lines)
+
+
+def _variants(rows: list, shots: int) -> list:
+    """(nome, Prompt, variável primeiro?)"""
+    from app.prompts import CLS_SYSTEM, Prompt, get_prompt
+    from app.prompts import _CLS_PREAMBLE, _CLS_TAIL
+
+    long_cls = Prompt("classify", "pt", CLS_SYSTEM + _few_shot(rows[-shots:], shots), _CLS_PREAMBLE, _CLS_TAIL)
+    return [
+        ("classify atual", get_prompt("classify", "pt"), False),
+        ("reply atual", get_prompt("reply", "pt"), False),
+        ("combined atual", get_prompt("combined", "pt"), False),
+        (f"classify +{shots} exemplos, estático 1º", long_cls, False),
+        (f"classify +{shots} exemplos, variável 1º", long_cls, True),
+    ]
+
+
+def _messages(prompt, body: str, subject: str, variable_first: bool) -> list:
+    msgs = prompt.messages(body, subject)
+    if variable_first:
+        # e-mail antes das instruções (e dos exemplos): nenhum prefixo comum entre chamadas
+        variable = prompt.tail.format(subject=subject or "(sem)", body=body)
+        msgs = [{"role": "user", "content": variable},
+                {"role": "system", "content": prompt.system},
+                {"role": "user", "content": prompt.preamble}]
+    return msgs
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--emails", type=int, default=40)
+    ap.add_argument("--shots", type=int, default=30, help="exemplos few-shot na variante longa")
+    ap.add_argument("--latency", type=float, default=0.02)
+    ap.add_argument("--latency-per-1k", type=float, default=0.4, help="prefill por 1k tokens fora do cache")
+    ap.add_argument("--n", type=int, default=50_000)
+    args = ap.parse_args()
+
+    import httpx
+
+    with open(DATA, encoding="utf-8") as f:
+        rows = [json.loads(ln) for ln in f if ln.strip()]
+    _build_cost(rows, args.n)
+
+    _, base_url = start_fake_server(latency=args.latency, latency_per_1k_tokens=args.latency_per_1k)
+    emails = rows[:args.emails]
+    print(f"\n{len(emails)} e-mails; fake: {args.latency}s + {args.latency_per_1k}s/1k tokens fora do cache")
+    print(f"{'prompt':>34} {'versão':>22} {'estático':>9} {'cacheável':>10} {'em cache':>9} {'p50(ms)':>8}")
+    with httpx.Client(base_url=base_url, timeout=30) as client:
+        for name, prompt, variable_first in _variants(rows, args.shots):
+            prompt_tokens = cached = 0
+            lat = []
+            for r in emails:
+                t0 = time.perf_counter()
+                resp = client.post("/chat/completions", json={
+                    "model": "fake", "messages": _messages(prompt, r["body"], r["subject"], variable_first),
+                }).json()
+                lat.append((time.perf_counter() - t0) * 1000)
+                prompt_tokens += resp["usage"]["prompt_tokens"]
+                cached += resp["usage"]["prompt_tokens_details"]["cached_tokens"]
+            info = prompt.describe()
+            print(f"{name:>34} {prompt.version:>22} {info['static_tokens']:>9} "
+                  f"{'sim' if info['provider_cacheable'] else 'não':>10} {cached / prompt_tokens:>9.1%} "
+                  f"{statistics.median(lat):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# bench/bench_resilience.py
+"""
+Retry/backoff/circuit breaker contra o fake OpenAI com falhas injetadas.
+
+Cenários (em sequência, no mesmo processo):
+  1. rajada de 429 com Retry-After     → tudo deve terminar classificado
+  2. timeouts esporádicos              → idem, via retry
+  3. upstream fora do ar (100% 500)    → circuito abre e as chamadas falham rápido (503)
+
+e regressões do circuito: a sonda do half_open não vaza quando a tentativa morre
+antes do upstream (cota local estourada, cancelamento na espera pela cota), e a
+resposta sugerida propaga o LLMUnavailable em vez de virar texto de fallback.
+
+    cd backend && python -m bench.bench_resilience
+Sai com código != 0 se algum cenário não se comportar como esperado.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from bench.fake_openai import start_fake_server
+
+
+async def _burst(n: int, concurrency: int):
+    from app.openai_client import aclassify_only
+    from app.resilience import LLMUnavailable
+
+    sem = asyncio.Semaphore(concurrency)
+    lat, ok, unavailable = [], 0, 0
+
+    async def one(i):
+        nonlocal ok, unavailable
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                await aclassify_only(f"Fatura {i} vencida, qual o prazo?", "Fatura", "pt")
+                ok += 1
+            except LLMUnavailable:
+                unavailable += 1
+            lat.append(time.perf_counter() - t0)
+
+    await asyncio.gather(*(one(i) for i in range(n)))
+    lat.sort()
+    return {"ok": ok, "unavailable": unavailable,
+            "p50_ms": statistics.median(lat) * 1000, "p95_ms": lat[int(len(lat) * 0.95) - 1] * 1000}
+
+
+def _report(name: str, res: dict, stats: dict):
+    print(f"[{name}] ok={res['ok']} 503={res['unavailable']} p50={res['p50_ms']:.0f}ms p95={res['p95_ms']:.0f}ms "
+          f"retries={stats['retries']} desistências={stats['gave_up']} fail-fast={stats['fast_failed']} "
+          f"circuito={stats['breaker']['state']}")
+
+
+async def _main(n: int, handler_cls) -> bool:
+    from app.openai_client import resilience_stats
+
+    passed = True
+
+    handler_cls.rate_limit_rate = 0.3
+    res = await _burst(n, 8)
+    _report("429 burst", res, resilience_stats())
+    passed &= res["ok"] == n
+
+    handler_cls.rate_limit_rate = 0.0
+    handler_cls.timeout_rate = 0.15
+    res = await _burst(n, 8)
+    _report("timeouts", res, resilience_stats())
+    passed &= res["ok"] == n
+
+    handler_cls.timeout_rate = 0.0
+    handler_cls.error_rate = 1.0
+    res = await _burst(n, 8)
+    stats = resilience_stats()
+    _report("fora do ar", res, stats)
+    passed &= res["unavailable"] == n and stats["breaker"]["state"] == "open" and stats["fast_failed"] > 0
+
+    handler_cls.error_rate = 0.0
+    passed &= await _check_breaker_regressions()
+    return passed
+
+
+async def _expect_unavailable(coro) -> bool:
+    from app.resilience import LLMUnavailable
+
+    try:
+        await coro
+    except LLMUnavailable:
+        return True
+    return False
+
+
+async def _check_breaker_regressions() -> bool:
+    import app.openai_client as oc
+    from app.resilience import CircuitBreaker, RateLimiter
+
+    def half_open() -> CircuitBreaker:
+        breaker = CircuitBreaker(1, 0.0)  # abre na 1ª falha; a próxima chamada já é a sonda
+        breaker.on_failure()
+        return breaker
+
+    checks = {}
+    saved = oc._breaker, oc._limiter
+    try:
+        # cota local estourada com o circuito pronto para a sonda
+        oc._breaker, oc._limiter = half_open(), RateLimiter(60, 0)
+        oc._limiter.requests.level = -1000.0
+        quota = await _expect_unavailable(oc.aclassify_only("Fatura vencida", "Fatura", "pt"))
+        oc._limiter = RateLimiter(0, 0)
+        recovered = not await _expect_unavailable(oc.aclassify_only("Fatura vencida, qual o prazo?", "Fatura", "pt"))
+        checks["cota estourada não prende a sonda"] = quota and recovered and oc._breaker.state == "closed"
+
+        # cancelada (timeout) enquanto espera a cota, já com a sonda
+        oc._breaker, oc._limiter = half_open(), RateLimiter(60, 0)
+        oc._limiter.requests.level = -1.0
+        try:
+            await asyncio.wait_for(oc.aclassify_only("Fatura vencida", "Fatura", "pt"), 0.2)
+        except asyncio.TimeoutError:
+            pass
+        oc._limiter = RateLimiter(0, 0)
+        recovered = not await _expect_unavailable(oc.aclassify_only("Fatura vencida, qual o prazo?", "Fatura", "pt"))
+        checks["cancelamento na espera não prende a sonda"] = recovered and oc._breaker.state == "closed"
+
+        # circuito aberto: a resposta sugerida vira 503, não texto de fallback
+        oc._breaker = CircuitBreaker(1, 60.0)
+        oc._breaker.on_failure()
+        checks["resposta sugerida propaga LLMUnavailable"] = await _expect_unavailable(
+            oc.agenerate_reply("Fatura vencida, qual o prazo?", "Fatura", "pt"))
+    finally:
+        oc._breaker, oc._limiter = saved
+
+    for name, ok in checks.items():
+        print(f"[regressão] {name}: {'ok' if ok else 'FALHOU'}")
+    return all(checks.values())
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=40)
+    args = ap.parse_args()
+
+    server, base_url = start_fake_server(latency=0.02, retry_after=0.1, hang=2.0)
+    os.environ.update({
+        "OPENAI_API_KEY": "fake", "OPENAI_BASE_URL": base_url, "CACHE_BACKEND": "none",
+        "OPENAI_CLASSIFY_TIMEOUT": "0.5", "OPENAI_MAX_RETRIES": "6", "OPENAI_BACKOFF_BASE": "0.05",
+        "OPENAI_BACKOFF_MAX": "1", "OPENAI_RETRY_BUDGET": "10", "CIRCUIT_FAILURE_THRESHOLD": "8",
+    })
+    passed = asyncio.run(_main(args.calls, server.RequestHandlerClass))
+    print("resultado:", "OK" if passed else "FALHOU")
+    raise SystemExit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
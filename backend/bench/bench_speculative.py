@@ -0,0 +1,92 @@
+# bench/bench_speculative.py
+"""
+LLM_MODE=two_call x speculative: latência p50/p95 e taxa de tokens desperdiçados
+conforme a proporção de e-mails Produtivos no tráfego.
+
+    cd backend && python -m bench.bench_speculative --latency 0.2 --token-latency 0.01
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from bench.fake_openai import start_fake_server
+
+PRODUTIVO = [
+    ("Fatura 1234", "Olá, poderiam confirmar o vencimento da fatura 1234 em anexo? Preciso pagar até sexta."),
+    ("Acesso bloqueado", "Meu acesso ao internet banking foi bloqueado após troca de senha. Conta 5678-9."),
+    ("Invoice overdue", "Hi, invoice 9981 is still pending. Could you confirm the payment deadline?"),
+]
+IMPRODUTIVO = [
+    ("Feliz Natal", "Feliz Natal a toda a equipe! Boas festas."),
+    ("Oferta imperdível", "Promo relâmpago: desconto de 70% só hoje. Clique e aproveite."),
+]
+
+
+def _emails(n: int, ratio: float, seed: int = 5) -> list:
+    rnd = random.Random(seed)
+    return [rnd.choice(PRODUTIVO if rnd.random() < ratio else IMPRODUTIVO) for _ in range(n)]
+
+
+def _pct(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[max(0, int(round(q * len(values))) - 1)]
+
+
+async def _run(mode: str, emails: list, concurrency: int) -> list:
+    from app.triage import triage
+
+    sem = asyncio.Semaphore(concurrency)
+    lat = []
+
+    async def one(subject, body):
+        async with sem:
+            t0 = time.perf_counter()
+            await triage(body, subject, "pt", mode=mode)
+            lat.append((time.perf_counter() - t0) * 1000)
+
+    await asyncio.gather(*(one(s, b) for s, b in emails))
+    return lat
+
+
+async def _main(args):
+    from app.triage import speculation_stats
+
+    await _run("two_call", _emails(2, 1.0), 2)  # aquecimento (import do SDK, conexões)
+    print(f"{'produtivo':>9} {'modo':>12} {'p50(ms)':>8} {'p95(ms)':>8} {'ganho p50':>10} {'desperdício':>12}")
+    for ratio in args.ratios:
+        emails = _emails(args.emails, ratio)
+        base = await _run("two_call", emails, args.concurrency)
+        before = speculation_stats()
+        spec = await _run("speculative", emails, args.concurrency)
+        after = speculation_stats()
+        total = after["tokens_total"] - before["tokens_total"]
+        wasted = after["tokens_wasted"] - before["tokens_wasted"]
+        gain = 1 - statistics.median(spec) / statistics.median(base)
+        print(f"{ratio:>9.0%} {'two_call':>12} {statistics.median(base):>8.1f} {_pct(base, 0.95):>8.1f}")
+        print(f"{'':>9} {'speculative':>12} {statistics.median(spec):>8.1f} {_pct(spec, 0.95):>8.1f} "
+              f"{gain:>10.0%} {wasted / total if total else 0:>12.1%}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=0.2)
+    ap.add_argument("--token-latency", type=float, default=0.01)
+    ap.add_argument("--emails", type=int, default=60)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--ratios", type=lambda v: [float(x) for x in v.split(",")], default=[0.5, 0.8, 0.95])
+    args = ap.parse_args()
+
+    _, base_url = start_fake_server(latency=args.latency, token_latency=args.token_latency)
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("CACHE_BACKEND", "none")  # mede o caminho da OpenAI, não o cache
+    os.environ.setdefault("OPENAI_RPM", "0")        # o limitador local distorceria a latência
+    os.environ.setdefault("OPENAI_TPM", "0")
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
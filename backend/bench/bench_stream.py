@@ -0,0 +1,130 @@
+# bench/bench_stream.py
+"""
+/classify x /classify-stream: tempo até o primeiro byte, até a categoria,
+até o primeiro pedaço da resposta e total.
+
+Chama o app ASGI direto (sem servidor HTTP) e marca o instante de cada
+`send` — o httpx.ASGITransport junta o corpo inteiro antes de devolver, o que
+esconderia o ganho do streaming. O fake gera tokens com --token-latency.
+
+Antes, confere que o filtro incremental do stream (app/streaming.py) dá o mesmo
+texto que o /classify (`_strip_subject_lines`) com o JSON cortado em pedaços
+aleatórios, inclusive com cada quebra de linha que o `splitlines()` reconhece.
+
+    cd backend && python -m bench.bench_stream --latency 0.2 --token-latency 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+from bench.fake_openai import start_fake_server
+
+SAMPLE = {
+    "subject": "Fatura em aberto",
+    "body": "Olá, poderiam confirmar o prazo de pagamento da fatura 1234 em anexo? Obrigado.",
+    "language": "pt",
+}
+
+
+# Respostas com linha de assunto separada por cada quebra do splitlines()
+BREAK_CASES = [
+    f"Subject: Re: fatura{br}Olá,{br}segue o prazo.{br}Assunto : x{br}Att." for br in
+    ("\n", "\r", "\r\n", "\x0b", "\x0c", "\x1c", "\x1d", "\x1e", "\x85", "\u2028", "\u2029")
+]
+
+
+def _fuzz_replies(n: int, seed: int = 5) -> list:
+    rnd = random.Random(seed)
+    parts = ["Subject:", "subj", "Assunto: ", "  assunto", ":", "Olá", " ", "prazo", "é", "😀", '"', "\\", "\t",
+             "\n", "\r", "\r\n", "\x0b", "\x0c", "\x1c", "\x85", "\u2028", "\u2029"]
+    return ["".join(rnd.choice(parts) for _ in range(rnd.randint(0, 30))) for _ in range(n)]
+
+
+def check_equivalence(fuzz: int = 2000) -> None:
+    from app.openai_client import _strip_subject_lines
+    from app.streaming import ReplyStream
+
+    rnd = random.Random(11)
+    for reply in [*BREAK_CASES, *_fuzz_replies(fuzz)]:
+        raw = json.dumps({"suggested_reply": reply})
+        stream = ReplyStream()
+        i = 0
+        while i < len(raw):
+            step = rnd.randint(1, 8)
+            stream.feed(raw[i:i + step])
+            i += step
+        stream.flush()
+        assert stream.reply == _strip_subject_lines(reply), (reply, stream.reply)
+    print(f"equivalência stream x /classify: ok ({len(BREAK_CASES)} quebras de linha + {fuzz} casos aleatórios)")
+
+
+async def _call(app, path: str) -> dict:
+    """Executa uma requisição e devolve os instantes (ms) dos marcos da resposta."""
+    body = json.dumps(SAMPLE).encode("utf-8")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "server": ("bench", 80), "client": ("bench", 1),
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    }
+    sent = False
+    marks = {}
+    t0 = time.perf_counter()
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()  # nunca desconecta
+
+    async def send(message):
+        now = (time.perf_counter() - t0) * 1000
+        if message["type"] != "http.response.body":
+            return
+        chunk = message.get("body", b"")
+        if chunk:
+            marks.setdefault("ttfb", now)
+            if b"event: category" in chunk or b'"category"' in chunk:
+                marks.setdefault("category", now)
+            if b"event: delta" in chunk or b'"suggested_reply"' in chunk:
+                marks.setdefault("first_token", now)
+        if not message.get("more_body", False):
+            marks["total"] = now
+
+    await app(scope, receive, send)
+    return marks
+
+
+async def _main(n: int):
+    from app.main import app
+
+    await _call(app, "/classify")  # aquecimento (import do SDK, conexões)
+    print(f"{'endpoint':>17} {'TTFB':>8} {'categoria':>10} {'1º token':>9} {'total':>8}   (p50, ms)")
+    for path in ("/classify", "/classify-stream"):
+        runs = [await _call(app, path) for _ in range(n)]
+        p50 = {k: statistics.median(r[k] for r in runs) for k in ("ttfb", "category", "first_token", "total")}
+        print(f"{path:>17} {p50['ttfb']:>8.1f} {p50['category']:>10.1f} {p50['first_token']:>9.1f} {p50['total']:>8.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=0.2, help="latência fixa por chamada ao fake")
+    ap.add_argument("--token-latency", type=float, default=0.02, help="segundos por token gerado")
+    ap.add_argument("--requests", type=int, default=10)
+    args = ap.parse_args()
+
+    _, base_url = start_fake_server(latency=args.latency, token_latency=args.token_latency)
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("CACHE_BACKEND", "none")  # mede o caminho da OpenAI, não o cache
+    check_equivalence()
+    asyncio.run(_main(args.requests))
+
+
+if __name__ == "__main__":
+    main()
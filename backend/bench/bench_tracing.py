@@ -0,0 +1,93 @@
+# bench/bench_tracing.py
+"""
+Custo do tracing (app/tracing.py), para decidir se fica ligado em produção:
+
+- `stage()` vazio (enter/exit + histograma + Trace da requisição);
+- `record_llm` (uma chamada à OpenAI com usage);
+- TracingMiddleware em volta de um app ASGI mínimo, contra o mesmo app sem ele;
+- `render_metrics()` com os histogramas já populados (custo de um scrape).
+
+    cd backend && python -m bench.bench_tracing --n 200000
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.tracing import Trace, TracingMiddleware, _current, record_llm, render_metrics, stage
+
+USAGE = SimpleNamespace(prompt_tokens=420, completion_tokens=35)
+
+
+def _per_call_us(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    fn(n)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def _stages(n: int):
+    for _ in range(n):
+        with stage("bench"):
+            pass
+
+
+def _llm(n: int):
+    for _ in range(n):
+        record_llm("bench", 0.2, "ok", USAGE)
+
+
+async def _plain_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def _traced_endpoint(scope, receive, send):
+    # o que um /classify típico registra: 3 etapas locais + 2 chamadas ao LLM
+    for name in ("preprocess", "budget", "local"):
+        with stage(name):
+            pass
+    record_llm("classify", 0.1, "ok", USAGE)
+    record_llm("reply", 0.3, "ok", USAGE)
+    await _plain_app(scope, receive, send)
+
+
+async def _drive(app, n: int) -> float:
+    scope = {"type": "http", "method": "POST", "path": "/classify", "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Overhead do tracing por etapa")
+    ap.add_argument("--n", type=int, default=200_000)
+    args = ap.parse_args()
+    n = args.n
+
+    print(f"stage() fora de requisição   {_per_call_us(_stages, n):6.2f} µs")
+    token = _current.set(Trace())
+    print(f"stage() dentro de requisição {_per_call_us(_stages, n):6.2f} µs")
+    print(f"record_llm()                 {_per_call_us(_llm, n):6.2f} µs")
+    _current.reset(token)
+
+    reqs = max(1, n // 10)
+    bare = asyncio.run(_drive(_traced_endpoint, reqs))
+    traced = asyncio.run(_drive(TracingMiddleware(_traced_endpoint), reqs))
+    print(f"requisição sem middleware    {bare:6.2f} µs")
+    print(f"requisição com middleware    {traced:6.2f} µs  (+{traced - bare:.2f} µs, Server-Timing incluso)")
+
+    t0 = time.perf_counter()
+    text = render_metrics()
+    print(f"render_metrics()             {(time.perf_counter() - t0) * 1000:6.2f} ms  ({len(text.splitlines())} linhas)")
+
+
+if __name__ == "__main__":
+    main()
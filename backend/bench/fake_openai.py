@@ -0,0 +1,238 @@
+# bench/fake_openai.py
+"""
+Servidor HTTP local que imita `POST /v1/chat/completions` da OpenAI.
+
+Determinístico e sem dependências: a resposta depende apenas do prompt.
+Uso:
+    python -m bench.fake_openai --port 8765 --latency 0.3
+e aponte OPENAI_BASE_URL=http://127.0.0.1:8765/v1 (qualquer OPENAI_API_KEY).
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+IMPROD_WORDS = ("feliz", "oferta", "promo", "desconto", "sorteio", "newsletter", "unsubscribe")
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _classify(text: str) -> dict:
+    t = text.lower()
+    if any(w in t for w in IMPROD_WORDS):
+        return {"category": "Improdutivo", "confidence": 0.9}
+    return {"category": "Produtivo", "confidence": 0.85}
+
+
+def _reply(system: str) -> dict:
+    if "English" in system:
+        return {"suggested_reply": "Hi,\n\nThanks for your message. We are looking into it.\n\nBest regards,\nSupport Team"}
+    return {"suggested_reply": "Olá,\n\nObrigado pela mensagem. Estamos verificando.\n\nAtenciosamente,\nEquipe de Atendimento"}
+
+
+# Prompt caching como o da OpenAI: prefixo idêntico de 1024+ tokens, em blocos de 128
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+_prefix_lock = threading.Lock()
+
+
+def cached_prefix_tokens(messages: list, seen: set) -> int:
+    text = "".join(f"{m.get('role')}\x1e{m.get('content') or ''}\x1f" for m in messages)
+    total = len(text) // 4
+    cached = 0
+    with _prefix_lock:
+        if len(seen) > 200_000:
+            seen.clear()
+        for n in range(CACHE_MIN_TOKENS, total + 1, CACHE_BLOCK_TOKENS):
+            key = hash(text[:n * 4])
+            if key in seen:
+                cached = n
+            else:
+                seen.add(key)
+    return cached
+
+
+_BATCH_ITEM_RE = re.compile(r"^### E-MAIL (\S+)$", re.M)
+
+
+def fake_completion(messages: list) -> dict:
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    user = "\n".join(m["content"] for m in messages if m.get("role") == "user")
+    if '"results"' in system and "classificador" in system:
+        # lote: cada item vai do seu marcador até o próximo
+        parts = _BATCH_ITEM_RE.split(user)[1:]
+        return {"results": [{"id": rid, **_classify(text)} for rid, text in zip(parts[::2], parts[1::2])]}
+    if "suggested_reply" in system and "classificador" in system:
+        cls = _classify(user)
+        reply = _reply(system) if cls["category"] == "Produtivo" else {"suggested_reply": ""}
+        return {**cls, **reply}
+    if "classificador" in system:
+        return _classify(user)
+    return _reply(system)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.0
+    latency_per_1k_tokens = 0.0   # custo de prefill: prompts maiores demoram mais
+    token_latency = 0.0           # segundos por token gerado (decode)
+    rate_limit_rate = 0.0
+    error_rate = 0.0
+    timeout_rate = 0.0
+    malformed_rate = 0.0          # respostas de lote com JSON truncado (testa o fallback individual)
+    hang = 30.0
+    retry_after = 0.2
+    prefix_cache: set = set()    # prefixos já vistos (start_fake_server dá um por servidor)
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload: dict, headers: Optional[dict] = None):
+        raw = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        req = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send(404, {"error": {"message": "not found"}})
+            return
+
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                       {"retry-after-ms": str(int(self.retry_after * 1000))})
+            return
+        roll -= self.rate_limit_rate
+        if roll < self.error_rate:
+            self._send(500, {"error": {"message": "Internal error", "type": "server_error"}})
+            return
+        roll -= self.error_rate
+        if roll < self.timeout_rate:
+            time.sleep(self.hang)
+
+        messages = req.get("messages") or []
+        prompt_tokens = sum(_estimate_tokens(m.get("content") or "") for m in messages)
+        cached = min(prompt_tokens, cached_prefix_tokens(messages, self.prefix_cache))
+        # o prefill dos tokens em cache é (quase) de graça
+        delay = self.latency + self.latency_per_1k_tokens * (prompt_tokens - cached) / 1000
+        if delay:
+            time.sleep(delay)
+
+        payload = fake_completion(messages)
+        content = json.dumps(payload, ensure_ascii=False)
+        if "results" in payload and random.random() < self.malformed_rate:
+            content = content[:len(content) // 2]
+        completion_tokens = _estimate_tokens(content)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+        if req.get("stream"):
+            self._stream(req, content, usage)
+            return
+        if self.token_latency:
+            time.sleep(self.token_latency * completion_tokens)
+        self._send(200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": req.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }],
+            "usage": usage,
+        })
+
+    def _stream(self, req: dict, content: str, usage: dict):
+        """SSE no formato do chat.completions com stream=True (chunked)."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(payload):
+            raw = b"data: " + (payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")) + b"\n\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(raw), raw))
+            self.wfile.flush()
+
+        base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": req.get("model", "fake")}
+        for i in range(0, len(content), 4):  # ~1 token por pedaço
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            event({**base, "choices": [{"index": 0, "delta": {"content": content[i:i + 4]}, "finish_reason": None}]})
+        event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (req.get("stream_options") or {}).get("include_usage"):
+            event({**base, "choices": [], "usage": usage})
+        event(b"[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def _handle_error(self, request, client_address):
+    # Cliente que desiste da chamada (cancelamento) não é erro do servidor
+    import sys
+
+    if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+        ThreadingHTTPServer.handle_error(self, request, client_address)
+
+
+def start_fake_server(port: int = 0, latency: float = 0.0, handler: Optional[type] = None, **faults):
+    """
+    Sobe o servidor numa thread daemon. Retorna (server, base_url).
+    `faults` sobrepõe latency_per_1k_tokens/token_latency/rate_limit_rate/error_rate/timeout_rate/malformed_rate/
+    hang/retry_after;
+    dá para mudar depois via `server.RequestHandlerClass.<attr> = ...`.
+    """
+    handler_cls = type("Handler", (handler or FakeOpenAIHandler,), {"latency": latency, "prefix_cache": set(), **faults})
+    server_cls = type("Server", (ThreadingHTTPServer,), {"request_queue_size": 256, "handle_error": _handle_error})
+    server = server_cls(("127.0.0.1", port), handler_cls)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, real_port = server.server_address
+    return server, f"http://{host}:{real_port}/v1"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.3, help="segundos por chamada")
+    ap.add_argument("--latency-per-1k", type=float, default=0.0, help="segundos extras por 1k tokens de prompt")
+    ap.add_argument("--token-latency", type=float, default=0.0, help="segundos por token gerado")
+    ap.add_argument("--rate-limit-rate", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--timeout-rate", type=float, default=0.0)
+    ap.add_argument("--hang", type=float, default=30.0)
+    args = ap.parse_args()
+    server, url = start_fake_server(
+        args.port, args.latency, latency_per_1k_tokens=args.latency_per_1k,
+        token_latency=args.token_latency,
+        rate_limit_rate=args.rate_limit_rate, error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate, hang=args.hang,
+    )
+    print(f"fake OpenAI em {url} (latência {args.latency}s) — Ctrl+C para sair")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# bench/load_classify.py
+"""
+Benchmark de carga do /classify contra o fake OpenAI local.
+
+Mostra o throughput do app (in-process, um único event loop) conforme
+aumenta o número de requisições concorrentes. Com o caminho assíncrono o
+throughput deve crescer ~linearmente até OPENAI_MAX_CONCURRENCY.
+
+    cd backend && python -m bench.load_classify --latency 0.2 --requests 64
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from bench.fake_openai import start_fake_server
+
+SAMPLE = {
+    "subject": "Fatura em aberto",
+    "body": "Olá, poderiam confirmar o prazo de pagamento da fatura 1234 em anexo? Obrigado.",
+    "language": "pt",
+}
+
+
+async def _run(client, total: int, concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            r = await client.post("/classify", json=SAMPLE)
+            r.raise_for_status()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - t0
+
+
+async def _sweep(app, total: int, levels: list):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        await _run(client, 2, 1)  # aquecimento
+        for c in levels:
+            elapsed = await _run(client, total, c)
+            print(f"{c:>5} {elapsed:>9.2f} {total / elapsed:>8.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=0.2)
+    ap.add_argument("--requests", type=int, default=64)
+    ap.add_argument("--concurrency", default="1,2,4,8,16,32")
+    args = ap.parse_args()
+
+    _, base_url = start_fake_server(latency=args.latency)
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("CACHE_BACKEND", "none")  # mede o caminho da OpenAI, não o cache
+
+    from app.main import app
+
+    print(f"latência fake={args.latency}s  requisições={args.requests}")
+    print(f"{'conc':>5} {'tempo(s)':>9} {'req/s':>8}")
+    levels = [int(x) for x in args.concurrency.split(",")]
+    asyncio.run(_sweep(app, args.requests, levels))
+
+    from app.openai_client import client_stats
+
+    st = client_stats()
+    print(f"conexões: novas={st['new_connections']} reusadas={st['reused_connections']} "
+          f"(reuso {st['reuse_ratio']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+# bench/replay.py
+"""
+Replay de um corpus JSONL (`{"subject", "body", "language"?, "category"?}` por
+linha, como data/labeled_seed.jsonl) contra a API, para avaliação offline e carga.
+
+Alvos (`--target`):
+- `app` (padrão): o FastAPI in-process, via httpx.ASGITransport;
+- `mangum`: `handler.handler` com eventos sintéticos do API Gateway v2 — uma
+  invocação por vez, como num container Lambda (`--concurrency` é ignorado);
+- uma URL (`http://localhost:8000`): servidor já rodando, com a OpenAI dele.
+
+Nos alvos locais a OpenAI é o fake determinístico (bench/fake_openai.py), com
+latência ajustável. Relata throughput, p50/p95/p99, erros por status,
+concordância da categoria com o rótulo do corpus e a média de cada etapa do
+`Server-Timing`. Com `--max-p95-ms`, `--max-error-rate` ou `--min-agreement`,
+sai com código 1 quando algum limite é violado (serve de gate no CI).
+
+    cd backend && python -m bench.replay --concurrency 8 --latency 0.2
+    python -m bench.replay --target mangum --limit 20
+    python -m bench.replay --path /classify-stream --repeat 3 --json replay.json
+    python -m bench.replay --target http://localhost:8000 --concurrency 4
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from bench.fake_openai import start_fake_server
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "labeled_seed.jsonl")
+PATHS = ("/classify", "/classify-stream")
+
+
+def load_corpus(path: str, limit: int = 0, repeat: int = 1) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(ln) for ln in f if ln.strip()]
+    rows = [r for r in rows if isinstance(r, dict) and (r.get("body") or "").strip()]
+    if limit:
+        rows = rows[:limit]
+    return rows * max(1, repeat)
+
+
+def request_body(row: dict) -> dict:
+    return {"subject": row.get("subject"), "body": row["body"], "language": row.get("language") or "auto"}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank sobre a lista já ordenada."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def parse_server_timing(value: Optional[str]) -> Dict[str, float]:
+    out = {}
+    for entry in (value or "").split(","):
+        name, *params = [p.strip() for p in entry.split(";")]
+        for p in params:
+            if p.startswith("dur="):
+                try:
+                    out[name] = float(p[4:])
+                except ValueError:
+                    pass
+    return out
+
+
+def parse_result(path: str, status: int, body: bytes) -> Tuple[int, Optional[str]]:
+    """(status efetivo, categoria). No SSE um evento `error` conta como falha."""
+    if status != 200:
+        return status, None
+    try:
+        if path == "/classify-stream":
+            category = None
+            for block in body.decode("utf-8").split("\n\n"):
+                event, _, data = block.partition("\ndata: ")
+                if event == "event: category":
+                    category = json.loads(data)["category"]
+                elif event == "event: error":
+                    return json.loads(data).get("status") or 500, None
+            return (200, category) if category else (502, None)
+        return 200, json.loads(body).get("category")
+    except (ValueError, KeyError, UnicodeDecodeError):
+        return 502, None
+
+
+def _result(row: dict, path: str, status: int, headers: dict, body: bytes, ms: float) -> dict:
+    status, category = parse_result(path, status, body)
+    return {
+        "ms": ms,
+        "status": status,
+        "category": category,
+        "expected": row.get("category"),
+        "stages": parse_server_timing(headers.get("server-timing")),
+    }
+
+
+# ---- alvos assíncronos: app in-process e URL ----
+async def _run_http(client, rows: List[dict], path: str, concurrency: int, warmup: int) -> Tuple[List[dict], float]:
+    async def one(row: dict) -> dict:
+        t0 = time.perf_counter()
+        try:
+            r = await client.post(path, json=request_body(row))
+            status, headers, body = r.status_code, r.headers, r.content
+        except Exception as e:
+            status, headers, body = 599, {}, str(e).encode()
+        return _result(row, path, status, headers, body, (time.perf_counter() - t0) * 1000)
+
+    for row in rows[:warmup]:  # import do SDK, conexões
+        await one(row)
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def bounded(row):
+        async with sem:
+            return await one(row)
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(bounded(r) for r in rows))
+    return list(results), time.perf_counter() - t0
+
+
+async def _replay_async(target: str, rows: List[dict], args) -> Tuple[List[dict], float]:
+    import httpx
+
+    if target == "app":
+        from app.main import app
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://replay", timeout=args.timeout)
+    else:
+        client = httpx.AsyncClient(base_url=target.rstrip("/"), timeout=args.timeout)
+    async with client:
+        return await _run_http(client, rows, args.path, args.concurrency, args.warmup)
+
+
+# ---- alvo Mangum: eventos do API Gateway, síncrono ----
+def _replay_mangum(rows: List[dict], args) -> Tuple[List[dict], float]:
+    from bench.bench_coldstart import apigw_event
+    import handler
+
+    def one(row: dict) -> dict:
+        t0 = time.perf_counter()
+        resp = handler.handler(apigw_event("POST", args.path, request_body(row)), None)
+        body = resp.get("body") or ""
+        raw = base64.b64decode(body) if resp.get("isBase64Encoded") else body.encode("utf-8")
+        headers = {k.lower(): v for k, v in (resp.get("headers") or {}).items()}
+        return _result(row, args.path, resp["statusCode"], headers, raw, (time.perf_counter() - t0) * 1000)
+
+    for row in rows[:args.warmup]:
+        one(row)
+    t0 = time.perf_counter()
+    results = [one(r) for r in rows]
+    return results, time.perf_counter() - t0
+
+
+def summarize(results: List[dict], elapsed: float) -> dict:
+    ok = [r for r in results if r["status"] == 200]
+    lat = sorted(r["ms"] for r in ok)
+    labeled = [r for r in ok if r["expected"]]
+    agree = sum(r["category"] == r["expected"] for r in labeled)
+    stages = defaultdict(list)
+    for r in ok:
+        for name, ms in r["stages"].items():
+            stages[name].append(ms)
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "errors": len(results) - len(ok),
+        "error_rate": round((len(results) - len(ok)) / len(results), 4) if results else 0.0,
+        "errors_by_status": dict(Counter(r["status"] for r in results if r["status"] != 200)),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(lat, 50), 1),
+            "p95": round(percentile(lat, 95), 1),
+            "p99": round(percentile(lat, 99), 1),
+            "max": round(lat[-1], 1) if lat else 0.0,
+        },
+        "labeled": len(labeled),
+        "agreement": round(agree / len(labeled), 4) if labeled else None,
+        "stages_avg_ms": {k: round(sum(v) / len(v), 1) for k, v in sorted(stages.items())},
+    }
+
+
+def check_limits(report: dict, args) -> List[str]:
+    failures = []
+    if args.max_p95_ms is not None and report["latency_ms"]["p95"] > args.max_p95_ms:
+        failures.append(f"p95 {report['latency_ms']['p95']} ms > {args.max_p95_ms} ms")
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        failures.append(f"taxa de erro {report['error_rate']:.2%} > {args.max_error_rate:.2%}")
+    if args.min_agreement is not None and (report["agreement"] or 0.0) < args.min_agreement:
+        failures.append(f"concordância {report['agreement']} < {args.min_agreement}")
+    return failures
+
+
+def print_report(report: dict, header: str):
+    lat = report["latency_ms"]
+    print(header)
+    print(f"requisições {report['requests']}  ok {report['ok']}  erros {report['errors']} "
+          f"({report['error_rate']:.1%})  tempo {report['elapsed_s']:.2f}s  throughput {report['throughput_rps']:.1f} req/s")
+    print(f"latência ms  p50 {lat['p50']:.1f}  p95 {lat['p95']:.1f}  p99 {lat['p99']:.1f}  max {lat['max']:.1f}")
+    if report["agreement"] is not None:
+        print(f"concordância {report['agreement']:.3f} ({report['labeled']} rotulados)")
+    if report["errors_by_status"]:
+        print("erros por status: " + "  ".join(f"{k}={v}" for k, v in sorted(report["errors_by_status"].items())))
+    if report["stages_avg_ms"]:
+        print("etapas (Server-Timing, média ms): "
+              + "  ".join(f"{k} {v:.1f}" for k, v in report["stages_avg_ms"].items()))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay de corpus JSONL: carga + concordância de classificação")
+    ap.add_argument("corpus", nargs="?", default=DATA)
+    ap.add_argument("--target", default="app", help="app | mangum | URL base (http://host:porta)")
+    ap.add_argument("--path", default="/classify", choices=PATHS)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--limit", type=int, default=0, help="usa só as N primeiras linhas")
+    ap.add_argument("--repeat", type=int, default=1, help="repete o corpus N vezes")
+    ap.add_argument("--warmup", type=int, default=2, help="requisições descartadas antes de medir")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--mode", help="LLM_MODE para os alvos locais (two_call | combined | speculative)")
+    ap.add_argument("--latency", type=float, default=0.2, help="latência fixa do fake por chamada (s)")
+    ap.add_argument("--latency-per-1k", type=float, default=0.0, help="latência extra do fake por 1k tokens de prompt")
+    ap.add_argument("--token-latency", type=float, default=0.0, help="segundos por token gerado (streaming)")
+    ap.add_argument("--json", help="grava o relatório em JSON neste arquivo")
+    ap.add_argument("--max-p95-ms", type=float)
+    ap.add_argument("--max-error-rate", type=float)
+    ap.add_argument("--min-agreement", type=float)
+    args = ap.parse_args()
+
+    rows = load_corpus(args.corpus, args.limit, args.repeat)
+    if not rows:
+        sys.exit(f"corpus sem linhas com body: {args.corpus}")
+
+    local = args.target in ("app", "mangum")
+    if local:
+        _, base_url = start_fake_server(
+            latency=args.latency, latency_per_1k_tokens=args.latency_per_1k, token_latency=args.token_latency,
+        )
+        os.environ["OPENAI_API_KEY"] = "fake"
+        os.environ["OPENAI_BASE_URL"] = base_url
+        os.environ.setdefault("CACHE_BACKEND", "none")  # mede o caminho da OpenAI, não o cache
+        os.environ.setdefault("OPENAI_TPM", "0")        # o limitador local distorceria a latência
+        os.environ.setdefault("OPENAI_RPM", "0")
+        if args.mode:
+            os.environ["LLM_MODE"] = args.mode
+
+    if args.target == "mangum":
+        results, elapsed = _replay_mangum(rows, args)
+        concurrency = 1
+    else:
+        results, elapsed = asyncio.run(_replay_async(args.target, rows, args))
+        concurrency = args.concurrency
+
+    report = summarize(results, elapsed)
+    report["config"] = {
+        "target": args.target, "path": args.path, "corpus": args.corpus, "concurrency": concurrency,
+        "mode": os.getenv("LLM_MODE", "two_call") if local else None,
+        "fake_latency_s": args.latency if local else None,
+    }
+    fake = f"  fake latência={args.latency}s" if local else ""
+    print_report(report, f"alvo={args.target}  rota={args.path}  concorrência={concurrency}"
+                         f"  modo={report['config']['mode'] or '-'}{fake}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    failures = check_limits(report, args)
+    if failures:
+        print("REGRESSÃO: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,27 @@
+import os
+import time
+
+_t0 = time.perf_counter()
+
 from mangum import Mangum
 from app.main import app
 
-handler = Mangum(app)
+# O módulo fica carregado entre invocações "quentes": o cliente OpenAI
+# (e seu pool de conexões keep-alive) em app.openai_client é reaproveitado.
+# openai/pypdf só são importados no primeiro uso (ver app/openai_client.py e app/pdf.py).
+# Sem lifespan: o Mangum o rodaria a cada invocação, e o worker de jobs fica em
+# outra função (worker_handler.py), nunca dentro de uma requisição.
+handler = Mangum(app, lifespan="off")
+
+# STARTUP_PROFILE=true loga o custo do import no cold start. Para o custo por
+# módulo, use também PYTHONPROFILEIMPORTTIME=1 e analise o log com
+# `python -m bench.bench_coldstart --log <arquivo>`.
+if os.getenv("STARTUP_PROFILE", "false").lower() == "true":
+    import json
+    import sys
+
+    print(json.dumps({
+        "startup_ms": round((time.perf_counter() - _t0) * 1000, 1),
+        "modules_loaded": len(sys.modules),
+        "lazy_loaded": {m: m in sys.modules for m in ("openai", "pypdf", "httpx")},
+    }))
@@ -38,9 +38,12 @@ def _parse_body(event):
         return {}
 
 def _body_size(event):
+    body = event.get("body") or ""
     if event.get("isBase64Encoded"):
-        return len(base64.b64decode(event.get("body") or b""))
-    return len((event.get("body") or "").encode("utf-8"))
+        # Tamanho decodificado sem decodificar: 3 bytes a cada 4 chars, menos o padding
+        body = body.rstrip()
+        return len(body) * 3 // 4 - (len(body) - len(body.rstrip("=")))
+    return len(body.encode("utf-8"))
 
 def _header(event, name, default=None):
     hdrs = { (k or "").lower(): v for k, v in (event.get("headers") or {}).items() }
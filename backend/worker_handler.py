@@ -0,0 +1,5 @@
+from app.worker import sqs_handler
+
+# Lambda worker dos jobs (gatilho SQS, JOBS_BACKEND=dynamodb). A API (handler.py)
+# só enfileira em POST /jobs; o job roda aqui, fora de qualquer requisição HTTP.
+handler = sqs_handler